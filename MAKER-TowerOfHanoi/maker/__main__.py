@@ -0,0 +1,4 @@
+import sys
+from maker.cli import main
+
+sys.exit(main())
@@ -0,0 +1,182 @@
+import os
+import sys
+import mmap
+import struct
+from typing import Iterable, Iterator, List, Union
+
+MAGIC = b"HANOILOG"
+HEADER = struct.Struct("<8sQ")   # magic, number of committed moves
+RECORD_SIZE = 2                  # disk (uint8), from_peg << 2 | to_peg (uint8)
+
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def _encode(disk: int, from_peg: int, to_peg: int) -> int:
+    if not (0 < disk < 256 and 0 <= from_peg <= 2 and 0 <= to_peg <= 2):
+        raise ValueError(f"Move {[disk, from_peg, to_peg]} does not fit an ActionLog record")
+    packed = (from_peg << 2) | to_peg
+    return disk | (packed << 8) if _LITTLE_ENDIAN else (disk << 8) | packed
+
+
+def _decode(record: int) -> List[int]:
+    if _LITTLE_ENDIAN:
+        disk, packed = record & 0xFF, record >> 8
+    else:
+        disk, packed = record >> 8, record & 0xFF
+    return [disk, packed >> 2, packed & 3]
+
+
+class ActionLog:
+    """
+    Append-only move log storing each [disk, from_peg, to_peg] in two bytes.
+
+    The records live in a bytearray, or in a memory-mapped file when opened
+    with ActionLog.open, whose header carries the committed move count so
+    other processes can tail it. Indexing returns [disk, from_peg, to_peg]
+    lists, so the log can stand in for the old list of moves; slicing
+    returns a read-only ActionLog view over the same memory without copying.
+    """
+
+    def __init__(self, capacity: int = 4096):
+        self._path = None
+        self._file = None
+        self._mmap = None
+        self._readonly = False
+        self._records = memoryview(bytearray(max(capacity, 1) * RECORD_SIZE)).cast("H")
+        self._len = 0
+
+    @classmethod
+    def open(cls, path: str, readonly: bool = False, capacity: int = 1 << 16) -> "ActionLog":
+        """Open (or create) a file-backed log"""
+        log = cls.__new__(cls)
+        log._path = path
+        log._readonly = readonly
+        log._mmap = None
+        if not readonly and not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, 0))
+                f.truncate(HEADER.size + capacity * RECORD_SIZE)
+        log._file = open(path, "rb" if readonly else "r+b")
+        log._map()
+        return log
+
+    @classmethod
+    def from_moves(cls, moves: Iterable[List[int]]) -> "ActionLog":
+        moves = list(moves)
+        log = cls(len(moves))
+        log.extend(moves)
+        return log
+
+    @classmethod
+    def from_bytes(cls, data) -> "ActionLog":
+        """Read-only log over a buffer of raw() records, without copying it"""
+        return cls._view(memoryview(data).cast("B").cast("H"))
+
+    @classmethod
+    def _view(cls, records: memoryview) -> "ActionLog":
+        log = cls.__new__(cls)
+        log._path = log._file = log._mmap = None
+        log._readonly = True
+        log._records = records
+        log._len = len(records)
+        return log
+
+    def _map(self):
+        size = os.fstat(self._file.fileno()).st_size
+        access = mmap.ACCESS_READ if self._readonly else mmap.ACCESS_WRITE
+        # Older maps stay alive for as long as views into them do
+        self._mmap = mmap.mmap(self._file.fileno(), size, access=access)
+        magic, count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self._path} is not an ActionLog file")
+        body = memoryview(self._mmap)[HEADER.size:]
+        self._records = body[:len(body) - len(body) % RECORD_SIZE].cast("H")
+        self._len = count
+
+    def _grow(self):
+        capacity = len(self._records) * 2
+        if self._mmap is None:
+            records = memoryview(bytearray(capacity * RECORD_SIZE)).cast("H")
+            records[:self._len] = self._records[:self._len]
+            self._records = records
+        else:
+            self._file.truncate(HEADER.size + capacity * RECORD_SIZE)
+            self._map()
+
+    def append(self, move: List[int]):
+        if self._readonly:
+            raise ValueError("ActionLog is read-only")
+        if self._len == len(self._records):
+            self._grow()
+        self._records[self._len] = _encode(*move)
+        self._len += 1
+        if self._mmap is not None:
+            HEADER.pack_into(self._mmap, 0, MAGIC, self._len)
+
+    def extend(self, moves: Iterable[List[int]]):
+        for move in moves:
+            self.append(move)
+
+    def truncate(self, length: int):
+        """Drop every move past length, e.g. ones written after the last checkpoint"""
+        if length < self._len:
+            self._len = length
+            if self._mmap is not None:
+                HEADER.pack_into(self._mmap, 0, MAGIC, self._len)
+
+    def refresh(self) -> int:
+        """Pick up moves appended to the backing file by another writer"""
+        if self._file is not None:
+            _, count = HEADER.unpack_from(self._mmap, 0)
+            if HEADER.size + count * RECORD_SIZE > len(self._mmap):
+                self._map()
+            self._len = count
+        return self._len
+
+    def raw(self) -> memoryview:
+        """The committed records as bytes: disk, from_peg << 2 | to_peg, ..."""
+        records = self._records[:self._len]
+        if not records.c_contiguous:
+            return memoryview(records.tobytes())
+        return records.cast("B")
+
+    def flush(self):
+        if self._mmap is not None and not self._readonly:
+            self._mmap.flush()
+
+    def close(self):
+        """Release the map and file; the moves stay readable, from memory, and the log becomes read-only"""
+        self.flush()
+        if self._mmap is not None:
+            records = self._records
+            self._records = memoryview(bytearray(records[:self._len].tobytes())).cast("H")
+            self._readonly = True
+            try:
+                records.release()
+                self._mmap.close()
+            except BufferError:
+                pass   # slices of the log still point into the map; it is unmapped once they go
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return ActionLog._view(self._records[:self._len][index])
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("ActionLog index out of range")
+        return _decode(self._records[index])
+
+    def __iter__(self) -> Iterator[List[int]]:
+        for record in self._records[:self._len]:
+            yield _decode(record)
+
+    def __repr__(self) -> str:
+        where = f" at {self._path}" if self._path else ""
+        return f"<ActionLog {self._len} moves{where}>"
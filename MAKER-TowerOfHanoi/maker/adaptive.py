@@ -0,0 +1,118 @@
+import math
+from maker.voting import VoteStats
+
+
+def step_success(p: float, k: int) -> float:
+    """Chance first-to-ahead-by-k picks the right move when each vote is right with probability p"""
+    if p <= 0:
+        return 0.0
+    if p >= 1:
+        return 1.0
+    return 1 / (1 + ((1 - p) / p) ** k)
+
+
+def expected_votes(p: float, k: int) -> float:
+    """Expected valid votes before one candidate is ahead by k (gambler's ruin duration)"""
+    if abs(p - 0.5) < 1e-9:
+        return float(k * k)
+    r = ((1 - p) / p) ** k
+    return k / (2 * p - 1) * (1 - r) / (1 + r)
+
+
+def margin_for(p: float, target: float, k_min: int = 1, k_max: int = 8) -> int:
+    """Smallest k in [k_min, k_max] whose step_success reaches target"""
+    if p <= 0.5:
+        return k_max
+    if p >= 1 or target <= 0:
+        return k_min
+    if target >= 1:
+        return k_max
+    k = math.ceil(math.log(1 / target - 1) / math.log((1 - p) / p) - 1e-9)
+    return min(max(k, k_min), k_max)
+
+
+class AdaptiveMargin:
+    """
+    Per-step voting margin chosen from the run's recent behaviour.
+
+    Each settled step counts its winning votes as agreements and the rest as
+    disagreements, separately for disk-1 steps (even step indices) and the
+    others, with older steps decaying away. The per-vote accuracy used is a
+    lower confidence bound of that estimate, and k is the smallest margin
+    that keeps target_success for all remaining steps. Every probe_every-th
+    step of each class votes with at least k=2 so a run that has settled on
+    k=1 keeps measuring disagreement in both. The red-flag rate turns
+    expected votes into expected samples, which are tallied against the
+    samples actually drawn.
+    """
+
+    def __init__(self, num_steps: int, target_success: float = 0.95, k_min: int = 1,
+                 k_max: int = 8, prior_accuracy: float = 0.9, prior_weight: float = 10.0,
+                 decay: float = 0.99, z: float = 1.64, probe_every: int = 10):
+        self.num_steps = num_steps
+        self.target_success = target_success
+        self.k_min = k_min
+        self.k_max = k_max
+        self.decay = decay
+        self.z = z
+        self.probe_every = probe_every
+        # Beta(agree, disagree) per step class: 0 = disk-1 step, 1 = other
+        self.agree = [prior_accuracy * prior_weight] * 2
+        self.disagree = [(1 - prior_accuracy) * prior_weight] * 2
+        self.red_flag_rate = 0.0
+        self.expected_samples = 0.0
+        self.actual_samples = 0
+        self.margins = {}
+        self._pending = {}
+
+    @staticmethod
+    def _step_class(step: int) -> int:
+        return step % 2
+
+    def accuracy(self, step: int) -> float:
+        """Lower confidence bound on the chance a single valid vote is right at step"""
+        c = self._step_class(step)
+        a, b = self.agree[c], self.disagree[c]
+        n = a + b
+        mean = a / n
+        return max(0.0, mean - self.z * math.sqrt(mean * (1 - mean) / (n + 1)))
+
+    def choose(self, step: int) -> int:
+        """Margin k to vote with at step; remembers the expected samples for observe()"""
+        remaining = max(1, self.num_steps - step)
+        per_step = self.target_success ** (1 / remaining)
+        p = self.accuracy(step)
+        k = margin_for(p, per_step, self.k_min, self.k_max)
+        if k < 2 <= self.k_max and self.probe_every and (step // 2) % self.probe_every == 0:
+            k = 2
+        votes = expected_votes(p, k) if p > 0.5 else float(k * k)
+        self._pending[step] = (k, votes / max(1e-3, 1 - self.red_flag_rate))
+        return k
+
+    def observe(self, step: int, stats: VoteStats):
+        """Fold a settled step's votes and red flags into the estimates"""
+        c = self._step_class(step)
+        votes = sorted(stats.votes.values(), reverse=True)
+        if votes:
+            self.agree[c] = self.agree[c] * self.decay + votes[0]
+            self.disagree[c] = self.disagree[c] * self.decay + sum(votes[1:])
+        if stats.samples:
+            rate = stats.red_flags / stats.samples
+            self.red_flag_rate = self.decay * self.red_flag_rate + (1 - self.decay) * rate
+        # A step re-voted after discarded speculation keeps its latest choice
+        k, expected = self._pending.pop(step, (None, 0.0))
+        if k is not None:
+            self.margins[k] = self.margins.get(k, 0) + 1
+        self.expected_samples += expected
+        self.actual_samples += stats.samples
+
+    def summary(self) -> str:
+        margins = ", ".join(f"k={k}: {n}" for k, n in sorted(self.margins.items()))
+        return (f"Adaptive margin: {self.expected_samples:.0f} expected vs {self.actual_samples} actual "
+                f"samples (steps per margin: {margins}); accuracy estimate "
+                f"{self.accuracy(0):.3f} (disk 1) / {self.accuracy(1):.3f} (other), "
+                f"red-flag rate {self.red_flag_rate:.3f}")
+
+    @classmethod
+    def from_config(cls, config) -> "AdaptiveMargin":
+        return cls(config.num_steps, config.target_success, config.k_min, config.k_max)
@@ -0,0 +1,639 @@
+"""
+Microbenchmarks for MAKER's hot paths, run against the simulated backend.
+
+    python -m maker bench parsers --responses 20000 --disks 10
+    python -m maker bench prompts --calls 200 --disks 10 --backend simulated
+    python -m maker bench verify runs/hanoi-20
+    python -m maker bench suite --out bench.json --compare baseline.json
+
+Each benchmark imports what it measures when it runs, so `verify` on an
+existing log loads neither the voting stack nor an API client.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import dataclasses
+from types import SimpleNamespace
+from typing import Iterable, List
+from maker.config import SIMULATOR_ERROR_RATES, RunConfig
+from maker.responses import completion_response
+
+
+def _walk(num_disks: int, count: int) -> List[tuple]:
+    """(state, prev_move) for the first count steps of the optimal solution, repeated"""
+    from maker.simulator import correct_move
+    from maker.state import HanoiState
+    clockwise = num_disks % 2 == 0
+    steps = []
+    state, prev_move = HanoiState.initial(num_disks), None
+    for _ in range(min(count, 2 ** num_disks - 1)):
+        steps.append((state, prev_move))
+        prev_move = correct_move(state, prev_move, clockwise)
+        state = state.apply(prev_move)
+    return (steps * (count // len(steps) + 1))[:count]
+
+
+def _spread(num_disks: int, count: int) -> List[tuple]:
+    """(state, prev_move) at count steps spaced evenly over the optimal solution"""
+    from maker.simulator import correct_move
+    from maker.state import HanoiState
+    total = 2 ** num_disks - 1
+    wanted = {i * total // count for i in range(count)}
+    clockwise = num_disks % 2 == 0
+    steps = []
+    state, prev_move = HanoiState.initial(num_disks), None
+    for step in range(max(wanted) + 1):
+        if step in wanted:
+            steps.append((state, prev_move))
+        prev_move = correct_move(state, prev_move, clockwise)
+        state = state.apply(prev_move)
+    return steps
+
+
+def _common_prefix(a: str, b: str) -> int:
+    return len(os.path.commonprefix([a, b]))
+
+
+def bench_prompts(config: RunConfig = None, num_calls: int = 200,
+                  profiles=None, temperature: float = None) -> dict:
+    """
+    Input tokens per call and single-sample accuracy of each prompt profile.
+
+    Every profile is asked the same num_calls steps, spread over the
+    solution, once each with no retries, through config's backend. Tokens
+    are the API's usage counts (the simulator estimates four characters a
+    token, so only its token column is meaningful; its answers do not depend
+    on the wording). cached is the share of prompt tokens the provider
+    reported as served from its prefix cache; static is how many leading
+    characters the profile's requests share.
+    """
+    from maker.clients import create_client
+    from maker.parser import parse_move_state_flag, parse_structured, validate_transition
+    from maker.prompts import get_prompts, PROMPT_PROFILES
+    from maker.simulator import correct_move
+    from maker.voting import build_messages, completion_kwargs, usage_tokens
+    profiles = PROMPT_PROFILES if profiles is None else profiles
+    config = dataclasses.replace(config or RunConfig(), use_async_voting=False, streaming=False)
+    temperature = config.temperature_rest if temperature is None else temperature
+    client = create_client(config)
+    parse = parse_structured if config.structured_output else parse_move_state_flag
+    steps = _spread(config.num_disks, num_calls)
+    clockwise = config.num_disks % 2 == 0
+
+    results = {}
+    for profile in profiles:
+        system_prompt, user_template = get_prompts(config.num_disks, config.structured_output, profile)
+        row = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0,
+               "correct": 0, "wrong": 0, "red_flags": 0, "api_errors": 0}
+        first, static = None, None
+        for state, prev_move in steps:
+            messages = build_messages(state, prev_move, system_prompt, user_template, profile)
+            text = "\n".join(m["content"] for m in messages)
+            first = text if first is None else first
+            static = len(text) if static is None else min(static, _common_prefix(first, text))
+            try:
+                response = client.chat.completions.create(
+                    **completion_kwargs(config, messages, temperature))
+            except Exception as e:
+                print(f"API Error: {e}")
+                row["api_errors"] += 1
+                continue
+            prompt_tokens, completion_tokens = usage_tokens(response)
+            details = getattr(response.usage, "prompt_tokens_details", None)
+            row["calls"] += 1
+            row["prompt_tokens"] += prompt_tokens
+            row["completion_tokens"] += completion_tokens
+            row["cached_tokens"] += getattr(details, "cached_tokens", 0) or 0
+            try:
+                move, next_state = parse(response.choices[0].message.content, config.num_disks)
+                validate_transition(state, move, next_state)
+            except ValueError:
+                row["red_flags"] += 1
+                continue
+            if move == correct_move(state, prev_move, clockwise):
+                row["correct"] += 1
+            else:
+                row["wrong"] += 1
+
+        calls = max(1, row["calls"])
+        row.update(static_chars=static or 0,
+                   prompt_tokens_per_call=row["prompt_tokens"] / calls,
+                   cached_share=row["cached_tokens"] / max(1, row["prompt_tokens"]),
+                   accuracy=row["correct"] / calls,
+                   red_flag_rate=row["red_flags"] / calls)
+        results[profile] = row
+
+    print(f"{config.backend} backend, {config.model}, {config.num_disks} disks, "
+          f"{len(steps)} steps at temperature {temperature}")
+    print(f"{'profile':<10}{'prompt tok/call':>17}{'cached':>9}{'static chars':>14}"
+          f"{'accuracy':>10}{'red flags':>11}")
+    for profile, row in results.items():
+        print(f"{profile:<10}{row['prompt_tokens_per_call']:>17.1f}{row['cached_share']:>9.1%}"
+              f"{row['static_chars']:>14}{row['accuracy']:>10.2%}{row['red_flag_rate']:>11.2%}")
+    if "full" in results and "compact" in results and results["compact"]["prompt_tokens_per_call"]:
+        ratio = results["full"]["prompt_tokens_per_call"] / results["compact"]["prompt_tokens_per_call"]
+        print(f"compact sends {ratio:.1f}x fewer prompt tokens per call")
+    return results
+
+
+def bench_parsers(num_responses: int = 20000, num_disks: int = 10, error_rates: dict = None,
+                  repeats: int = 5, seed: int = 0, max_tokens: int = 750) -> dict:
+    """
+    Parse time and red-flag rate of the free-text and structured paths.
+
+    The same walk of states is answered by SimulatedModel in each mode;
+    only parsing plus validate_transition is timed (best of repeats).
+    """
+    from maker.parser import parse_move_state_flag, parse_structured, validate_transition, RESPONSE_FORMAT
+    from maker.prompts import get_system_prompt, get_user_template
+    from maker.simulator import SimulatedModel
+    from maker.voting import build_messages
+    error_rates = SIMULATOR_ERROR_RATES if error_rates is None else error_rates
+    steps = _walk(num_disks, num_responses)
+    results = {}
+    for name, structured, parse in (("free_text", False, parse_move_state_flag),
+                                    ("structured", True, parse_structured)):
+        model = SimulatedModel(error_rates=error_rates, seed=seed)
+        system_prompt = get_system_prompt(structured)
+        user_template = get_user_template(num_disks, structured)
+        response_format = RESPONSE_FORMAT if structured else None
+        cases = []
+        for state, prev_move in steps:
+            messages = build_messages(state, prev_move, system_prompt, user_template)
+            text = model.complete(messages, 0.1, max_tokens, response_format)[0]
+            cases.append((state, text))
+
+        best = float("inf")
+        for _ in range(repeats):
+            red_flags = 0
+            start = time.perf_counter()
+            for state, text in cases:
+                try:
+                    move, next_state = parse(text, num_disks)
+                    validate_transition(state, move, next_state)
+                except ValueError:
+                    red_flags += 1
+            best = min(best, time.perf_counter() - start)
+
+        results[name] = {
+            "us_per_response": best / len(cases) * 1e6,
+            "red_flag_rate": red_flags / len(cases),
+            "mean_chars": sum(len(text) for _, text in cases) / len(cases),
+        }
+
+    print(f"{'path':<12}{'us/response':>14}{'red-flag rate':>16}{'mean chars':>13}")
+    for name, row in results.items():
+        print(f"{name:<12}{row['us_per_response']:>14.2f}{row['red_flag_rate']:>16.2%}"
+              f"{row['mean_chars']:>13.0f}")
+    speedup = results["free_text"]["us_per_response"] / results["structured"]["us_per_response"]
+    print(f"structured parsing is {speedup:.1f}x faster")
+    return results
+
+
+def _optimal_log(num_disks: int):
+    """The optimal solution for num_disks as an in-memory ActionLog, built from the closed form"""
+    import numpy as np
+    from maker.action_log import ActionLog
+    from maker.verify import optimal_moves
+    disk, from_peg, to_peg = optimal_moves(num_disks, 0, 2 ** num_disks - 1)
+    records = np.empty((len(disk), 2), dtype=np.uint8)
+    records[:, 0] = disk
+    records[:, 1] = (from_peg << 2) | to_peg
+    return ActionLog.from_bytes(records.tobytes())
+
+
+def _optimal_step(num_disks: int, step: int):
+    """(state, prev_move, move) at any step of the optimal solution, from the closed form"""
+    from maker.state import HanoiState
+    from maker.verify import optimal_moves, optimal_positions
+    state = HanoiState.from_positions(optimal_positions(num_disks, step))
+    moves = [[int(v[i]) for v in optimal_moves(num_disks, max(step - 1, 0), step + 1)]
+             for i in range(min(step, 1) + 1)]
+    return state, moves[0] if step else None, moves[-1]
+
+
+class FakeClient:
+    """
+    In-process stand-in for the API, with no network and no latency, for
+    timing MAKER's own code. Answers come from SimulatedModel, corrupted at
+    error_rates; seconds is the time spent producing them, so callers can
+    subtract it. Streaming is not supported.
+    """
+
+    schedules_retries = True
+
+    def __init__(self, error_rates: dict = None, seed: int = 0, is_async: bool = False):
+        from maker.simulator import SimulatedModel
+        self.model = SimulatedModel(error_rates=error_rates, seed=seed)
+        self.seconds = 0.0
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            create=self._create_async if is_async else self._create))
+
+    def _create(self, model: str, messages: List[dict], temperature: float = 1.0,
+                max_tokens: int = 750, response_format: dict = None, n: int = 1, **kwargs):
+        start = time.perf_counter()
+        choices, prompt_tokens, completion_tokens, _ = self.model.complete_n(
+            messages, temperature, max_tokens, response_format, n)
+        response = completion_response(model, choices, prompt_tokens, completion_tokens)
+        self.seconds += time.perf_counter() - start
+        self.calls += 1
+        return response
+
+    async def _create_async(self, **kwargs):
+        return self._create(**kwargs)
+
+
+def _bench_config(**overrides) -> RunConfig:
+    """The environment's RunConfig with everything that is not MAKER's own work switched off"""
+    settings = dict(backend="simulated", streaming=False, cache_path=None, journal_dir=None,
+                    metrics_path=None, metrics_port=None, live_view=False, cassette_path=None,
+                    simulator_latency=0.0)
+    settings.update(overrides)
+    return RunConfig.from_env(**settings)
+
+
+def bench_parse_outputs(num_responses: int = 2000, num_disks: int = 10, repeats: int = 5,
+                        seed: int = 0, max_tokens: int = 750) -> dict:
+    """
+    Parse time per response for well-formed output and for each kind of
+    corruption the simulator produces, on the free-text and structured paths.
+    rejected is the share the parser itself red-flags (wrong_move and
+    inconsistent_state parse fine; validate_transition catches the latter).
+    """
+    from maker.parser import parse_move_state_flag, parse_structured, RESPONSE_FORMAT
+    from maker.prompts import get_system_prompt, get_user_template
+    from maker.simulator import SimulatedModel, ERROR_TYPES
+    from maker.voting import build_messages
+    steps = _spread(num_disks, num_responses)
+    results = {}
+    for path, structured, parse in (("free_text", False, parse_move_state_flag),
+                                    ("structured", True, parse_structured)):
+        system_prompt = get_system_prompt(structured)
+        user_template = get_user_template(num_disks, structured)
+        response_format = RESPONSE_FORMAT if structured else None
+        results[path] = {}
+        for kind in ("well_formed",) + ERROR_TYPES:
+            if structured and kind == "malformed":
+                continue   # constrained decoding cannot produce it
+            model = SimulatedModel(error_rates={} if kind == "well_formed" else {kind: 1.0}, seed=seed)
+            texts = [model.complete(build_messages(state, prev_move, system_prompt, user_template),
+                                    0.1, max_tokens, response_format)[0]
+                     for state, prev_move in steps]
+            best = float("inf")
+            for _ in range(repeats):
+                rejected = 0
+                start = time.perf_counter()
+                for text in texts:
+                    try:
+                        parse(text, num_disks)
+                    except ValueError:
+                        rejected += 1
+                best = min(best, time.perf_counter() - start)
+            results[path][kind] = {"us_per_response": best / len(texts) * 1e6,
+                                   "rejected": rejected / len(texts),
+                                   "mean_chars": sum(map(len, texts)) / len(texts)}
+
+    print(f"{'path':<12}{'output':<20}{'us/response':>13}{'rejected':>10}{'chars':>8}")
+    for path, kinds in results.items():
+        for kind, row in kinds.items():
+            print(f"{path:<12}{kind:<20}{row['us_per_response']:>13.2f}{row['rejected']:>10.0%}"
+                  f"{row['mean_chars']:>8.0f}")
+    return results
+
+
+def bench_validation(disks: Iterable[int] = range(3, 26), samples: int = 1000,
+                     repeats: int = 5) -> dict:
+    """
+    validate_transition per call at each disk count, on samples steps spread
+    over the solution: accept_us for the right next_state, reject_us for an
+    unchanged one (the red-flag path, including building its message).
+    """
+    from maker.parser import validate_transition
+    results = {}
+    for num_disks in disks:
+        total = 2 ** num_disks - 1
+        cases = []
+        for i in range(min(samples, total)):
+            state, _, move = _optimal_step(num_disks, i * total // min(samples, total))
+            cases.append((state, move, state.apply(move)))
+        accept = reject = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for state, move, next_state in cases:
+                validate_transition(state, move, next_state)
+            accept = min(accept, time.perf_counter() - start)
+            start = time.perf_counter()
+            for state, move, _ in cases:
+                try:
+                    validate_transition(state, move, state)
+                except ValueError:
+                    pass
+            reject = min(reject, time.perf_counter() - start)
+        results[str(num_disks)] = {"accept_us": accept / len(cases) * 1e6,
+                                   "reject_us": reject / len(cases) * 1e6}
+
+    print(f"{'disks':>5}{'accept us':>12}{'reject us':>12}")
+    for num_disks, row in results.items():
+        print(f"{num_disks:>5}{row['accept_us']:>12.2f}{row['reject_us']:>12.2f}")
+    return results
+
+
+def bench_voting(num_disks: int = 10, num_steps: int = 300, k: int = 2, seed: int = 0,
+                 error_rates: dict = None) -> dict:
+    """
+    Voting overhead per step, network excluded: do_voting (sync) and
+    do_voting_async on num_steps steps spread over the solution, against a
+    FakeClient, minus the time the client spent answering.
+    """
+    from maker.prompts import get_prompts
+    from maker.voting import VoteStats, do_voting, do_voting_async
+    error_rates = SIMULATOR_ERROR_RATES if error_rates is None else error_rates
+    steps = _spread(num_disks, num_steps)
+    results = {}
+    for mode in ("sync", "async"):
+        config = _bench_config(num_disks=num_disks, use_async_voting=mode == "async")
+        system_prompt, user_template = get_prompts(num_disks, config.structured_output, config.prompt_profile)
+        client = FakeClient(error_rates, seed, is_async=mode == "async")
+        stats = VoteStats()
+        if mode == "sync":
+            start = time.perf_counter()
+            for state, prev_move in steps:
+                do_voting(client, state, prev_move, k, num_disks, system_prompt, user_template,
+                          stats, config=config)
+            seconds = time.perf_counter() - start
+        else:
+            async def vote_all():
+                for state, prev_move in steps:
+                    await do_voting_async(client, state, prev_move, k, num_disks, system_prompt,
+                                          user_template, stats=stats, config=config)
+            start = time.perf_counter()
+            asyncio.run(vote_all())
+            seconds = time.perf_counter() - start
+        results[mode] = {"overhead_us_per_step": (seconds - client.seconds) / len(steps) * 1e6,
+                         "client_us_per_step": client.seconds / len(steps) * 1e6,
+                         "calls_per_step": client.calls / len(steps),
+                         "samples_per_step": stats.samples / len(steps)}
+
+    print(f"{num_disks} disks, k={k}, {len(steps)} steps")
+    print(f"{'mode':<7}{'overhead us/step':>18}{'client us/step':>16}{'calls/step':>12}{'samples/step':>14}")
+    for mode, row in results.items():
+        print(f"{mode:<7}{row['overhead_us_per_step']:>18.1f}{row['client_us_per_step']:>16.1f}"
+              f"{row['calls_per_step']:>12.2f}{row['samples_per_step']:>14.2f}")
+    return results
+
+
+def _peak_rss_mb() -> float:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10   # bytes on macOS, KiB elsewhere
+
+
+def _end_to_end_run(num_disks: int, max_steps: int, use_async: bool, seed: int) -> dict:
+    """One solver run in a fresh process, so its peak memory is its own"""
+    import io
+    import contextlib
+    from maker.adaptive import AdaptiveMargin
+    from maker.prompts import get_prompts
+    from maker.solver import generate_solution, generate_solution_async
+    from maker.verify import verify_log
+    config = _bench_config(num_disks=num_disks, use_async_voting=use_async)
+    client = FakeClient(config.simulator_error_rates, seed, is_async=use_async)
+    num_steps = min(config.num_steps, max_steps or config.num_steps)
+    args = (client, [list(range(num_disks, 0, -1)), [], []], num_steps, config.k_threshold, num_disks,
+            *get_prompts(num_disks, config.structured_output, config.prompt_profile))
+    kwargs = {"config": config}
+    if config.adaptive_k:
+        kwargs["policy"] = AdaptiveMargin.from_config(config)
+    baseline = _peak_rss_mb()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        start = time.perf_counter()
+        if use_async:
+            actions = asyncio.run(generate_solution_async(
+                *args, max_in_flight=config.max_in_flight,
+                speculation_depth=config.speculation_depth, **kwargs))
+        else:
+            actions = generate_solution(*args, **kwargs)
+        seconds = time.perf_counter() - start
+    solved = verify_log(actions, num_disks)[0] if num_steps == config.num_steps else None
+    return {"steps": len(actions), "seconds": seconds,
+            "steps_per_second": len(actions) / seconds,
+            "overhead_us_per_step": (seconds - client.seconds) / len(actions) * 1e6,
+            "calls_per_step": client.calls / len(actions),
+            "peak_rss_mb": _peak_rss_mb(), "baseline_rss_mb": baseline, "solved": solved}
+
+
+def bench_end_to_end(disks: Iterable[int] = (10, 12, 14, 16, 18, 20), max_steps: int = 20000,
+                     use_async: bool = False, seed: int = 0) -> dict:
+    """
+    Solver throughput and peak memory against a FakeClient, one fresh process
+    per disk count, run one at a time. Runs longer than max_steps stop there
+    (None runs every solution to the end; 20 disks is over a million steps).
+    overhead_us_per_step leaves out the client's time; peak_rss_mb is the
+    process's peak resident size, baseline_rss_mb its size before solving.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    results = {}
+    for num_disks in disks:
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results[str(num_disks)] = pool.submit(
+                _end_to_end_run, num_disks, max_steps, use_async, seed).result()
+
+    print(f"{'async' if use_async else 'sync'} solver, at most {max_steps or 'all'} steps per run")
+    print(f"{'disks':>5}{'steps':>9}{'steps/s':>10}{'overhead us/step':>18}{'peak MB':>9}{'before MB':>11}")
+    for num_disks, row in results.items():
+        print(f"{num_disks:>5}{row['steps']:>9}{row['steps_per_second']:>10.0f}"
+              f"{row['overhead_us_per_step']:>18.1f}{row['peak_rss_mb']:>9.1f}{row['baseline_rss_mb']:>11.1f}")
+    return results
+
+
+def bench_verify(path: str = None, num_disks: int = None, repeats: int = 5,
+                 reference: bool = False) -> dict:
+    """
+    Time verify_log on the move log at path (a journal directory or a
+    moves.bin file), or on the optimal solution for num_disks built in memory.
+    Opening the log is timed separately; verification is best of repeats.
+    With reference, a per-move HanoiState replay of the same log is timed
+    once for comparison.
+    """
+    from maker.action_log import ActionLog
+    from maker.verify import verify_log
+    start = time.perf_counter()
+    if path is not None:
+        from maker.cli import _moves_path, _num_disks
+        log = ActionLog.open(_moves_path(path), readonly=True)
+        num_disks = _num_disks(path, num_disks, len(log))
+        if num_disks is None:
+            raise ValueError(f"cannot tell how many disks {path} is for; pass --disks")
+    else:
+        log = _optimal_log(num_disks)
+    open_seconds = time.perf_counter() - start
+
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        success, _, message = verify_log(log, num_disks)
+        best = min(best, time.perf_counter() - start)
+    results = {"moves": len(log), "num_disks": num_disks, "success": success, "message": message,
+               "open_seconds": open_seconds, "verify_seconds": best,
+               "moves_per_second": len(log) / best if best else float("inf")}
+    print(f"{results['moves']} moves, {num_disks} disks: {message}")
+    print(f"open {open_seconds * 1e3:.2f} ms, verify_log {best * 1e3:.2f} ms "
+          f"({results['moves_per_second'] / 1e6:.1f}M moves/s)")
+
+    if reference:
+        from maker.state import HanoiState
+        start = time.perf_counter()
+        state = HanoiState.initial(num_disks)
+        try:
+            for move in log:
+                state = state.apply(move)
+        except ValueError:
+            pass
+        results["reference_seconds"] = time.perf_counter() - start
+        print(f"HanoiState replay {results['reference_seconds'] * 1e3:.2f} ms "
+              f"({results['reference_seconds'] / best:.0f}x verify_log)")
+    return results
+
+
+def run_suite(quick: bool = False, e2e_disks: Iterable[int] = None, max_steps: int = None) -> dict:
+    """
+    Every benchmark above except prompts (which may call a paid API), as one
+    JSON-serializable dict. quick shrinks the sample sizes for a smoke run.
+    """
+    import platform
+    from datetime import datetime, timezone
+    if e2e_disks is None:
+        e2e_disks = (10, 12) if quick else (10, 12, 14, 16, 18, 20)
+    if max_steps is None:
+        max_steps = 2000 if quick else 20000
+    results = {"meta": {"created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                        "python": platform.python_version(), "platform": platform.platform(),
+                        "machine": platform.machine(), "cpus": os.cpu_count(), "quick": quick}}
+    sections = [
+        ("parse", lambda: bench_parse_outputs(300 if quick else 2000, repeats=3 if quick else 5)),
+        ("validation", lambda: bench_validation(samples=200 if quick else 1000, repeats=3 if quick else 5)),
+        ("voting", lambda: bench_voting(num_steps=100 if quick else 300)),
+        ("end_to_end", lambda: bench_end_to_end(e2e_disks, max_steps)),
+        ("verify", lambda: bench_verify(num_disks=16 if quick else 20, repeats=3 if quick else 5,
+                                        reference=True)),
+    ]
+    for name, run in sections:
+        print(f"\n== {name} ==")
+        results[name] = run()
+    return results
+
+
+# Metric name endings and whether a larger value is better
+_LOWER_IS_BETTER = ("_us", "us_per_step", "us_per_response", "_seconds", "_mb")
+_HIGHER_IS_BETTER = ("per_second",)
+
+
+def _timings(results: dict, prefix: str = "") -> dict:
+    """Flatten results to {"voting/sync/overhead_us_per_step": value} for the timed metrics only"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_timings(value, name + "/"))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) \
+                and key != "baseline_rss_mb" and key.endswith(_LOWER_IS_BETTER + _HIGHER_IS_BETTER):
+            flat[name] = value
+    return flat
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.10) -> List[dict]:
+    """
+    Compare two run_suite results metric by metric and return the
+    regressions: timings more than threshold slower (or memory larger),
+    throughputs more than threshold lower. Metrics only one side has are skipped.
+    """
+    now, before = _timings(current), _timings(baseline)
+    regressions = []
+    print(f"{'metric':<52}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name in sorted(now.keys() & before.keys()):
+        old, new = before[name], now[name]
+        if not old:
+            continue
+        change = new / old - 1
+        worse = -change if name.endswith(_HIGHER_IS_BETTER) else change
+        flag = ""
+        if worse > threshold:
+            regressions.append({"metric": name, "baseline": old, "current": new, "change": change})
+            flag = "  REGRESSION"
+        elif worse < -threshold:
+            flag = "  improved"
+        print(f"{name:<52}{old:>12.4g}{new:>12.4g}{change:>+9.1%}{flag}")
+    print(f"{len(regressions)} of {len(now.keys() & before.keys())} metrics regressed by more than {threshold:.0%}")
+    return regressions
+
+
+def _load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m maker bench", description="MAKER microbenchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+    parsers = sub.add_parser("parsers", help="free-text vs structured response parsing")
+    parsers.add_argument("--responses", type=int, default=20000)
+    parsers.add_argument("--disks", type=int, default=10)
+    parsers.add_argument("--repeats", type=int, default=5)
+    parsers.add_argument("--seed", type=int, default=0)
+    prompts = sub.add_parser("prompts", help="input tokens and accuracy per prompt profile")
+    prompts.add_argument("--calls", type=int, default=200)
+    prompts.add_argument("--disks", type=int, default=10)
+    prompts.add_argument("--backend", default=None, help="default: $MAKER_BACKEND, then maker/config.py's BACKEND")
+    prompts.add_argument("--structured", action="store_true")
+    verify = sub.add_parser("verify", help="verify_log throughput on a move log")
+    verify.add_argument("path", nargs="?", default=None,
+                        help="journal directory or moves.bin; default: the optimal solution for --disks")
+    verify.add_argument("--disks", type=int, default=None)
+    verify.add_argument("--repeats", type=int, default=5)
+    verify.add_argument("--reference", action="store_true", help="also time a per-move HanoiState replay")
+    suite = sub.add_parser("suite", help="parsing, validation, voting, end-to-end and verification")
+    suite.add_argument("--out", default=None, help="write the results as JSON")
+    suite.add_argument("--compare", default=None, metavar="BASELINE", help="flag regressions against a saved run")
+    suite.add_argument("--threshold", type=float, default=0.10)
+    suite.add_argument("--quick", action="store_true", help="small samples, for a smoke run")
+    suite.add_argument("--e2e-disks", type=int, nargs="+", default=None)
+    suite.add_argument("--max-steps", type=int, default=None, help="cap per end-to-end run; 0 for whole solutions")
+    diff = sub.add_parser("compare", help="flag regressions between two saved suite runs")
+    diff.add_argument("current")
+    diff.add_argument("baseline")
+    diff.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    if args.bench == "parsers":
+        bench_parsers(args.responses, args.disks, repeats=args.repeats, seed=args.seed)
+    elif args.bench == "prompts":
+        config = RunConfig.from_env(num_disks=args.disks, structured_output=args.structured,
+                                    simulator_latency=0.0)
+        if args.backend:
+            config.backend = args.backend
+        bench_prompts(config, args.calls)
+    elif args.bench == "verify":
+        if args.path is None and args.disks is None:
+            parser.error("verify needs a move log or --disks")
+        bench_verify(args.path, args.disks, args.repeats, args.reference)
+    elif args.bench == "suite":
+        results = run_suite(args.quick, args.e2e_disks, args.max_steps)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"\nResults written to {args.out}")
+        if args.compare:
+            print()
+            return 1 if compare(results, _load(args.compare), args.threshold) else 0
+    elif args.bench == "compare":
+        return 1 if compare(_load(args.current), _load(args.baseline), args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
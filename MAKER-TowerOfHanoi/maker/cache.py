@@ -0,0 +1,113 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import defaultdict
+from typing import List, Optional, Tuple
+
+
+def request_key(model: str, temperature: float, messages: List[dict], **extra) -> str:
+    """Content address of a chat completion request"""
+    payload = {"model": model, "temperature": temperature, "messages": messages}
+    payload.update(extra)
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk cache of raw completion texts, keyed by request_key.
+
+    Temperature-0 requests keep a single response per key. Sampled requests
+    keep a pool of up to samples_per_key responses; within one process the
+    n-th lookup of a key is served by the n-th pooled sample, so a rerun
+    reuses every sample it paid for before and only goes to the network for
+    the rest. The store is SQLite in WAL mode, so several processes can share
+    one file, and it is trimmed back to max_entries rows by least recent use.
+    """
+
+    def __init__(self, path: str, max_entries: int = 1_000_000, samples_per_key: int = 8):
+        self.path = path
+        self.max_entries = max_entries
+        self.samples_per_key = samples_per_key
+        self.hits = 0
+        self.misses = 0
+        self._cursor = defaultdict(int)
+        self._puts = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT NOT NULL, slot INTEGER NOT NULL, text TEXT NOT NULL,"
+            " last_used REAL NOT NULL, PRIMARY KEY (key, slot))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_used)")
+
+    def lookup(self, key: str, temperature: float) -> Tuple[Optional[str], Optional[int]]:
+        """
+        Return (text, slot). text is None on a miss; slot is where the live
+        response should be stored, or None if the pool for key is full.
+        """
+        with self._lock:
+            if temperature == 0:
+                slot = 0
+            else:
+                slot = self._cursor[key]
+                self._cursor[key] = slot + 1
+                if slot >= self.samples_per_key:
+                    self.misses += 1
+                    return None, None
+
+            row = self._db.execute(
+                "SELECT text FROM responses WHERE key = ? AND slot = ?", (key, slot)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None, slot
+
+            self.hits += 1
+            self._db.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ? AND slot = ?",
+                (time.time(), key, slot)
+            )
+            return row[0], None
+
+    def store(self, key: str, slot: Optional[int], text: str):
+        if slot is None or text is None:
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO responses (key, slot, text, last_used) VALUES (?, ?, ?, ?)",
+                (key, slot, text, time.time())
+            )
+            self._puts += 1
+            if self._puts % 1000 == 0:
+                self._evict()
+
+    def _evict(self):
+        (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            # Trim a little below the bound so eviction runs rarely
+            excess += self.max_entries // 10
+            self._db.execute(
+                "DELETE FROM responses WHERE rowid IN "
+                "(SELECT rowid FROM responses ORDER BY last_used LIMIT ?)", (excess,)
+            )
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._evict()
+            self._db.close()
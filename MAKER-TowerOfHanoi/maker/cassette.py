@@ -0,0 +1,378 @@
+"""
+Record every completion request of a run and replay it later without the API.
+
+A cassette is a gzip JSONL file, one record per request:
+
+    {"seq": 17, "key": "3f2a...", "t": 4.21, "latency": 0.83, "n": 2,
+     "stream": false, "choices": [["...move = [1, 0, 2]...", "stop"], ...],
+     "usage": [412, 130]}
+
+or, for a request that failed, "error": {"type", "message", "status_code",
+"retry_after"} instead of choices and usage. t is the request's start in
+seconds since recording began; key is request_key() of the model,
+temperature, messages and response_format. Recording truncates the file,
+so a cassette only ever holds one run, and records are flushed every
+flush_every requests, so an interrupted recording loses at most its tail.
+
+RecordingClient wraps a real client. ReplayClient stands in for one:
+
+- match="keyed" serves each request the next recorded choices for its key,
+  taking them one choice at a time, so a replay still works when the voting
+  code batches samples differently from the recording (n, streaming, cache).
+- match="ordered" serves the records in recorded order, whatever was asked.
+
+speed=None replays as fast as possible; otherwise each response waits its
+recorded latency divided by speed (1.0 is the original pace). The file is
+read lazily, so a replay holds only the records it has had to read past.
+"""
+import json
+import gzip
+import time
+import asyncio
+import threading
+from collections import defaultdict, deque
+from types import SimpleNamespace
+from typing import List
+from maker.cache import request_key
+from maker.voting import NonRetryableError
+from maker.responses import completion_response, CompletionStream, AsyncCompletionStream
+
+
+class CassetteExhausted(NonRetryableError):
+    """Raised by ReplayClient when the cassette has no recorded response left for a request"""
+
+
+class RecordedError(Exception):
+    """A recorded API failure, raised again on replay with the original status and retry-after"""
+
+    def __init__(self, error: dict):
+        super().__init__(f"{error['type']}: {error['message']}")
+        self.status_code = error.get("status_code")
+        self.retry_after = error.get("retry_after")
+
+
+def cassette_key(kwargs: dict) -> str:
+    """What keyed replay matches on: everything about a request except n and streaming"""
+    extra = {"response_format": kwargs["response_format"]} if kwargs.get("response_format") else {}
+    return request_key(kwargs["model"], kwargs.get("temperature", 1.0), kwargs["messages"], **extra)
+
+
+def read_records(path: str):
+    """Yield a cassette's records; a truncated final gzip member or line ends the file"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    return
+        except (EOFError, gzip.BadGzipFile):
+            return
+
+
+def _error_record(e: Exception) -> dict:
+    retry_after = getattr(e, "retry_after", None)
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    if retry_after is None and headers.get("retry-after"):
+        retry_after = headers.get("retry-after")
+    return {"type": type(e).__name__, "message": str(e)[:500],
+            "status_code": getattr(e, "status_code", None),
+            "retry_after": float(retry_after) if retry_after else None}
+
+
+# ======================================================================
+# Recording
+# ======================================================================
+
+class Cassette:
+    """The writing end: a thread-safe gzip JSONL file, started afresh"""
+
+    def __init__(self, path: str, flush_every: int = 100):
+        self.path = path
+        self.flush_every = flush_every
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._seq = 0
+        self._unflushed = 0
+        self.recorded = 0
+        self.errors = 0
+
+    def begin(self) -> tuple:
+        """(seq, start) for a request about to be sent"""
+        with self._lock:
+            self._seq += 1
+            return self._seq, time.perf_counter()
+
+    def write(self, seq: int, start: float, kwargs: dict, choices: List[list] = None,
+              usage: List[int] = None, error: Exception = None):
+        record = {"seq": seq, "key": cassette_key(kwargs), "t": round(start - self._start, 6),
+                  "latency": round(time.perf_counter() - start, 6), "n": kwargs.get("n", 1),
+                  "stream": bool(kwargs.get("stream"))}
+        if error is not None:
+            record["error"] = _error_record(error)
+        else:
+            record["choices"] = choices
+            record["usage"] = usage
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self.recorded += 1
+            self.errors += error is not None
+            self._unflushed += 1
+            if self._unflushed >= self.flush_every:
+                self._file.flush()
+                self._unflushed = 0
+
+    def summary(self) -> str:
+        return f"Cassette: recorded {self.recorded} requests ({self.errors} failed) to {self.path}"
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _usage_pair(usage) -> List[int]:
+    if usage is None:
+        return None
+    return [usage.prompt_tokens or 0, usage.completion_tokens or 0]
+
+
+class _StreamRecorder:
+    """Collects what a caller reads from a stream, recorded when the stream is closed"""
+
+    def __init__(self, cassette: Cassette, seq: int, start: float, kwargs: dict):
+        self.cassette = cassette
+        self.seq = seq
+        self.start = start
+        self.kwargs = kwargs
+        self.parts = []
+        self.finish_reason = None
+        self.usage = None
+        self.written = False
+
+    def see(self, chunk):
+        self.usage = chunk.usage or self.usage
+        if chunk.choices:
+            choice = chunk.choices[0]
+            if choice.delta.content:
+                self.parts.append(choice.delta.content)
+            self.finish_reason = choice.finish_reason or self.finish_reason
+
+    def done(self):
+        if not self.written:
+            self.written = True
+            self.cassette.write(self.seq, self.start, self.kwargs,
+                                [["".join(self.parts), self.finish_reason]], _usage_pair(self.usage))
+
+
+class _RecordingStream:
+    def __init__(self, stream, recorder: _StreamRecorder):
+        self._stream = stream
+        self._recorder = recorder
+
+    def __iter__(self):
+        for chunk in self._stream:
+            self._recorder.see(chunk)
+            yield chunk
+        self._recorder.done()
+
+    def close(self):
+        self._stream.close()
+        self._recorder.done()
+
+
+class _AsyncRecordingStream(_RecordingStream):
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._recorder.see(chunk)
+            yield chunk
+        self._recorder.done()
+
+    async def close(self):
+        await self._stream.close()
+        self._recorder.done()
+
+
+class _RecordingCompletions:
+    def __init__(self, completions, cassette: Cassette, is_async: bool):
+        self._completions = completions
+        self._cassette = cassette
+        self._is_async = is_async
+
+    def _record(self, seq: int, start: float, kwargs: dict, response):
+        if kwargs.get("stream"):
+            recorder = _StreamRecorder(self._cassette, seq, start, kwargs)
+            stream_class = _AsyncRecordingStream if self._is_async else _RecordingStream
+            return stream_class(response, recorder)
+        choices = [[c.message.content, c.finish_reason] for c in response.choices]
+        self._cassette.write(seq, start, kwargs, choices, _usage_pair(getattr(response, "usage", None)))
+        return response
+
+    def create(self, **kwargs):
+        if self._is_async:
+            return self._create_async(kwargs)
+        seq, start = self._cassette.begin()
+        try:
+            response = self._completions.create(**kwargs)
+        except Exception as e:
+            self._cassette.write(seq, start, kwargs, error=e)
+            raise
+        return self._record(seq, start, kwargs, response)
+
+    async def _create_async(self, kwargs: dict):
+        seq, start = self._cassette.begin()
+        try:
+            response = await self._completions.create(**kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._cassette.write(seq, start, kwargs, error=e)
+            raise
+        return self._record(seq, start, kwargs, response)
+
+
+class RecordingClient:
+    """Wraps a sync or async client and records every request and its outcome to a Cassette"""
+
+    def __init__(self, client, path: str, is_async: bool, flush_every: int = 100):
+        self.client = client
+        self.cassette = Cassette(path, flush_every)
+        self.schedules_retries = getattr(client, "schedules_retries", False)
+        self.chat = SimpleNamespace(completions=_RecordingCompletions(
+            client.chat.completions, self.cassette, is_async))
+
+
+# ======================================================================
+# Replay
+# ======================================================================
+
+class _Player:
+    """The reading end: hands out recorded responses, reading the file only as far as needed"""
+
+    def __init__(self, path: str, match: str = "keyed", speed: float = None):
+        if match not in ("keyed", "ordered"):
+            raise ValueError(f"Unknown cassette match {match!r}; expected 'keyed' or 'ordered'")
+        self.path = path
+        self.match = match
+        self.speed = speed
+        self._records = read_records(path)
+        self._pool = defaultdict(deque)   # key -> (choice or error record, latency, usage share)
+        self._lock = threading.Lock()
+        self.served = 0
+        self.missed = 0
+
+    def _read(self):
+        record = next(self._records, None)
+        if record is None:
+            return None
+        if self.match == "keyed":
+            pool = self._pool[record["key"]]
+            if "error" in record:
+                pool.append((record, record["latency"], None))
+            else:
+                count = max(1, len(record["choices"]))
+                prompt_tokens, completion_tokens = record.get("usage") or (0, 0)
+                for i, choice in enumerate(record["choices"]):
+                    # The prompt is billed with the first choice only
+                    share = (prompt_tokens if i == 0 else 0, completion_tokens // count)
+                    pool.append((choice, record["latency"], share))
+        return record
+
+    def _take(self, key: str, n: int):
+        """(choices, usage, latency) or a RecordedError, for n choices of key"""
+        with self._lock:
+            if self.match == "ordered":
+                record = self._read()
+                if record is None:
+                    self.missed += 1
+                    raise CassetteExhausted(f"{self.path}: no recorded requests left")
+                self.served += 1
+                if "error" in record:
+                    return RecordedError(record["error"]), None, record["latency"]
+                return record["choices"], record.get("usage") or [0, 0], record["latency"]
+
+            pool = self._pool[key]
+            while len(pool) < n:
+                if self._read() is None:
+                    break
+            if not pool:
+                self._pool.pop(key, None)
+                self.missed += 1
+                raise CassetteExhausted(f"{self.path}: no recorded response left for request {key[:12]}")
+            if pool[0][2] is None:
+                record, latency, _ = pool.popleft()
+                self.served += 1
+                return RecordedError(record["error"]), None, latency
+            choices, usage, latency = [], [0, 0], 0.0
+            while pool and len(choices) < n and pool[0][2] is not None:
+                choice, choice_latency, share = pool.popleft()
+                choices.append(choice)
+                usage[0] += share[0]
+                usage[1] += share[1]
+                latency = max(latency, choice_latency)
+            if not pool:
+                del self._pool[key]
+            self.served += 1
+            return choices, usage, latency
+
+    def delay(self, latency: float) -> float:
+        return latency / self.speed if self.speed else 0.0
+
+    def respond(self, kwargs: dict, stream_class):
+        choices, usage, latency = self._take(cassette_key(kwargs), kwargs.get("n", 1))
+        if isinstance(choices, RecordedError):
+            return choices, self.delay(latency)
+        response = completion_response(kwargs["model"], choices, usage[0], usage[1])
+        if kwargs.get("stream"):
+            include_usage = (kwargs.get("stream_options") or {}).get("include_usage", False)
+            return stream_class(response, self.delay(latency), 0.0, include_usage), 0.0
+        return response, self.delay(latency)
+
+    def summary(self) -> str:
+        return f"Cassette: replayed {self.served} requests from {self.path} ({self.missed} not recorded)"
+
+    def close(self):
+        self._records.close()
+
+
+class _ReplayCompletions:
+    def __init__(self, player: _Player, is_async: bool):
+        self._player = player
+        self._is_async = is_async
+
+    def create(self, **kwargs):
+        if self._is_async:
+            return self._create_async(kwargs)
+        response, delay = self._player.respond(kwargs, CompletionStream)
+        if delay:
+            time.sleep(delay)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def _create_async(self, kwargs: dict):
+        response, delay = self._player.respond(kwargs, AsyncCompletionStream)
+        if delay:
+            await asyncio.sleep(delay)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class ReplayClient:
+    """
+    Stands in for a sync or async client, answering from a recorded cassette.
+    Recorded failures come back at once, so retries need no backoff
+    (schedules_retries) and the replay is never rate limited.
+    """
+
+    schedules_retries = True
+
+    def __init__(self, path: str, is_async: bool, match: str = "keyed", speed: float = None):
+        self.cassette = _Player(path, match, speed)
+        self.chat = SimpleNamespace(completions=_ReplayCompletions(self.cassette, is_async))
@@ -0,0 +1,309 @@
+"""
+Command line entry point.
+
+    python -m maker solve --num-disks 10 --backend simulated --journal-dir 'runs/hanoi-{num_disks}'
+    python -m maker resume --num-disks 10 --journal-dir runs/hanoi-10
+    python -m maker verify runs/hanoi-10
+    python -m maker replay runs/hanoi-10 --speed 100
+    python -m maker export runs/hanoi-20 --out hanoi20.mp4 --frames 20000
+    python -m maker bench parsers --responses 20000
+    python -m maker coordinate --num-disks 10 --workers 8
+    python -m maker work --address coordinator-host:50000 --processes 8
+
+solve, resume and coordinate take a flag for every RunConfig field (--num-disks,
+--adaptive-k, --cache-path .maker_cache.sqlite, --simulator-error-rates '{"malformed": 0}');
+each can also be set as an environment variable (MAKER_NUM_DISKS=10).
+Flags win over the environment, which wins over maker/config.py.
+
+Only the module a subcommand needs is imported, and only once it runs:
+verify and bench never load openai, pygame or tqdm, so they start quickly
+and work without them.
+"""
+import os
+import sys
+import json
+import argparse
+import dataclasses
+from functools import partial
+from maker.config import RunConfig, parse_setting
+
+ENV_PREFIX = "MAKER_"
+
+
+def _add_config_flags(parser: argparse.ArgumentParser):
+    group = parser.add_argument_group("run settings (default: $MAKER_<NAME>, then maker/config.py)")
+    defaults = RunConfig()
+    for f in dataclasses.fields(RunConfig):
+        flag = "--" + f.name.replace("_", "-")
+        help = f"${ENV_PREFIX}{f.name.upper()}; default {getattr(defaults, f.name)!r}"
+        if f.type is bool:
+            group.add_argument(flag, dest=f.name, action=argparse.BooleanOptionalAction,
+                               default=argparse.SUPPRESS, help=help)
+        else:
+            converter = partial(parse_setting, f.name)
+            converter.__name__ = f.type.__name__   # what argparse names in "invalid ... value"
+            group.add_argument(flag, dest=f.name, type=converter, default=argparse.SUPPRESS,
+                               metavar=f.name.upper(), help=help)
+
+
+def _config(args: argparse.Namespace, **overrides) -> RunConfig:
+    names = {f.name for f in dataclasses.fields(RunConfig)}
+    flags = {name: value for name, value in vars(args).items() if name in names}
+    return RunConfig.from_env(prefix=ENV_PREFIX, **{**flags, **overrides})
+
+
+def _read_meta(path: str) -> dict:
+    """meta.json of the journal at path (or of path's parent, for a live view directory)"""
+    for directory in (path, os.path.dirname(os.path.abspath(path))):
+        meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                return json.load(f)
+    return {}
+
+
+def _moves_path(path: str) -> str:
+    return os.path.join(path, "moves.bin") if os.path.isdir(path) else path
+
+
+def _num_disks(path: str, given: int, length: int) -> int:
+    """--num-disks, else the journal's meta.json, else the disk count a complete optimal log would have"""
+    if given:
+        return given
+    if os.path.isdir(path):
+        num_disks = _read_meta(path).get("num_disks")
+        if num_disks:
+            return num_disks
+    if length and (length + 1) & length == 0:
+        return (length + 1).bit_length() - 1
+    return None
+
+
+def cmd_solve(args: argparse.Namespace, **overrides) -> int:
+    config = _config(args, **overrides)
+    from maker.main import main as run
+    from maker.voting import NonRetryableError
+    try:
+        actions, success = run(config)
+    except (ValueError, NonRetryableError) as e:   # e.g. a finished journal, or a cassette with no answer
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 2
+    if actions and args.gui and not config.live_view:
+        from maker.gui_pygame import TowerOfHanoiPygame
+        TowerOfHanoiPygame(actions, config.num_disks)
+    return 0 if success else 1
+
+
+def cmd_resume(args: argparse.Namespace) -> int:
+    config = _config(args, resume=True)
+    journal_path = config.journal_path()
+    if not journal_path:
+        print("ERROR: pass --journal-dir (or set MAKER_JOURNAL_DIR) to say which journal to resume",
+              file=sys.stderr)
+        return 2
+    if not os.path.exists(os.path.join(journal_path, "meta.json")):
+        print(f"ERROR: no journal to resume at {journal_path}", file=sys.stderr)
+        return 2
+    return cmd_solve(args, resume=True)
+
+
+def cmd_verify(args: argparse.Namespace) -> int:
+    from maker.action_log import ActionLog
+    from maker.verify import verify_log
+    moves_path = _moves_path(args.path)
+    if not os.path.exists(moves_path):
+        print(f"ERROR: no move log at {moves_path}", file=sys.stderr)
+        return 2
+    log = ActionLog.open(moves_path, readonly=True)
+    num_disks = _num_disks(args.path, args.num_disks, len(log))
+    if num_disks is None:
+        print(f"ERROR: cannot tell how many disks {moves_path} is for; pass --num-disks", file=sys.stderr)
+        return 2
+    success, _, message = verify_log(log, num_disks)
+    log.close()
+    print(f"{moves_path} ({num_disks} disks): {message}")
+    return 0 if success else 1
+
+
+def cmd_replay(args: argparse.Namespace) -> int:
+    if args.live:
+        from maker.live import STATUS_FILE, run_viewer
+        if not os.path.exists(os.path.join(args.path, STATUS_FILE)):
+            print(f"ERROR: {args.path} is not a live view directory", file=sys.stderr)
+            return 2
+        num_disks = args.num_disks or _read_meta(args.path).get("num_disks")
+        if not num_disks:
+            print("ERROR: pass --num-disks", file=sys.stderr)
+            return 2
+        run_viewer(args.path, num_disks, move_delay=args.move_delay, speed=args.speed)
+        return 0
+
+    from maker.action_log import ActionLog
+    moves_path = _moves_path(args.path)
+    if not os.path.exists(moves_path):
+        print(f"ERROR: no move log at {moves_path}", file=sys.stderr)
+        return 2
+    log = ActionLog.open(moves_path, readonly=True)
+    num_disks = _num_disks(args.path, args.num_disks, len(log))
+    if num_disks is None:
+        print(f"ERROR: cannot tell how many disks {moves_path} is for; pass --num-disks", file=sys.stderr)
+        return 2
+    from maker.gui_pygame import TowerOfHanoiPygame
+    TowerOfHanoiPygame(log, num_disks, move_delay=args.move_delay, speed=args.speed)
+    return 0
+
+
+def _size(text: str) -> tuple:
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height)
+_size.__name__ = "WIDTHxHEIGHT"
+
+
+def cmd_export(args: argparse.Namespace) -> int:
+    from maker.action_log import ActionLog
+    moves_path = _moves_path(args.path)
+    if not os.path.exists(moves_path):
+        print(f"ERROR: no move log at {moves_path}", file=sys.stderr)
+        return 2
+    log = ActionLog.open(moves_path, readonly=True)
+    length = len(log)
+    log.close()
+    num_disks = _num_disks(args.path, args.num_disks, length)
+    if num_disks is None:
+        print(f"ERROR: cannot tell how many disks {moves_path} is for; pass --num-disks", file=sys.stderr)
+        return 2
+    stride = args.stride
+    if args.frames:
+        stop = length if args.stop is None else min(args.stop, length)
+        stride = max(1, -(-(stop - args.start) // args.frames))
+    from maker.export import export
+    try:
+        export(moves_path, num_disks, args.out, stride=stride, start=args.start, stop=args.stop,
+               size=args.size, workers=args.workers, fps=args.fps, codec=args.codec)
+    except RuntimeError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+def cmd_coordinate(args: argparse.Namespace) -> int:
+    config = _config(args)
+    from maker.adaptive import AdaptiveMargin
+    from maker.distributed import Coordinator, run_workers
+    from maker.verify import verify_log
+    from maker.voting import VoteStats
+    stats = VoteStats()
+    policy = AdaptiveMargin.from_config(config) if config.adaptive_k else None
+    try:
+        coordinator = Coordinator(config, args.address, args.authkey, config.speculation_depth,
+                                  args.job_timeout, stats, policy)
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 2
+    host_port = coordinator.start()
+    address = host_port if isinstance(host_port, str) else f"{host_port[0]}:{host_port[1]}"
+    print(f"Workers connect with: python -m maker work --address {address}")
+    workers = run_workers(address, args.workers, args.authkey) if args.workers else []
+    try:
+        actions = coordinator.run()
+    except (ValueError, RuntimeError) as e:   # RuntimeError: a step no sample could answer
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 2
+    finally:
+        coordinator.close()
+        for worker in workers:
+            worker.join(timeout=5)
+    print(f"API calls: {stats.calls}, red flags: {stats.red_flags}, "
+          f"tokens: {stats.prompt_tokens} prompt / {stats.completion_tokens} completion")
+    success, _, message = verify_log(actions, config.num_disks)
+    print(f"Verifying {len(actions)} moves: {message}")
+    return 0 if success else 1
+
+
+def cmd_work(args: argparse.Namespace) -> int:
+    from maker.distributed import run_worker, run_workers
+    if args.processes == 1:
+        stats = run_worker(args.address, args.authkey, args.name)
+        print(f"Worker done: {stats.calls} calls, {stats.red_flags} red flags")
+        return 0
+    for worker in run_workers(args.address, args.processes, args.authkey):
+        worker.join()
+    return 0
+
+
+def cmd_bench(args: argparse.Namespace) -> int:
+    from maker.bench import main as bench
+    return bench(args.argv)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m maker",
+                                     description="MAKER: Massively Decomposed Agentic Processes")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    solve = sub.add_parser("solve", help="solve Tower of Hanoi with voting")
+    solve.add_argument("--gui", action="store_true", help="replay the solution in the pygame viewer")
+    _add_config_flags(solve)
+    solve.set_defaults(run=cmd_solve)
+
+    resume = sub.add_parser("resume", help="continue the run journaled at --journal-dir")
+    resume.add_argument("--gui", action="store_true", help="replay the solution in the pygame viewer")
+    _add_config_flags(resume)
+    resume.set_defaults(run=cmd_resume)
+
+    verify = sub.add_parser("verify", help="check a move log")
+    verify.add_argument("path", help="a journal directory (containing moves.bin) or a move log file")
+    verify.add_argument("--num-disks", type=int, default=None,
+                        help="default: the journal's meta.json, or inferred from a complete log")
+    verify.set_defaults(run=cmd_verify)
+
+    replay = sub.add_parser("replay", help="open a move log in the pygame viewer")
+    replay.add_argument("path", help="a journal directory, a move log file, or with --live a live view directory")
+    replay.add_argument("--num-disks", type=int, default=None)
+    replay.add_argument("--speed", type=int, default=1, choices=(1, 10, 100, 1000, 10000),
+                        help="starting playback speed")
+    replay.add_argument("--move-delay", type=float, default=0.8)
+    replay.add_argument("--live", action="store_true", help="follow a running solver's live view")
+    replay.set_defaults(run=cmd_replay)
+
+    export = sub.add_parser("export", help="render a move log to PNG frames or a video, without a display")
+    export.add_argument("path", help="a journal directory (containing moves.bin) or a move log file")
+    export.add_argument("--out", required=True, help="a directory for PNG frames, or a .mp4/.mkv/.mov/.webm file")
+    export.add_argument("--num-disks", type=int, default=None,
+                        help="default: the journal's meta.json, or inferred from a complete log")
+    export.add_argument("--stride", type=int, default=1, help="moves between frames")
+    export.add_argument("--frames", type=int, default=None, help="about this many frames; overrides --stride")
+    export.add_argument("--start", type=int, default=0, help="first move to draw")
+    export.add_argument("--stop", type=int, default=None, help="last move to draw; default the end of the log")
+    export.add_argument("--size", type=_size, default=(600, 450), help="frame size, e.g. 1280x720")
+    export.add_argument("--workers", type=int, default=None, help="render processes; default one per CPU")
+    export.add_argument("--fps", type=int, default=30)
+    export.add_argument("--codec", default="libx264", help="ffmpeg video codec")
+    export.set_defaults(run=cmd_export)
+
+    coordinate = sub.add_parser("coordinate", help="solve with votes sampled by worker processes")
+    coordinate.add_argument("--address", default="127.0.0.1:50000",
+                            help="host:port or a Unix socket path to serve workers on")
+    coordinate.add_argument("--authkey", default=None, help="default: $MAKER_AUTHKEY")
+    coordinate.add_argument("--workers", type=int, default=0, help="local worker processes to start")
+    coordinate.add_argument("--job-timeout", type=float, default=60.0,
+                            help="seconds before an unanswered job is handed out again")
+    _add_config_flags(coordinate)
+    coordinate.set_defaults(run=cmd_coordinate)
+
+    work = sub.add_parser("work", help="sample votes for a coordinator")
+    work.add_argument("--address", default="127.0.0.1:50000")
+    work.add_argument("--authkey", default=None, help="default: $MAKER_AUTHKEY")
+    work.add_argument("--processes", type=int, default=1)
+    work.add_argument("--name", default=None, help="how the coordinator reports this worker")
+    work.set_defaults(run=cmd_work)
+
+    bench = sub.add_parser("bench", add_help=False, help="microbenchmarks (python -m maker bench -h)")
+    bench.add_argument("argv", nargs=argparse.REMAINDER)
+    bench.set_defaults(run=cmd_bench)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.run(args)
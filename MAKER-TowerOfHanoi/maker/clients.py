@@ -0,0 +1,133 @@
+import os
+import time
+import asyncio
+from types import SimpleNamespace
+from maker.config import RunConfig, openai_api_key
+from maker.voting import BudgetExhausted
+from maker.scheduler import RequestScheduler, estimate_tokens
+
+
+class _BudgetedCompletions:
+    def __init__(self, completions, budget):
+        self._completions = completions
+        self._budget = budget
+
+    def create(self, **kwargs):
+        with self._budget.get_lock():
+            if self._budget.value <= 0:
+                raise BudgetExhausted("Shared request budget exhausted")
+            self._budget.value -= 1
+        # Returns the coroutine unchanged for async clients
+        return self._completions.create(**kwargs)
+
+
+class BudgetedClient:
+    """
+    Wraps a sync or async client so every request draws from a shared budget,
+    a multiprocessing.Value('q') that several processes can hold at once.
+    """
+
+    def __init__(self, client, budget):
+        self.client = client
+        self.schedules_retries = getattr(client, "schedules_retries", False)
+        self.scheduler = getattr(client, "scheduler", None)
+        self.cassette = getattr(client, "cassette", None)
+        self.chat = SimpleNamespace(completions=_BudgetedCompletions(client.chat.completions, budget))
+
+
+class _ScheduledCompletions:
+    def __init__(self, completions, scheduler: RequestScheduler, is_async: bool):
+        self._completions = completions
+        self._scheduler = scheduler
+        self._is_async = is_async
+
+    def create(self, **kwargs):
+        tokens = estimate_tokens(kwargs["messages"], kwargs.get("max_tokens"), kwargs.get("n", 1))
+        if self._is_async:
+            return self._create_async(tokens, kwargs)
+        self._scheduler.acquire(tokens)
+        try:
+            response = self._completions.create(**kwargs)
+        except Exception as e:
+            delay = self._scheduler.failure(e)
+            if delay:
+                time.sleep(delay)
+            raise
+        self._scheduler.success()
+        return response
+
+    async def _create_async(self, tokens: int, kwargs: dict):
+        await self._scheduler.acquire_async(tokens)
+        try:
+            response = await self._completions.create(**kwargs)
+        except Exception as e:
+            delay = self._scheduler.failure(e)
+            if delay:
+                await asyncio.sleep(delay)
+            raise
+        self._scheduler.success()
+        return response
+
+
+class ScheduledClient:
+    """
+    Wraps a sync or async client so every request is admitted by a
+    RequestScheduler, which also does the backoff after a failure; callers
+    can retry straight away (schedules_retries).
+    """
+
+    schedules_retries = True
+
+    def __init__(self, client, scheduler: RequestScheduler, is_async: bool):
+        self.client = client
+        self.scheduler = scheduler
+        self.cassette = getattr(client, "cassette", None)
+        self.chat = SimpleNamespace(completions=_ScheduledCompletions(
+            client.chat.completions, scheduler, is_async))
+
+
+def create_client(config: RunConfig, budget=None, scheduler_state=None):
+    """
+    Build the client config.backend and config.use_async_voting ask for,
+    behind a RequestScheduler (on scheduler_state, if several processes share
+    one) and, given a budget, a BudgetedClient. With config.cassette_path
+    set, the backend's traffic is recorded there, or replayed from there
+    instead of calling the backend (maker.cassette).
+    """
+    cassette_file = config.cassette_file()
+    if cassette_file and config.cassette_mode == "replay":
+        from maker.cassette import ReplayClient
+        client = ReplayClient(cassette_file, config.use_async_voting, config.cassette_match,
+                              config.cassette_speed)
+        return BudgetedClient(client, budget) if budget is not None else client
+
+    if config.backend == "simulated":
+        from maker.simulator import SimulatedClient, AsyncSimulatedClient
+        simulated = AsyncSimulatedClient if config.use_async_voting else SimulatedClient
+        client = simulated(error_rates=config.simulator_error_rates,
+                           latency_median=config.simulator_latency,
+                           rpm=config.simulator_rpm)
+    elif config.backend == "openai":
+        import openai
+        api_key = openai_api_key()
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY is not set")
+        if config.use_async_voting:
+            client = openai.AsyncOpenAI(api_key=api_key)
+        else:
+            client = openai.OpenAI(api_key=api_key)
+    else:
+        raise ValueError(f"Unknown backend {config.backend!r}")
+
+    if cassette_file:
+        if config.cassette_mode != "record":
+            raise ValueError(f"Unknown cassette mode {config.cassette_mode!r}; expected 'record' or 'replay'")
+        from maker.cassette import RecordingClient
+        os.makedirs(os.path.dirname(cassette_file) or ".", exist_ok=True)
+        client = RecordingClient(client, cassette_file, config.use_async_voting)
+
+    scheduler = RequestScheduler(config.rpm_limit, config.tpm_limit, scheduler_state)
+    client = ScheduledClient(client, scheduler, config.use_async_voting)
+    if budget is not None:
+        client = BudgetedClient(client, budget)
+    return client
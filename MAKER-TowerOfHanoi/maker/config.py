@@ -1,18 +1,181 @@
-from dotenv import load_dotenv
+from dataclasses import dataclass, field, fields
 import os
+import json
 
-load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+def openai_api_key() -> str:
+    """OPENAI_API_KEY from the environment or a .env file (python-dotenv, if installed)"""
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    return os.getenv("OPENAI_API_KEY")
 
 
+def __getattr__(name):
+    # Reading .env is left until the key is asked for, so commands that never call the API skip it
+    if name == "OPENAI_API_KEY":
+        return openai_api_key()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+BACKEND = "openai"            # "openai" or "simulated" (maker/simulator.py, no API cost)
 MODEL = "gpt-4.1"
 TEMPERATURE_FIRST = 0    
 TEMPERATURE_REST = 0.1        
 MAX_TOKENS = 750
 NUM_DISKS = 4                 
 K_THRESHOLD = 2              
+ADAPTIVE_K = False            # pick k per step from recent agreement (maker/adaptive.py) instead of K_THRESHOLD
+TARGET_SUCCESS = 0.95         # end-to-end success probability the adaptive margin aims for
+K_MIN = 1
+K_MAX = 8
 USE_RED_FLAGGING = True       
+PROMPT_PROFILE = "full"       # "full" (the paper's templates) or "compact" (maker/prompts.py)
+STRUCTURED_OUTPUT = False     # request JSON-schema output and parse it with parser.parse_structured
+STREAMING = False             # stream completions, stop at the first complete answer
+STREAM_MAX_CHARS = 2000       # streamed answers longer than this are cut off and red-flagged
+STREAM_MAX_PREAMBLE = 1500    # free-text streams with no "move =" by this many characters are cut off too
+USE_ASYNC_VOTING = False      # vote with concurrent requests on an async client (generate_solution_async)
+MAX_IN_FLIGHT = 8             
+MAX_SAMPLES_PER_CALL = 1      # temperature_rest votes per request (n); above 1 needs a backend that honours n
+RPM_LIMIT = None              # account requests per minute; None lets the scheduler find the rate
+TPM_LIMIT = None              # account tokens per minute; None for no token limit
+SPECULATION_DEPTH = 0         # with async voting, start voting on up to this many steps past the committed one
+
+CACHE_PATH = None             # e.g. ".maker_cache.sqlite" to reuse responses across runs; None disables the cache
+CACHE_MAX_ENTRIES = 1_000_000
+CACHE_SAMPLES_PER_KEY = 8
+
+JOURNAL_DIR = None            # e.g. "runs/hanoi-{num_disks}", filled in from the run's settings; None disables checkpointing
+RESUME = False                # continue the journal at JOURNAL_DIR instead of starting a new one
+RESUME_COMPLETED = False      # let RESUME return a finished journal's moves instead of refusing
+
+METRICS_PATH = None           # e.g. "runs/hanoi-{num_disks}/metrics.jsonl"; one JSON record per call and per step
+METRICS_PORT = None           # serve Prometheus text metrics at http://127.0.0.1:<port>/metrics
+
+LIVE_VIEW = False             # follow the run in the pygame viewer while it solves (maker/live.py)
+LIVE_DIR = "runs/hanoi-{num_disks}/live"   # where the solver publishes moves and status for the viewer
+
+CASSETTE_PATH = None          # e.g. "runs/hanoi-{num_disks}/cassette.jsonl.gz"; None neither records nor replays
+CASSETTE_MODE = "record"      # "record" every request and response, or "replay" them instead of calling the backend
+CASSETTE_MATCH = "keyed"      # replay by request ("keyed") or in recorded order ("ordered")
+CASSETTE_SPEED = None         # replay pace: None as fast as possible, 1.0 the recorded latencies, 10.0 ten times faster
+
+SIMULATOR_ERROR_RATES = {"wrong_move": 0.01, "malformed": 0.005,
+                         "inconsistent_state": 0.005, "overlong": 0.002}
+SIMULATOR_LATENCY = 0.5       # median seconds per simulated call
+SIMULATOR_RPM = None          # simulated account rate limit; excess calls get a 429
+
+
+@dataclass
+class RunConfig:
+    """
+    Settings for one MAKER run. Defaults are the module constants above;
+    pass overrides (or dataclasses.replace) to run other configurations
+    side by side, e.g. in maker.sweep.
+    """
+    backend: str = BACKEND
+    model: str = MODEL
+    temperature_first: float = TEMPERATURE_FIRST
+    temperature_rest: float = TEMPERATURE_REST
+    max_tokens: int = MAX_TOKENS
+    num_disks: int = NUM_DISKS
+    k_threshold: int = K_THRESHOLD
+    adaptive_k: bool = ADAPTIVE_K
+    target_success: float = TARGET_SUCCESS
+    k_min: int = K_MIN
+    k_max: int = K_MAX
+    use_red_flagging: bool = USE_RED_FLAGGING
+    prompt_profile: str = PROMPT_PROFILE
+    structured_output: bool = STRUCTURED_OUTPUT
+    streaming: bool = STREAMING
+    stream_max_chars: int = STREAM_MAX_CHARS
+    stream_max_preamble: int = STREAM_MAX_PREAMBLE
+    use_async_voting: bool = USE_ASYNC_VOTING
+    max_in_flight: int = MAX_IN_FLIGHT
+    max_samples_per_call: int = MAX_SAMPLES_PER_CALL
+    rpm_limit: float = RPM_LIMIT
+    tpm_limit: float = TPM_LIMIT
+    speculation_depth: int = SPECULATION_DEPTH
+    cache_path: str = CACHE_PATH
+    cache_max_entries: int = CACHE_MAX_ENTRIES
+    cache_samples_per_key: int = CACHE_SAMPLES_PER_KEY
+    journal_dir: str = JOURNAL_DIR
+    resume: bool = RESUME
+    resume_completed: bool = RESUME_COMPLETED
+    metrics_path: str = METRICS_PATH
+    metrics_port: int = METRICS_PORT
+    live_view: bool = LIVE_VIEW
+    live_dir: str = LIVE_DIR
+    cassette_path: str = CASSETTE_PATH
+    cassette_mode: str = CASSETTE_MODE
+    cassette_match: str = CASSETTE_MATCH
+    cassette_speed: float = CASSETTE_SPEED
+    simulator_error_rates: dict = field(default_factory=lambda: dict(SIMULATOR_ERROR_RATES))
+    simulator_latency: float = SIMULATOR_LATENCY
+    simulator_rpm: float = SIMULATOR_RPM
+
+    @property
+    def num_steps(self) -> int:
+        return 2 ** self.num_disks - 1
+
+    def journal_path(self) -> str:
+        if not self.journal_dir:
+            return None
+        return self.journal_dir.format(**self.__dict__)
+
+    def metrics_file(self) -> str:
+        if not self.metrics_path:
+            return None
+        return self.metrics_path.format(**self.__dict__)
+
+    def cassette_file(self) -> str:
+        if not self.cassette_path:
+            return None
+        return self.cassette_path.format(**self.__dict__)
+
+    def live_path(self) -> str:
+        return self.live_dir.format(**self.__dict__)
+
+    @classmethod
+    def from_env(cls, environ: dict = None, prefix: str = "MAKER_", **overrides) -> "RunConfig":
+        """
+        Defaults, then <prefix><FIELD> environment variables (MAKER_NUM_DISKS=10),
+        then overrides
+        """
+        environ = os.environ if environ is None else environ
+        values = {}
+        for f in fields(cls):
+            text = environ.get(prefix + f.name.upper())
+            if text is not None:
+                values[f.name] = parse_setting(f.name, text)
+        values.update(overrides)
+        return cls(**values)
+
 
+SETTING_TYPES = {f.name: f.type for f in fields(RunConfig)}
 
 
+def parse_setting(name: str, text: str):
+    """
+    Convert a flag or environment string to RunConfig field name's type.
+    "none" gives None (e.g. to disable the cache); dicts are JSON.
+    """
+    kind = SETTING_TYPES[name]
+    lowered = text.strip().lower()
+    if kind is bool:
+        if lowered in ("1", "true", "yes", "on"):
+            return True
+        if lowered in ("0", "false", "no", "off"):
+            return False
+        raise ValueError(f"{name} expects true or false, got {text!r}")
+    if lowered in ("none", "null"):
+        return None
+    if kind is dict:
+        value = json.loads(text)
+        if not isinstance(value, dict):
+            raise ValueError(f"{name} expects a JSON object, got {text!r}")
+        return value
+    return kind(text)
@@ -0,0 +1,488 @@
+"""
+Spread voting over worker processes, on this machine or on others.
+
+The coordinator owns the run: the authoritative state, the step index, every
+step's vote tally and the journal. It serves three objects over a
+multiprocessing manager, at a TCP "host:port" or a Unix socket path:
+
+- jobs: {"job", "frame", "step", "state", "prev_move", "temperature", "n"},
+  each asking for n samples of one step (state is the three peg bitboards).
+- results: {"job", "frame", "worker", "votes": [[move, next_pegs], ...],
+  "stats": {...}}, the votes that passed red-flagging and what they cost.
+- board: the run's settings, which frames are still wanted, and whether
+  the run is over.
+
+Workers are stateless. Each takes a job, samples it with get_votes through
+its own client (so its own connection pool and request scheduler), red-flags
+the answers locally and pushes back the valid votes. Workers may join or
+leave at any time: a job with no result after job_timeout seconds is put on
+the queue again, so a worker that dies mid-call costs only that delay.
+Workers skip jobs for frames the coordinator no longer wants.
+
+One step only needs about k samples, so to keep more workers busy the
+coordinator votes on up to speculation_depth steps past the committed one,
+each starting from the leading move of the step before, as
+generate_solution_async does. When a step's leader changes, the steps
+speculated from it are dropped, and the calls already spent on them count
+as wasted. Throughput grows with workers until the API rate limit, or
+until there is a worker for every sample of a step (k plus red-flag
+retries). Past that point a run is bound by the chain of steps itself: a
+step can only be speculated once the step before it has a leader, which
+takes one model round trip. So no number of workers makes one run go
+faster than about one step per call latency.
+
+    python -m maker coordinate --address 0.0.0.0:50000 --authkey secret --num-disks 10
+    python -m maker work --address coordinator-host:50000 --authkey secret --processes 8
+"""
+import os
+import time
+import queue
+import socket
+import threading
+import multiprocessing
+from multiprocessing.managers import BaseManager
+from typing import List, Tuple, Union
+from maker.config import RunConfig
+from maker.action_log import ActionLog
+from maker.state import HanoiState
+from maker.voting import VoteStats, VoteTally, NonRetryableError, MAX_VOTING_ROUNDS
+
+DEFAULT_ADDRESS = "127.0.0.1:50000"
+STAT_FIELDS = ("calls", "samples", "red_flags", "api_errors", "prompt_tokens", "completion_tokens")
+
+
+def parse_address(address: str) -> Union[Tuple[str, int], str]:
+    """"host:port" -> (host, port) for TCP; anything else is a Unix socket path"""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return host or "127.0.0.1", int(port)
+    return address
+
+
+def _is_local(address: Union[Tuple[str, int], str]) -> bool:
+    return isinstance(address, str) or address[0] in ("127.0.0.1", "localhost", "::1")
+
+
+def authkey_for(address: Union[Tuple[str, int], str], authkey: str = None) -> bytes:
+    """
+    The manager's authkey: authkey, else $MAKER_AUTHKEY. Managers exchange
+    pickles, so listening beyond this machine without a key is refused.
+    """
+    authkey = authkey or os.getenv("MAKER_AUTHKEY")
+    if not authkey:
+        if not _is_local(address):
+            raise ValueError("Pass --authkey or set MAKER_AUTHKEY to listen on a network address")
+        authkey = "maker"
+    return authkey.encode()
+
+
+# ======================================================================
+# Shared objects (they live in the manager's server process)
+# ======================================================================
+
+class _Board:
+    """Run-wide state the workers read: settings, wanted frames, done"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._settings = {}
+        self._live = frozenset()
+        self._done = False
+
+    def settings(self) -> dict:
+        with self._lock:
+            return self._settings
+
+    def set_settings(self, settings: dict):
+        with self._lock:
+            self._settings = settings
+
+    def live(self, frame: int) -> bool:
+        return frame in self._live
+
+    def set_live(self, frames: List[int]):
+        with self._lock:
+            self._live = frozenset(frames)
+
+    def done(self) -> bool:
+        return self._done
+
+    def finish(self):
+        self._done = True
+
+
+_jobs = queue.Queue()
+_results = queue.Queue()
+_board = _Board()
+
+
+def _get_jobs():
+    return _jobs
+
+
+def _get_results():
+    return _results
+
+
+def _get_board():
+    return _board
+
+
+class _CoordinatorManager(BaseManager):
+    pass
+
+
+_CoordinatorManager.register("jobs", callable=_get_jobs)
+_CoordinatorManager.register("results", callable=_get_results)
+_CoordinatorManager.register("board", callable=_get_board)
+
+
+class _WorkerManager(BaseManager):
+    pass
+
+
+_WorkerManager.register("jobs")
+_WorkerManager.register("results")
+_WorkerManager.register("board")
+
+
+# ======================================================================
+# Coordinator
+# ======================================================================
+
+class _Frame:
+    """One step being voted on: the committed next step or a speculative one"""
+
+    def __init__(self, frame_id: int, step: int, state: HanoiState, prev_move: List[int], k: int):
+        self.id = frame_id
+        self.step = step
+        self.state = state
+        self.prev_move = prev_move
+        self.k = k
+        self.stats = VoteStats()
+        self.tally = VoteTally(k, self.stats)
+        self.asked = 0        # samples requested and not yet answered
+        self.launched = 0     # samples requested in all
+        self.decision = None
+        self.started = time.perf_counter()
+
+    def leader(self) -> Tuple[List[int], HanoiState]:
+        if self.decision is not None:
+            return self.decision
+        key = self.tally.leader()
+        return self.tally.vote_mapping[key] if key is not None else None
+
+    def exhausted(self) -> bool:
+        """Every sample the frame may ask for has been asked for and answered"""
+        return self.tally.rounds >= MAX_VOTING_ROUNDS or (
+            self.asked <= 0 and self.launched >= MAX_VOTING_ROUNDS)
+
+
+class Coordinator:
+    """
+    Runs one solution with votes sampled by remote workers; see the module
+    docstring. config supplies the run and voting settings (workers receive
+    the same settings); speculation_depth defaults to config.speculation_depth.
+    stats, policy, metrics and feed behave as in generate_solution.
+    """
+
+    def __init__(self, config: RunConfig, address: str = DEFAULT_ADDRESS, authkey: str = None,
+                 speculation_depth: int = None, job_timeout: float = 60.0,
+                 stats: VoteStats = None, policy=None, metrics=None, feed=None):
+        self.config = config
+        self.address = parse_address(address)
+        self.authkey = authkey_for(self.address, authkey)
+        self.depth = config.speculation_depth if speculation_depth is None else speculation_depth
+        self.job_timeout = job_timeout
+        self.stats = stats if stats is not None else VoteStats()
+        self.policy = policy
+        self.metrics = metrics
+        self.feed = feed
+        self.manager = None
+        self.frames = []
+        self.pending = {}     # job id -> (job, frame, issued at)
+        self.workers = {}     # worker name -> results received
+        self.reissued = 0
+        self.hits = 0
+        self.misses = 0
+        self._next_frame = 0
+        self._next_job = 0
+
+    def start(self):
+        """Start serving the queues; returns the address workers should connect to"""
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+        self.manager = _CoordinatorManager(self.address, self.authkey)
+        self.manager.start()
+        self.jobs = self.manager.jobs()
+        self.results = self.manager.results()
+        self.board = self.manager.board()
+        settings = {name: value for name, value in vars(self.config).items()}
+        self.board.set_settings(settings)
+        self.address = self.manager.address
+        return self.address
+
+    def close(self):
+        if self.manager is not None:
+            try:
+                self.board.finish()
+                time.sleep(0.2)   # let idle workers see it rather than a dropped connection
+            finally:
+                self.manager.shutdown()
+                self.manager = None
+
+    # -- frames ---------------------------------------------------------
+
+    def _new_frame(self, step: int, state: HanoiState, prev_move: List[int]) -> _Frame:
+        k = self.policy.choose(step) if self.policy is not None else self.config.k_threshold
+        self._next_frame += 1
+        frame = _Frame(self._next_frame, step, state, prev_move, k)
+        self.frames.append(frame)
+        return frame
+
+    def _publish_live(self):
+        self.board.set_live([frame.id for frame in self.frames])
+
+    def _discard(self, start: int):
+        """Drop frames[start:], speculated from a move that did not win"""
+        dropped = self.frames[start:]
+        if not dropped:
+            return
+        del self.frames[start:]
+        self.misses += 1
+        ids = {frame.id for frame in dropped}
+        for job_id in [job_id for job_id, (_, frame, _) in self.pending.items() if frame.id in ids]:
+            del self.pending[job_id]
+        for frame in dropped:
+            self.stats.wasted_calls += frame.stats.calls
+        self._publish_live()
+
+    def _issue(self, frame: _Frame, temperature: float, n: int):
+        self._next_job += 1
+        job = {"job": self._next_job, "frame": frame.id, "step": frame.step,
+               "state": list(frame.state.pegs), "prev_move": frame.prev_move,
+               "temperature": temperature, "n": n}
+        self.pending[job["job"]] = (job, frame, time.monotonic())
+        frame.asked += n
+        frame.launched += n
+        self.jobs.put(job)
+
+    def _fill(self, num_steps: int):
+        """Speculate as deep as allowed and ask for the samples each open frame could still need"""
+        grew = False
+        while len(self.frames) <= self.depth:
+            last = self.frames[-1]
+            leader = last.leader()
+            if leader is None or last.step + 1 >= num_steps:
+                break
+            move, next_state = leader
+            self._new_frame(last.step + 1, next_state, move)
+            grew = True
+        if grew:
+            self._publish_live()
+
+        for frame in self.frames:
+            if frame.decision is not None:
+                continue
+            if frame.launched == 0:
+                self._issue(frame, self.config.temperature_first, 1)
+            wanted = min(frame.tally.votes_needed() - frame.asked, MAX_VOTING_ROUNDS - frame.launched)
+            while wanted > 0:
+                n = min(wanted, self.config.max_samples_per_call)
+                self._issue(frame, self.config.temperature_rest, n)
+                wanted -= n
+
+    def _reissue_stale(self):
+        now = time.monotonic()
+        for job_id, (job, frame, issued) in list(self.pending.items()):
+            if now - issued > self.job_timeout:
+                self.pending[job_id] = (job, frame, now)
+                self.reissued += 1
+                self.jobs.put(job)
+
+    def _take(self, result: dict):
+        """Count one worker result into its frame, if the frame is still wanted"""
+        self.workers[result["worker"]] = self.workers.get(result["worker"], 0) + 1
+        stats = VoteStats()
+        for name in STAT_FIELDS:
+            setattr(stats, name, result["stats"].get(name, 0))
+        entry = self.pending.pop(result["job"], None)
+        if entry is None:
+            # A reissued job answered twice, or one for a dropped frame
+            self.stats.wasted_calls += stats.calls
+            return
+        _, frame, _ = entry
+        frame.stats.merge(stats)
+        frame.asked -= entry[0]["n"]
+        if result.get("error"):
+            print(f"  Worker {result['worker']}: {result['error']}")
+        for move, pegs in result["votes"]:
+            if frame.decision is not None:
+                break
+            if frame.tally.add(move, HanoiState(tuple(pegs), self.config.num_disks)):
+                frame.decision = frame.tally.decided()
+        if frame.decision is None and frame.tally.votes and frame.exhausted():
+            frame.decision = frame.tally.fallback()
+
+        index = self.frames.index(frame)
+        leader = frame.leader()
+        if index + 1 < len(self.frames) and leader is not None \
+                and self.frames[index + 1].prev_move != leader[0]:
+            self._discard(index + 1)
+
+    def run(self, initial_state: List[List[int]] = None) -> "ActionLog":
+        """Solve config.num_disks disks with the connected workers; returns the moves"""
+        from tqdm import tqdm
+        from maker.solver import _open_journal
+        config = self.config
+        num_steps = config.num_steps
+        if self.manager is None:
+            self.start()
+        initial_state = initial_state or [list(range(config.num_disks, 0, -1)), [], []]
+        journal, step, state, prev_move, actions = _open_journal(
+            config.journal_path(), config.num_disks, initial_state, config.resume, num_steps,
+            config.resume_completed)
+        if self.feed is not None:
+            self.feed.start(actions)
+
+        print(f"Coordinating {num_steps} steps at {self.address} "
+              f"(speculation depth {self.depth}, job timeout {self.job_timeout:g}s)")
+        progress = tqdm(desc="Solving Tower of Hanoi", initial=step, total=num_steps)
+        try:
+            if step < num_steps:
+                self._new_frame(step, state, prev_move)
+                self._publish_live()
+            while self.frames:
+                front = self.frames[0]
+                if front.decision is None and front.exhausted():
+                    # Nothing is left to ask for, so no result will ever settle it
+                    raise RuntimeError(f"Step {front.step}: no valid votes in "
+                                       f"{front.launched} samples")
+                if self.feed is not None:
+                    self.feed.begin(front.step, front.k, front.stats)
+                self._fill(num_steps)
+                self._reissue_stale()
+                try:
+                    self._take(self.results.get(timeout=0.1))
+                except queue.Empty:
+                    continue
+
+                while self.frames and self.frames[0].decision is not None:
+                    frame = self.frames.pop(0)
+                    move, state = frame.decision
+                    self._commit(frame, journal, actions)
+                    progress.update()
+                    if frame.step < 10 or frame.step % 100 == 0:
+                        tqdm.write(f"Step {frame.step}: Move {move}, State: {state}")
+                    if self.frames and self.frames[0].prev_move == move:
+                        self.hits += 1
+                    else:
+                        self._discard(0)
+                        if frame.step + 1 < num_steps:
+                            self._new_frame(frame.step + 1, state, move)
+                    self._publish_live()
+        finally:
+            progress.close()
+            if journal is not None:
+                journal.close()
+
+        print(f"Final state: {state}")
+        print(self.summary())
+        if self.policy is not None:
+            print(self.policy.summary())
+        return actions
+
+    def _commit(self, frame: _Frame, journal, actions):
+        move, state = frame.decision
+        self.stats.merge(frame.stats)
+        if self.policy is not None:
+            self.policy.observe(frame.step, frame.stats)
+        if self.metrics is not None:
+            self.metrics.step(frame.step, frame.k, frame.stats.votes, frame.stats.calls,
+                              time.perf_counter() - frame.started)
+        if journal is not None:
+            journal.append(frame.step, move, state, frame.stats.votes, frame.stats.calls)
+        else:
+            actions.append(move)
+        if self.feed is not None:
+            self.feed.accept(move)
+
+    def summary(self) -> str:
+        return (f"Workers: {len(self.workers)} contributed {sum(self.workers.values())} results; "
+                f"{self.stats.calls} accepted-path calls, {self.stats.wasted_calls} wasted "
+                f"({self.hits} speculation hits, {self.misses} misses), {self.reissued} jobs reissued")
+
+
+# ======================================================================
+# Workers
+# ======================================================================
+
+def connect(address: str, authkey: str = None, attempts: int = 50) -> _WorkerManager:
+    """Connect to a coordinator, waiting up to attempts * 0.1s for it to come up"""
+    address = parse_address(address) if isinstance(address, str) else address
+    manager = _WorkerManager(address, authkey_for(address, authkey))
+    for attempt in range(attempts):
+        try:
+            manager.connect()
+            return manager
+        except (ConnectionRefusedError, FileNotFoundError):
+            if attempt + 1 == attempts:
+                raise
+            time.sleep(0.1)
+
+
+def run_worker(address: str, authkey: str = None, name: str = None,
+               scheduler_state=None, poll: float = 0.5) -> VoteStats:
+    """
+    Sample jobs from the coordinator at address until the run ends or the
+    coordinator goes away; returns what this worker spent.
+    """
+    from maker.clients import create_client
+    from maker.prompts import get_prompts
+    from maker.voting import get_votes
+    name = name or f"{socket.gethostname()}:{os.getpid()}"
+    manager = connect(address, authkey)
+    jobs, results, board = manager.jobs(), manager.results(), manager.board()
+    # The coordinator's settings, sampled synchronously; a cassette would be shared by every worker
+    config = RunConfig(**{**board.settings(), "use_async_voting": False, "cassette_path": None})
+    client = create_client(config, scheduler_state=scheduler_state)
+    system_prompt, user_template = get_prompts(config.num_disks, config.structured_output,
+                                               config.prompt_profile)
+    total = VoteStats()
+    try:
+        while not board.done():
+            try:
+                job = jobs.get(timeout=poll)
+            except queue.Empty:
+                continue
+            if not board.live(job["frame"]):
+                continue
+            state = HanoiState(tuple(job["state"]), config.num_disks)
+            stats, votes, error = VoteStats(), [], None
+            try:
+                votes = get_votes(client, state, job["prev_move"], job["temperature"], job["n"],
+                                  config.num_disks, system_prompt, user_template, stats,
+                                  config=config, step=job["step"])
+            except (RuntimeError, NonRetryableError) as e:
+                error = str(e)
+            total.merge(stats)
+            results.put({"job": job["job"], "frame": job["frame"], "worker": name,
+                         "votes": [[move, list(next_state.pegs)] for move, next_state in votes],
+                         "stats": {field: getattr(stats, field) for field in STAT_FIELDS},
+                         "error": error})
+    except (EOFError, ConnectionError, OSError):
+        pass   # the coordinator has shut down
+    return total
+
+
+def run_workers(address: str, processes: int, authkey: str = None) -> List[multiprocessing.Process]:
+    """Start processes local workers, sharing one request scheduler state; returns them started"""
+    from maker.scheduler import new_state
+    scheduler_state = new_state(shared=True)
+    workers = []
+    for _ in range(processes):
+        worker = multiprocessing.Process(target=run_worker, args=(address, authkey),
+                                         kwargs={"scheduler_state": scheduler_state}, daemon=True)
+        worker.start()
+        workers.append(worker)
+    return workers
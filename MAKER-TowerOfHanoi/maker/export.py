@@ -0,0 +1,162 @@
+"""
+Headless export of a move log to PNG frames or a video file.
+
+Frame i shows the state after start + i * stride moves (the last frame is
+always the final state), drawn by gui_pygame.HanoiRenderer onto an offscreen
+surface under SDL's dummy video driver, so no display is needed. The frames
+are cut into contiguous chunks and spread over a process pool. Each worker
+builds one ReplayIndex and seeks straight to the first state of every chunk
+it is given, then steps through the chunk: it applies the moves between
+frames one by one when the stride is small, and seeks again when it is
+large. Workers never replay the log from the start.
+
+PNG frames are written as frame_000000.png, ... in the output directory. A
+video (any path ending in a VIDEO_SUFFIXES suffix) needs ffmpeg on PATH.
+Each chunk is encoded to its own segment, with raw frames piped to ffmpeg,
+and the segments are then joined without re-encoding.
+
+    python -m maker export runs/hanoi-20 --out hanoi20.mp4 --frames 20000
+"""
+import os
+import math
+import shutil
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+VIDEO_SUFFIXES = (".mp4", ".mkv", ".mov", ".webm")
+MAX_STEPPED_MOVES = 64     # larger gaps between frames seek instead of applying each move
+CHUNKS_PER_WORKER = 4      # smaller chunks keep every worker busy to the end
+
+_replay = None
+
+
+def frame_steps(total: int, stride: int = 1, start: int = 0, stop: int = None) -> List[int]:
+    """Steps to draw: every stride-th from start, and stop itself (default: the end of the log)"""
+    stop = total if stop is None else min(stop, total)
+    steps = list(range(min(start, stop), stop + 1, max(1, stride)))
+    if steps[-1] != stop:
+        steps.append(stop)
+    return steps
+
+
+def _init_worker(log_path: str, moves: bytes, num_disks: int, keyframe_interval: int):
+    global _replay
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    from maker.action_log import ActionLog
+    from maker.replay import ReplayIndex
+    if log_path is not None:
+        log = ActionLog.open(log_path, readonly=True)
+    else:
+        log = ActionLog.from_bytes(moves)
+    _replay = ReplayIndex(log, num_disks, keyframe_interval)
+
+
+def _render_chunk(first: int, steps: List[int], size: Tuple[int, int], out: str,
+                  video: dict = None) -> int:
+    """Draw frames first, first + 1, ... for steps; returns how many were drawn"""
+    import pygame
+    from maker.gui_pygame import HanoiRenderer
+    replay = _replay
+    total = len(replay)
+    renderer = HanoiRenderer(pygame.Surface(size), replay.num_disks, replay.positions_at(steps[0]))
+    log, positions = replay.log, renderer.positions
+    encoder = None
+    if video is not None:
+        encoder = subprocess.Popen(
+            ["ffmpeg", "-loglevel", "error", "-y", "-f", "rawvideo", "-pix_fmt", "rgb24",
+             "-s", f"{size[0]}x{size[1]}", "-r", str(video["fps"]), "-i", "-", "-threads", "1",
+             "-c:v", video["codec"], "-pix_fmt", "yuv420p", out],
+            stdin=subprocess.PIPE)
+    try:
+        current = steps[0]
+        for i, step in enumerate(steps):
+            if step - current > MAX_STEPPED_MOVES:
+                positions[:] = replay.positions_at(step)
+            else:
+                for disk, _, to_peg in log[current:step]:
+                    if 1 <= disk <= replay.num_disks:
+                        positions[disk - 1] = to_peg
+            current = step
+            disk = log[step][0] if step < total else None
+            renderer.highlight_disk = disk if disk is not None and 1 <= disk <= replay.num_disks else None
+            renderer.draw_frame(step, total)
+            if encoder is not None:
+                encoder.stdin.write(pygame.image.tobytes(renderer.screen, "RGB"))
+            else:
+                pygame.image.save(renderer.screen, os.path.join(out, f"frame_{first + i:06d}.png"))
+    finally:
+        if encoder is not None:
+            encoder.stdin.close()
+            if encoder.wait():
+                raise RuntimeError(f"ffmpeg failed encoding {out}")
+    return len(steps)
+
+
+def export(actions, num_disks: int, out: str, stride: int = 1, start: int = 0, stop: int = None,
+           size: Tuple[int, int] = (600, 450), workers: int = None, fps: int = 30,
+           codec: str = "libx264", keyframe_interval: int = 1024) -> int:
+    """
+    Render the move log actions (an ActionLog, its path, or a list of moves)
+    to PNG frames in the directory out, or to the video file out; see the
+    module docstring. Returns the number of frames.
+    """
+    from maker.verify import _as_log
+    from tqdm import tqdm
+    log_path = actions if isinstance(actions, str) else getattr(actions, "_path", None)
+    log = _as_log(actions)
+    # A file-backed log is mapped by each worker; an in-memory one is sent once to each
+    moves = None if log_path is not None else log.raw().tobytes()
+    steps = frame_steps(len(log), stride, start, stop)
+    total = len(log)
+    if isinstance(actions, str):
+        log.close()
+    workers = workers or os.cpu_count() or 1
+    chunk = max(1, math.ceil(len(steps) / (workers * CHUNKS_PER_WORKER)))
+    chunks = [(first, list(steps[first:first + chunk])) for first in range(0, len(steps), chunk)]
+
+    video, segments_dir = None, None
+    if out.lower().endswith(VIDEO_SUFFIXES):
+        if shutil.which("ffmpeg") is None:
+            raise RuntimeError("Video export needs ffmpeg on PATH; export PNG frames to a directory instead")
+        video = {"fps": fps, "codec": codec}
+        segments_dir = tempfile.mkdtemp(prefix="maker-export-", dir=os.path.dirname(os.path.abspath(out)))
+        suffix = os.path.splitext(out)[1]
+        targets = [os.path.join(segments_dir, f"segment_{first:08d}{suffix}") for first, _ in chunks]
+    else:
+        os.makedirs(out, exist_ok=True)
+        targets = [out] * len(chunks)
+
+    print(f"Exporting {len(steps)} frames of {total} moves (stride {stride}) to {out} "
+          f"with {workers} workers")
+    context = multiprocessing.get_context("spawn")   # pygame is not fork-safe
+    try:
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(log_path, moves, num_disks, keyframe_interval)) as pool:
+            futures = [pool.submit(_render_chunk, first, chunk_steps, size, target, video)
+                       for (first, chunk_steps), target in zip(chunks, targets)]
+            with tqdm(total=len(steps), desc="Rendering frames", unit="frame") as progress:
+                for future in futures:
+                    progress.update(future.result())
+        if video is not None:
+            _concat(targets, out)
+    finally:
+        if segments_dir is not None:
+            shutil.rmtree(segments_dir, ignore_errors=True)
+    return len(steps)
+
+
+def _concat(segments: List[str], out: str):
+    """Join same-format video segments without re-encoding"""
+    listing = out + ".segments.txt"
+    with open(listing, "w") as f:
+        for segment in segments:
+            f.write(f"file '{os.path.abspath(segment)}'\n")
+    try:
+        subprocess.run(["ffmpeg", "-loglevel", "error", "-y", "-f", "concat", "-safe", "0",
+                        "-i", listing, "-c", "copy", out], check=True)
+    finally:
+        os.remove(listing)
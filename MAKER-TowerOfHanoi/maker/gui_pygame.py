@@ -1,132 +1,354 @@
 import pygame
-import sys
 import time
+from maker.replay import ReplayIndex
 
-class TowerOfHanoiPygame:
-    def __init__(self, actions, num_disks, move_delay=0.8):
-        """
-        :param actions: List of moves [[disk, from_peg, to_peg], ...]
-        :param num_disks: Total number of disks
-        :param move_delay: Seconds between moves
-        """
-        self.actions = actions
+SPEEDS = (1, 10, 100, 1000, 10000)   # multiples of one move per move_delay
+MAX_STEPPED_MOVES = 64               # larger playback jumps seek instead of applying each move
+
+HELP = "space play/pause  <- -> step  1-5 / up down speed  home end  r restart  q quit"
+STALL_SECONDS = 30                   # live mode: a step voting this long is shown as stalled
+
+
+class HanoiRenderer:
+    """
+    Draws a tower onto any pygame Surface: the viewer's window, or an
+    offscreen surface when exporting frames (maker.export). positions holds
+    each disk's peg, disk 1 first; highlight_disk is drawn in the highlight
+    colour.
+    """
+
+    def __init__(self, surface, num_disks, positions=None):
+        self.screen = surface
         self.num_disks = num_disks
-        self.move_delay = move_delay
-        self.state = [list(range(num_disks, 0, -1)), [], []]
+        self.positions = bytearray(positions if positions is not None else num_disks)
+        self.highlight_disk = None
+        self.width, self.height = surface.get_size()
 
-        pygame.init()
-        self.width = 600
-        self.height = 450  
-        self.screen = pygame.display.set_mode((self.width, self.height))
-        pygame.display.set_caption("Tower of Hanoi - MAKER Visualizer")
-        self.clock = pygame.time.Clock()
-        
         self.peg_x = [self.width // 6, self.width // 2, 5 * self.width // 6]
-        self.peg_y_bottom = self.height - 80  
-        self.disk_height = 20
-        self.disk_width_factor = 20
+        self.peg_top = 60
+        self.peg_y_bottom = self.height - 80
+        # Disks shrink for large towers so each peg's column stays separate
+        self.disk_height = max(1, min(20, (self.peg_y_bottom - self.peg_top) // num_disks))
+        self.disk_width_factor = max(1, min(20, (self.width // 3 - 10) // num_disks))
+        self.column_width = self.width // 3
+        self.hud_rect = pygame.Rect(0, 0, self.width, self.peg_top - 5)
+        self.slider = pygame.Rect(20, self.height - 45, self.width - 40, 10)
+        self.slider_rect = pygame.Rect(0, self.slider.y - 15, self.width, self.height - self.slider.y + 15)
 
         self.bg_color = (30, 30, 30)
         self.peg_color = (200, 200, 200)
         self.disk_color = (70, 130, 180)
         self.highlight_color = (255, 165, 0)
         self.text_color = (255, 255, 255)
+        self.slider_color = (90, 90, 90)
 
+        if not pygame.font.get_init():
+            pygame.font.init()
         self.font = pygame.font.SysFont(None, 24)
+        self.small_font = pygame.font.SysFont(None, 18)
+
+    def column(self, peg):
+        x = self.peg_x[peg]
+        return pygame.Rect(x - self.column_width // 2, self.peg_top - 5,
+                           self.column_width, self.peg_y_bottom - self.peg_top + 10)
+
+    def draw_peg(self, peg):
+        rect = self.column(peg)
+        self.screen.fill(self.bg_color, rect)
+        x = self.peg_x[peg]
+        pygame.draw.line(self.screen, self.peg_color, (x, self.peg_top), (x, self.peg_y_bottom), 5)
+        height = 0
+        for disk in range(self.num_disks, 0, -1):
+            if self.positions[disk - 1] != peg:
+                continue
+            y = self.peg_y_bottom - height * self.disk_height
+            width = disk * self.disk_width_factor
+            color = self.highlight_color if disk == self.highlight_disk else self.disk_color
+            pygame.draw.rect(
+                self.screen, color,
+                pygame.Rect(x - width // 2, y - self.disk_height, width, self.disk_height)
+            )
+            height += 1
+
+    def draw_progress(self, fraction):
+        """The progress bar along the bottom, without the viewer's key help"""
+        self.screen.fill(self.bg_color, self.slider_rect)
+        pygame.draw.rect(self.screen, self.slider_color, self.slider)
+        filled = self.slider.copy()
+        filled.width = int(self.slider.width * fraction)
+        pygame.draw.rect(self.screen, self.disk_color, filled)
+        knob = (self.slider.x + filled.width, self.slider.centery)
+        pygame.draw.circle(self.screen, self.highlight_color, knob, 7)
+
+    def draw_frame(self, step, total):
+        """The whole picture for the state after step of total moves"""
+        self.screen.fill(self.bg_color)
+        for peg in range(3):
+            self.draw_peg(peg)
+        text = self.font.render(f"Step {step}/{total}", True, self.text_color)
+        self.screen.blit(text, (10, 10))
+        self.draw_progress(step / max(1, total))
+
+
+class TowerOfHanoiPygame(HanoiRenderer):
+    def __init__(self, actions, num_disks, move_delay=0.8, speed=1, keyframe_interval=1024,
+                 live=None, run=True):
+        """
+        :param actions: List of moves [[disk, from_peg, to_peg], ...], an ActionLog or its path
+        :param num_disks: Total number of disks
+        :param move_delay: Seconds between moves at 1x
+        :param speed: Starting speed, one of SPEEDS
+        :param keyframe_interval: Moves between state snapshots once the log leaves the optimal solution
+        :param live: A maker.live.LiveReader to follow instead of actions, while its solver runs
+        :param run: Open the window's event loop now (returns when the window is closed)
+        """
+        self.live = live
+        self.live_status = None
+        self.following = live is not None
+        if live is not None:
+            actions = live.moves
+        self.replay = ReplayIndex(actions, num_disks, keyframe_interval)
+        self.actions = self.replay.log
+        self.move_delay = move_delay
+        self.speed = speed
+        self.playing = True
+
+        pygame.init()
+        screen = pygame.display.set_mode((600, 450))
+        pygame.display.set_caption("Tower of Hanoi - MAKER Visualizer")
+        super().__init__(screen, num_disks, self.replay.positions_at(0))
+        self.clock = pygame.time.Clock()
+        self.slider_hit = self.slider.inflate(20, 16)
+        self.dragging = False
 
         self.move_index = 0
         self.finished = False
+        self.progress = 0.0
         self.last_move_time = time.time()
         self.replay_countdown = 5
         self.countdown_timer = time.time()
+        self.dirty = [self.screen.get_rect()]
 
-        self.run_visualization()
+        if run:
+            self.run_visualization()
 
     def reset_state(self):
         """Reset to initial state for replay"""
-        self.state = [list(range(self.num_disks, 0, -1)), [], []]
-        self.move_index = 0
+        self.seek(0)
         self.finished = False
+        self.playing = True
         self.last_move_time = time.time()
         self.replay_countdown = 5
         self.countdown_timer = time.time()
 
-    def draw_pegs(self):
-        for x in self.peg_x:
-            pygame.draw.line(self.screen, self.peg_color, (x, 50), (x, self.peg_y_bottom), 5)
-
-    def draw_disks(self, highlight_disk=None):
-        for peg_index, peg in enumerate(self.state):
-            for disk_index, disk in enumerate(peg):
-                x = self.peg_x[peg_index]
-                y = self.peg_y_bottom - disk_index * self.disk_height
-                width = disk * self.disk_width_factor
-                color = self.highlight_color if disk == highlight_disk else self.disk_color
-                pygame.draw.rect(
-                    self.screen, color,
-                    pygame.Rect(x - width // 2, y - self.disk_height, width, self.disk_height)
-                )
-        
+    def mark(self, rect):
+        if rect not in self.dirty:
+            self.dirty.append(rect)
+
+    def mark_peg(self, peg):
+        self.mark(self.column(peg))
+
+    def mark_status(self):
+        self.mark(self.hud_rect)
+        self.mark(self.slider_rect)
+
+    def seek(self, step):
+        """Jump to the state after step moves; the whole tower is redrawn"""
+        step = min(max(step, 0), len(self.replay))
+        self.positions[:] = self.replay.positions_at(step)
+        self.move_index = step
+        self.finished = False
+        self.progress = 0.0
+        for peg in range(3):
+            self.mark_peg(peg)
+        self.mark_status()
+
+    def animate_move(self):
+        if self.move_index >= len(self.replay):
+            return False
+        disk, from_peg, to_peg = self.actions[self.move_index]
+        if 1 <= disk <= self.num_disks:
+            self.mark_peg(self.positions[disk - 1])
+            self.positions[disk - 1] = to_peg
+            self.mark_peg(to_peg)
+        self.move_index += 1
+        self.mark_status()
+        return True
+
+    def advance(self, moves):
+        """Play moves forward, one at a time for small steps, by seeking for large ones"""
+        target = min(self.move_index + moves, len(self.replay))
+        if target - self.move_index > MAX_STEPPED_MOVES:
+            self.seek(target)
+        else:
+            while self.move_index < target:
+                self.animate_move()
+
+    def draw_live_status(self):
+        status = self.live_status
+        if status is None:
+            return
+        if status["done"]:
+            line, color = f"Run finished: {status['accepted']} moves", (0, 255, 0)
+        else:
+            seconds = time.time() - status["started"]
+            leader = status["leader"] or "-"
+            line = (f"Voting step {status['step']} (k={status['k']}): {leader} "
+                    f"{status['leader_votes']} vs {status['runner_up']}, {status['calls']} calls, "
+                    f"{status['red_flags']} red flags, {seconds:.0f}s")
+            color = (255, 80, 80) if seconds > STALL_SECONDS else self.text_color
+        self.screen.blit(self.small_font.render(line, True, color), (10, 34))
+
+    def draw_status(self):
+        self.screen.fill(self.bg_color, self.hud_rect)
         if not self.finished:
-            text = self.font.render(f"Step {self.move_index}/{len(self.actions)}", True, self.text_color)
+            state = "" if self.playing else "  (paused)"
+            if self.following:
+                state = "  (live)"
+            text = self.font.render(f"Step {self.move_index}/{len(self.replay)}  {self.speed}x{state}",
+                                    True, self.text_color)
             self.screen.blit(text, (10, 10))
+            self.draw_live_status()
         else:
             finished_text = self.font.render("SOLVED! Replaying in:", True, (0, 255, 0))
             self.screen.blit(finished_text, (self.width//2 - finished_text.get_width()//2, 10))
+            countdown_text = self.font.render(f"{self.replay_countdown}...", True, (255, 255, 0))
+            self.screen.blit(countdown_text, (self.width//2 - countdown_text.get_width()//2, 35))
 
-    def animate_move(self):
-        if self.move_index >= len(self.actions):
-            self.finished = True
+        self.draw_progress(self.move_index / max(1, len(self.replay)))
+        help_text = self.small_font.render(HELP, True, self.slider_color)
+        self.screen.blit(help_text, (self.width//2 - help_text.get_width()//2, self.slider.bottom + 8))
+
+    def update_highlight(self):
+        disk = None
+        if not self.finished and self.move_index < len(self.replay):
+            disk = self.actions[self.move_index][0]
+            if not 1 <= disk <= self.num_disks:
+                disk = None
+        if disk != self.highlight_disk:
+            for d in (self.highlight_disk, disk):
+                if d is not None:
+                    self.mark_peg(self.positions[d - 1])
+            self.highlight_disk = disk
+
+    def redraw(self):
+        """Repaint only the regions marked dirty since the last frame"""
+        self.update_highlight()
+        if not self.dirty:
+            return
+        full = self.screen.get_rect() in self.dirty
+        if full:
+            self.screen.fill(self.bg_color)
+        pegs = [p for p in range(3) if full or self.column(p).collidelist(self.dirty) != -1]
+        for peg in pegs:
+            self.draw_peg(peg)
+        self.draw_status()
+        if full:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.dirty)
+        self.dirty = []
+
+    def seek_to_mouse(self, x):
+        fraction = (x - self.slider.x) / self.slider.width
+        self.seek(round(min(max(fraction, 0.0), 1.0) * len(self.replay)))
+
+    def set_speed(self, speed):
+        self.speed = speed
+        self.progress = 0.0
+        self.mark_status()
+
+    def poll_live(self):
+        """Take in the solver's new moves and status; when following, jump to the newest move"""
+        if self.live.refresh() != len(self.replay):
+            self.replay.update()
+            self.mark_status()
+        status = self.live.status()
+        if status != self.live_status:
+            self.live_status = status
+            self.mark_status()
+        if self.following and self.move_index < len(self.replay):
+            # Moves that arrived since the last frame are drawn as one frame
+            self.advance(len(self.replay) - self.move_index)
+
+    def handle_key(self, key):
+        if key not in (pygame.K_q, pygame.K_UP, pygame.K_DOWN) and not (
+                pygame.K_1 <= key < pygame.K_1 + len(SPEEDS)):
+            self.following = False
+        if key == pygame.K_r:
+            self.reset_state()
+        elif key == pygame.K_q:
             return False
-        disk, from_peg, to_peg = self.actions[self.move_index]
-        self.state[from_peg].pop()
-        self.state[to_peg].append(disk)
-        self.move_index += 1
+        elif key == pygame.K_SPACE:
+            self.playing = not self.playing
+            self.last_move_time = time.time()
+            self.mark_status()
+        elif key in (pygame.K_LEFT, pygame.K_RIGHT):
+            self.playing = False
+            self.seek(self.move_index + (1 if key == pygame.K_RIGHT else -1))
+        elif key == pygame.K_HOME:
+            self.seek(0)
+        elif key == pygame.K_END:
+            self.seek(len(self.replay))
+            self.following = self.live is not None
+        elif key in (pygame.K_UP, pygame.K_DOWN):
+            i = SPEEDS.index(self.speed) if self.speed in SPEEDS else 0
+            i = min(i + 1, len(SPEEDS) - 1) if key == pygame.K_UP else max(i - 1, 0)
+            self.set_speed(SPEEDS[i])
+        elif pygame.K_1 <= key < pygame.K_1 + len(SPEEDS):
+            self.set_speed(SPEEDS[key - pygame.K_1])
         return True
 
     def run_visualization(self):
         running = True
 
         while running:
-            self.screen.fill(self.bg_color)
-            self.draw_pegs()
-            
-            highlight_disk = None
-            if not self.finished and self.move_index < len(self.actions):
-                highlight_disk = self.actions[self.move_index][0]
-            
-            self.draw_disks(highlight_disk=highlight_disk)
-            
-            if self.finished:
-                countdown_text = self.font.render(f"{self.replay_countdown}...", True, (255, 255, 0))
-                self.screen.blit(countdown_text, (self.width//2 - countdown_text.get_width()//2, 40))
-                
-                current_time = time.time()
-                if current_time - self.countdown_timer > 1:  
-                    self.replay_countdown -= 1
-                    self.countdown_timer = current_time
-                    
-                if self.replay_countdown <= 0:
-                    self.reset_state()
-
-            pygame.display.flip()
+            self.redraw()
             self.clock.tick(60)
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
                 elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_r: 
-                        self.reset_state()
-                    elif event.key == pygame.K_q:  
-                        running = False
+                    running = self.handle_key(event.key)
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    if self.slider_hit.collidepoint(event.pos):
+                        self.dragging = True
+                        self.following = False
+                        self.seek_to_mouse(event.pos[0])
+                elif event.type == pygame.MOUSEMOTION and self.dragging:
+                    self.seek_to_mouse(event.pos[0])
+                elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                    self.dragging = False
 
-            if not self.finished and (time.time() - self.last_move_time) >= self.move_delay:
-                self.animate_move()
-                self.last_move_time = time.time()
+            now = time.time()
+            if self.live is not None:
+                self.poll_live()
+            if self.finished:
+                if now - self.countdown_timer > 1:
+                    self.replay_countdown -= 1
+                    self.countdown_timer = now
+                    self.mark_status()
+                if self.replay_countdown <= 0:
+                    self.reset_state()
+            elif self.playing and not self.dragging and not self.following:
+                # Fractional moves carry over, so every speed keeps its exact rate
+                self.progress += (now - self.last_move_time) * self.speed / self.move_delay
+                moves = int(self.progress)
+                self.progress -= moves
+                if moves:
+                    self.advance(moves)
+                if self.move_index >= len(self.replay) and self.live is not None:
+                    self.following = True
+                    self.mark_status()
+                elif self.move_index >= len(self.replay):
+                    self.finished = True
+                    self.replay_countdown = 5
+                    self.countdown_timer = now
+                    self.mark_status()
+            self.last_move_time = now
 
         pygame.quit()
-        sys.exit()
 
 
 if __name__ == "__main__":
@@ -139,4 +361,4 @@ if __name__ == "__main__":
         [2, 1, 2],
         [1, 0, 2]
     ]
-    TowerOfHanoiPygame(example_actions, num_disks=3)
\ No newline at end of file
+    TowerOfHanoiPygame(example_actions, num_disks=3)
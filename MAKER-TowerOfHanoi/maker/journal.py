@@ -0,0 +1,144 @@
+import os
+import json
+from typing import List, Tuple
+from maker.action_log import ActionLog
+from maker.state import HanoiState
+
+
+def _atomic_write_json(path: str, payload: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(payload, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _apply_move(state: HanoiState, move: List[int], step: int) -> HanoiState:
+    try:
+        return state.apply(move)
+    except ValueError as e:
+        raise ValueError(f"Journal is inconsistent at step {step}: {e}") from e
+
+
+class Journal:
+    """
+    Crash-safe record of a generate_solution run, kept in one directory:
+
+    - journal.jsonl: one line per accepted step (move, vote tallies, calls),
+      fsync'd every sync_every steps and on close.
+    - moves.bin: the accepted moves as a file-backed ActionLog; the journal
+      is authoritative and the log is cut back to it on resume.
+    - snapshot.json: the state after some committed step and the journal
+      offset just past it, rewritten atomically every snapshot_every steps.
+    - meta.json: the run parameters the journal was started with.
+
+    Resuming restores the snapshot and replays only the journal lines written
+    after it, so it does not get slower as the run gets longer; the moves
+    themselves are memory-mapped from moves.bin rather than re-read.
+    """
+
+    def __init__(self, path: str, num_disks: int, sync_every: int = 100,
+                 snapshot_every: int = 10000):
+        self.path = path
+        self.num_disks = num_disks
+        self.sync_every = sync_every
+        self.snapshot_every = snapshot_every
+        self.journal_path = os.path.join(path, "journal.jsonl")
+        self.snapshot_path = os.path.join(path, "snapshot.json")
+        self.meta_path = os.path.join(path, "meta.json")
+        self.moves_path = os.path.join(path, "moves.bin")
+        self.actions = None
+        self._file = None
+        self._unsynced = 0
+
+    def exists(self) -> bool:
+        return os.path.exists(self.meta_path)
+
+    def start(self, initial_state: HanoiState):
+        """Begin a new journal; refuses to overwrite an existing one"""
+        if self.exists():
+            raise ValueError(f"Journal {self.path} already exists; resume it or pick another path")
+        os.makedirs(self.path, exist_ok=True)
+        _atomic_write_json(self.meta_path, {"num_disks": self.num_disks,
+                                            "initial_state": initial_state.to_lists()})
+        self._file = open(self.journal_path, "wb")
+        self.actions = ActionLog.open(self.moves_path)
+
+    def resume(self) -> Tuple[int, HanoiState, List[int], ActionLog]:
+        """Return (next_step, state, prev_move, actions) from the last committed step"""
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        if meta["num_disks"] != self.num_disks:
+            raise ValueError(f"Journal {self.path} was written for {meta['num_disks']} disks, "
+                             f"not {self.num_disks}")
+
+        step, state, prev_move, offset = 0, meta["initial_state"], None, 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+            step, state = snapshot["step"], snapshot["state"]
+            prev_move, offset = snapshot["prev_move"], snapshot["offset"]
+        state = HanoiState.from_lists(state, self.num_disks)
+
+        with open(self.journal_path, "r+b") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn write from a crash
+                record = json.loads(line)
+                state = _apply_move(state, record["move"], record["step"])
+                step, prev_move = record["step"] + 1, record["move"]
+                offset += len(line)
+            f.truncate(offset)
+
+        self._file = open(self.journal_path, "ab")
+        self.actions = ActionLog.open(self.moves_path)
+        if len(self.actions) >= step:
+            self.actions.truncate(step)
+        else:
+            # moves.bin lost writes the journal kept (e.g. a power cut): rebuild it
+            self.actions.truncate(0)
+            self.actions.extend(record["move"] for record in self.read_records())
+        return step, state, prev_move, self.actions
+
+    def append(self, step: int, move: List[int], state: HanoiState,
+               votes: dict = None, calls: int = None):
+        self.actions.append(move)
+        votes = {str(list(key)): count for key, count in (votes or {}).items()}
+        record = {"step": step, "move": move, "votes": votes, "calls": calls}
+        self._file.write(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n")
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+        if (step + 1) % self.snapshot_every == 0:
+            self.snapshot(step + 1, state, move)
+
+    def sync(self):
+        self.actions.flush()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def snapshot(self, next_step: int, state: HanoiState, prev_move: List[int]):
+        self.sync()
+        _atomic_write_json(self.snapshot_path, {
+            "step": next_step,
+            "state": state.to_lists(),
+            "prev_move": prev_move,
+            "offset": self._file.tell(),
+        })
+
+    def read_records(self):
+        """Yield every committed journal record, e.g. to analyse vote tallies"""
+        with open(self.journal_path, "rb") as f:
+            for line in f:
+                if line.endswith(b"\n"):
+                    yield json.loads(line)
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+            self.actions.close()
@@ -0,0 +1,152 @@
+"""
+Live view of a running solver.
+
+The solver side, LiveFeed, publishes into a directory that a viewer in
+another process tails without ever holding a lock the solver waits on:
+
+- moves.bin: the accepted moves as a file-backed ActionLog. Appending a move
+  bumps the count in its header, which is what makes the move visible.
+- status.bin: one fixed-size record describing the step being voted on
+  (step, k, calls, samples, red flags, the two leading tallies and the
+  leading move). A daemon thread rewrites it every interval seconds from
+  the step's VoteStats, so voting itself pays nothing for it. The record is
+  guarded by a sequence number that is odd while it is being written;
+  readers retry until they see the same even number before and after.
+
+LiveReader is the viewer side; run_viewer opens TowerOfHanoiPygame on it.
+"""
+import os
+import mmap
+import time
+import struct
+import threading
+from typing import List
+from maker.action_log import ActionLog
+from maker.voting import VoteStats
+
+MAGIC = b"HANOILIV"
+# magic, sequence, step, k, calls, samples, red flags, leader votes, runner-up votes,
+# accepted moves, leader disk, from peg, to peg, step started, last update, done
+STATUS = struct.Struct("<8sQ8q3Bdd?")
+SEQUENCE = struct.Struct("<Q")
+
+MOVES_FILE = "moves.bin"
+STATUS_FILE = "status.bin"
+
+
+def _open_status(path: str, writable: bool) -> mmap.mmap:
+    if writable:
+        # Swapped in whole, so a viewer never maps a half-written file
+        with open(path + ".tmp", "wb") as f:
+            f.write(STATUS.pack(MAGIC, 0, -1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0.0, 0.0, False))
+        os.replace(path + ".tmp", path)
+    with open(path, "r+b" if writable else "rb") as f:
+        return mmap.mmap(f.fileno(), STATUS.size,
+                         access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+
+
+class LiveFeed:
+    """Solver-side publisher; see the module docstring"""
+
+    def __init__(self, path: str, interval: float = 0.1):
+        self.path = path
+        self.interval = interval
+        os.makedirs(path, exist_ok=True)
+        moves_path = os.path.join(path, MOVES_FILE)
+        if os.path.exists(moves_path):
+            os.remove(moves_path)
+        self.moves = ActionLog.open(moves_path)
+        self._status = _open_status(os.path.join(path, STATUS_FILE), writable=True)
+        self._sequence = 0
+        self._step = -1
+        self._k = 0
+        self._stats = None
+        self._started = 0.0
+        self._done = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, actions: List[List[int]] = ()):
+        """Publish the moves a resumed run already has and start the status thread"""
+        self.moves.extend(actions)
+        self._thread = threading.Thread(target=self._publish_loop, daemon=True)
+        self._thread.start()
+
+    def begin(self, step: int, k: int, stats: VoteStats):
+        """The solver is now voting on step with margin k, counting into stats"""
+        self._step, self._k, self._stats, self._started = step, k or 0, stats, time.time()
+
+    def accept(self, move: List[int]):
+        self.moves.append(move)
+
+    def _publish_loop(self):
+        while not self._stop.wait(self.interval):
+            self.publish()
+
+    def publish(self):
+        stats = self._stats
+        votes = dict(stats.votes) if stats is not None else {}
+        ranked = sorted(votes.items(), key=lambda item: -item[1]) + [((0, 0, 0), 0)] * 2
+        (leader, leader_votes), (_, runner_up) = ranked[0], ranked[1]
+        calls = stats.calls if stats is not None else 0
+        samples = stats.samples if stats is not None else 0
+        red_flags = stats.red_flags if stats is not None else 0
+        self._sequence += 1
+        SEQUENCE.pack_into(self._status, 8, self._sequence)
+        STATUS.pack_into(self._status, 0, MAGIC, self._sequence, self._step, self._k, calls,
+                         samples, red_flags, leader_votes, runner_up, len(self.moves),
+                         *leader, self._started, time.time(), self._done)
+        self._sequence += 1
+        SEQUENCE.pack_into(self._status, 8, self._sequence)
+
+    def close(self):
+        """Mark the run finished and stop publishing"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._done = True
+        self._stats = None
+        self.publish()
+        self.moves.close()
+        self._status.close()
+
+
+class LiveReader:
+    """Viewer-side, read-only view of a LiveFeed directory"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.moves = ActionLog.open(os.path.join(path, MOVES_FILE), readonly=True)
+        self._status = _open_status(os.path.join(path, STATUS_FILE), writable=False)
+
+    def refresh(self) -> int:
+        """Pick up newly accepted moves; returns how many there are"""
+        return self.moves.refresh()
+
+    def status(self, attempts: int = 100) -> dict:
+        """The latest consistent status record, or None if none could be read"""
+        for _ in range(attempts):
+            before = SEQUENCE.unpack_from(self._status, 8)[0]
+            if before % 2:
+                continue
+            record = STATUS.unpack_from(self._status, 0)
+            if SEQUENCE.unpack_from(self._status, 8)[0] == before:
+                break
+        else:
+            return None
+        (_, _, step, k, calls, samples, red_flags, leader_votes, runner_up, accepted,
+         disk, from_peg, to_peg, started, updated, done) = record
+        return {"step": step, "k": k, "calls": calls, "samples": samples,
+                "red_flags": red_flags, "leader_votes": leader_votes, "runner_up": runner_up,
+                "accepted": accepted, "leader": [disk, from_peg, to_peg] if leader_votes else None,
+                "started": started, "updated": updated, "done": done}
+
+    def close(self):
+        self.moves.close()
+        self._status.close()
+
+
+def run_viewer(path: str, num_disks: int, **gui_kwargs):
+    """Open the pygame viewer on a LiveFeed directory (blocks; meant for its own process)"""
+    from maker.gui_pygame import TowerOfHanoiPygame
+    TowerOfHanoiPygame(None, num_disks, live=LiveReader(path), **gui_kwargs)
@@ -1,68 +1,120 @@
+import os
 import time
-import openai
-from maker.gui_pygame import TowerOfHanoiPygame  # Correct class name
+import multiprocessing
+from maker.config import RunConfig
+from maker.cache import ResponseCache
+from maker.clients import create_client
+from maker.solver import solve
+from maker.verify import verify_log
+from maker.voting import VoteStats
+from maker.metrics import Metrics
+from maker.live import LiveFeed, run_viewer
 
-from maker.config import (
-    OPENAI_API_KEY,
-    NUM_DISKS,
-    K_THRESHOLD,
-    MODEL,
-    USE_RED_FLAGGING,
-    TEMPERATURE_FIRST,
-    TEMPERATURE_REST,
-    MAX_TOKENS
-)
-
-from maker.prompts import SYSTEM_PROMPT, get_user_template
-from maker.solver import generate_solution, verify_solution
-
-def main():
-    if not OPENAI_API_KEY:
-        print("ERROR: Please set OPENAI_API_KEY in maker/config.py")
+def main(config: RunConfig = None):
+    config = config or RunConfig()
+    try:
+        client = create_client(config)
+    except ValueError as e:
+        print(f"ERROR: {e}. Please set OPENAI_API_KEY in .env or pick the simulated backend (--backend simulated)")
         return None, None
 
-    client = openai.OpenAI(api_key=OPENAI_API_KEY)
-    initial_state = [list(range(NUM_DISKS, 0, -1)), [], []]
-    num_steps = 2**NUM_DISKS - 1
-    user_template = get_user_template(NUM_DISKS)
+    cache = None
+    if config.cache_path:
+        cache = ResponseCache(config.cache_path, config.cache_max_entries, config.cache_samples_per_key)
 
     print("=" * 70)
     print("MAKER: Massively Decomposed Agentic Processes")
     print("=" * 70)
-    print(f"Model: {MODEL}")
-    print(f"Number of disks: {NUM_DISKS}")
-    print(f"Strategy: {'ODD = counter-clockwise' if NUM_DISKS % 2 else 'EVEN = clockwise'}")
-    print(f"Total optimal steps: {num_steps}")
-    print(f"Voting threshold k = {K_THRESHOLD}")
-    print(f"Temperature_first = {TEMPERATURE_FIRST}, Temperature_rest = {TEMPERATURE_REST}")
-    print(f"Red-flagging enabled: {USE_RED_FLAGGING}")
+    print(f"Model: {config.model} ({config.backend} backend)")
+    print(f"Number of disks: {config.num_disks}")
+    print(f"Strategy: {'ODD = counter-clockwise' if config.num_disks % 2 else 'EVEN = clockwise'}")
+    print(f"Total optimal steps: {config.num_steps}")
+    if config.adaptive_k:
+        print(f"Voting threshold k: adaptive in [{config.k_min}, {config.k_max}] "
+              f"for {config.target_success:.0%} end-to-end success")
+    else:
+        print(f"Voting threshold k = {config.k_threshold}")
+    print(f"Temperature_first = {config.temperature_first}, Temperature_rest = {config.temperature_rest}")
+    print(f"Red-flagging enabled: {config.use_red_flagging}")
+    print(f"Prompt profile: {config.prompt_profile}")
+    print(f"Structured output: {config.structured_output}, streaming: {config.streaming} "
+          f"(cut off past {config.stream_max_chars} characters)")
+    print(f"Concurrent voting: {config.use_async_voting} (max in flight = {config.max_in_flight}, "
+          f"speculation depth = {config.speculation_depth})")
+    print(f"Journal: {config.journal_path()} (resume = {config.resume})")
+    if config.cassette_file():
+        print(f"Cassette: {config.cassette_mode} {config.cassette_file()} ({config.cassette_match}, "
+              f"speed {config.cassette_speed or 'unpaced'})")
+    print(f"Metrics: {config.metrics_file()}"
+          + (f", http://127.0.0.1:{config.metrics_port}/metrics" if config.metrics_port else ""))
+    if config.live_view:
+        print(f"Live view: {config.live_path()}")
     print("=" * 70)
 
+    feed, viewer = None, None
+    if config.live_view:
+        # The viewer only reads the feed's memory-mapped files, so it can never hold up the solver
+        feed = LiveFeed(config.live_path())
+        viewer = multiprocessing.get_context("spawn").Process(
+            target=run_viewer, args=(feed.path, config.num_disks), daemon=True)
+        viewer.start()
+
     start = time.time()
-    actions = generate_solution(
-        client,
-        initial_state,
-        num_steps,
-        K_THRESHOLD,
-        NUM_DISKS,
-        SYSTEM_PROMPT,
-        user_template
-    )
+    stats = VoteStats()
+    metrics_file = config.metrics_file()
+    if metrics_file:
+        os.makedirs(os.path.dirname(metrics_file) or ".", exist_ok=True)
+    metrics = Metrics(metrics_file)
+    server = metrics.serve(config.metrics_port) if config.metrics_port else None
+    try:
+        actions = solve(client, config, cache, stats, metrics, feed)
+    finally:
+        if feed is not None:
+            feed.close()
+        metrics.close()
+        if server is not None:
+            server.shutdown()
+        cassette = getattr(client, "cassette", None)
+        if cassette is not None:
+            cassette.close()
+        if cache is not None:
+            cache_stats = cache.stats()
+            cache.close()
     elapsed = time.time() - start
     print(f"\nCompleted in {elapsed:.1f} seconds ({elapsed/60:.1f} min)")
+    print(f"API calls: {stats.calls}, red flags: {stats.red_flags}, "
+          f"tokens: {stats.prompt_tokens} prompt / {stats.completion_tokens} completion")
+    if config.streaming:
+        print(stats.stream_summary())
+    print(metrics.summary())
+    scheduler = getattr(client, "scheduler", None)
+    if scheduler is not None:
+        print(scheduler.summary())
+    if cassette is not None:
+        print(cassette.summary())
+    if cache is not None:
+        print(f"Response cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+              f"({cache_stats['hit_rate']:.1%} hit rate)")
 
-    success = verify_solution(actions, NUM_DISKS)
+    print(f"\nVerifying {len(actions)} moves...")
+    success, _, message = verify_log(actions, config.num_disks)
+    print(f" {message}")
     if success:
         print("\n SUCCESS! Solution verified Yaaaaaayyyyyyy!!!!!! Gloraaaaaayyyyy!!!!!!. Of course thanks to MAKER's creators.")
     else:
         print("\n Solution contains errors.")
 
+    if viewer is not None:
+        print("Close the live view window to exit.")
+        viewer.join()
     return actions, success
 
 if __name__ == "__main__":
+    from maker.gui_pygame import TowerOfHanoiPygame
+
     # Generate actions
     actions, success = main()
 
-    # Launch GUI only if actions were generated successfully
-    if actions:
-        TowerOfHanoiPygame(actions, NUM_DISKS)  # Corrected class name
+    # Launch GUI only if actions were generated successfully (and not already shown live)
+    if actions and not RunConfig().live_view:
+        TowerOfHanoiPygame(actions, RunConfig().num_disks)
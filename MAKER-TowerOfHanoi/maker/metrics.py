@@ -0,0 +1,230 @@
+"""
+Per-call and per-step metrics for the voting pipeline.
+
+Metrics keeps running aggregates for a Prometheus-style text endpoint and a
+summary report, and optionally appends every record to a JSONL file. A
+"call" record is one sample (one choice of a response, or a failed
+request); with n > 1 only the first choice of a request has "request": true,
+and only it carries the request's tokens and counts towards the latency
+histogram:
+
+    {"type": "call", "step": 12, "temperature": 0.1, "latency": 0.41,
+     "prompt_tokens": 412, "completion_tokens": 61, "outcome": "red_flag",
+     "reason": "illegal_move", "cached": false, "request": true}
+    {"type": "step", "step": 12, "k": 2, "rounds": 3, "margin": 2, "calls": 4,
+     "seconds": 0.93}
+
+Hot-path sections (parse, validate, tally) only add to a count and a total,
+so timing them costs two perf_counter calls.
+"""
+import json
+import time
+import threading
+from array import array
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+
+# Substrings of the parser's and HanoiState's ValueError messages, mapped to a small label set
+RED_FLAG_REASONS = (
+    ("No 'move", "no_move"),
+    ("No 'next_state", "no_state"),
+    ("Could not parse", "unparseable"),
+    ("'move' must", "bad_move"),
+    ("Peg indices", "bad_move"),
+    ("same peg", "bad_move"),
+    ("'next_state' must", "bad_state"),
+    ("All entries", "bad_state"),
+    ("exactly once", "bad_state"),
+    ("invalid disk order", "bad_state"),
+    ("Invalid move", "illegal_move"),
+    ("Invalid next_state", "wrong_state"),
+    ("-character budget", "too_long"),
+    ("Runaway whitespace", "off_format"),
+    ("does not start", "off_format"),
+    ("JSON object", "off_format"),
+)
+
+clock = time.perf_counter
+
+
+def red_flag_reason(error: Exception) -> str:
+    """Low-cardinality label for a red-flag ValueError"""
+    message = str(error)
+    for text, reason in RED_FLAG_REASONS:
+        if text in message:
+            return reason
+    return "other"
+
+
+def _percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Metrics:
+    """Aggregates call, step and timer records; thread-safe for the HTTP endpoint"""
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self._file = open(path, "a", buffering=1 << 16) if path else None
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.outcomes = defaultdict(int)
+        self.red_flags = defaultdict(int)
+        self.cached_samples = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies = array("d")
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+        self.steps = 0
+        self.last_step = -1
+        self.rounds_total = 0
+        self.rounds_max = 0
+        self.margins = defaultdict(int)
+        self.step_seconds = 0.0
+        self.timer_counts = defaultdict(int)
+        self.timer_seconds = defaultdict(float)
+
+    def _write(self, record: dict):
+        if self._file is not None:
+            self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def call(self, step: int, temperature: float, latency: float, tokens: Tuple[int, int],
+             outcome: str, reason: str = "", cached: bool = False, request: bool = True):
+        """
+        Record one sample; outcome is accepted, red_flag or api_error.
+        request marks the first sample of a live API request.
+        """
+        with self._lock:
+            self.outcomes[outcome] += 1
+            if outcome == "red_flag":
+                self.red_flags[reason] += 1
+            if cached:
+                self.cached_samples += 1
+            if request:
+                self.requests += 1
+                self.latencies.append(latency)
+                self.latency_sum += latency
+                for i, bound in enumerate(LATENCY_BUCKETS):
+                    if latency <= bound:
+                        self.latency_buckets[i] += 1
+                        break
+            self.prompt_tokens += tokens[0]
+            self.completion_tokens += tokens[1]
+            self._write({"type": "call", "step": step, "temperature": temperature,
+                         "latency": round(latency, 6), "prompt_tokens": tokens[0],
+                         "completion_tokens": tokens[1], "outcome": outcome,
+                         "reason": reason, "cached": cached, "request": request})
+
+    def step(self, step: int, k: int, votes: dict, calls: int, seconds: float):
+        """Record one settled step and its final tally"""
+        ranked = sorted(votes.values(), reverse=True) + [0, 0]
+        rounds, margin = sum(ranked), ranked[0] - ranked[1]
+        with self._lock:
+            self.steps += 1
+            self.last_step = max(self.last_step, step)
+            self.rounds_total += rounds
+            self.rounds_max = max(self.rounds_max, rounds)
+            self.margins[margin] += 1
+            self.step_seconds += seconds
+            self._write({"type": "step", "step": step, "k": k, "rounds": rounds,
+                         "margin": margin, "calls": calls, "seconds": round(seconds, 6)})
+
+    def time(self, section: str, seconds: float):
+        """Add one timing of a hot-path section"""
+        with self._lock:
+            self.timer_counts[section] += 1
+            self.timer_seconds[section] += seconds
+
+    def render(self) -> str:
+        """Prometheus text exposition of the aggregates"""
+        with self._lock:
+            lines = ["# TYPE maker_requests_total counter"]
+            lines.append(f"maker_requests_total {self.requests}")
+            lines.append("# TYPE maker_samples_total counter")
+            lines += [f'maker_samples_total{{outcome="{o}"}} {n}' for o, n in sorted(self.outcomes.items())]
+            lines.append("# TYPE maker_red_flags_total counter")
+            lines += [f'maker_red_flags_total{{reason="{r}"}} {n}' for r, n in sorted(self.red_flags.items())]
+            lines.append("# TYPE maker_cached_samples_total counter")
+            lines.append(f"maker_cached_samples_total {self.cached_samples}")
+            lines.append("# TYPE maker_tokens_total counter")
+            lines.append(f'maker_tokens_total{{kind="prompt"}} {self.prompt_tokens}')
+            lines.append(f'maker_tokens_total{{kind="completion"}} {self.completion_tokens}')
+            lines.append("# TYPE maker_request_latency_seconds histogram")
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, self.latency_buckets):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else bound
+                lines.append(f'maker_request_latency_seconds_bucket{{le="{le}"}} {cumulative}')
+            lines.append(f"maker_request_latency_seconds_sum {self.latency_sum:.6f}")
+            lines.append(f"maker_request_latency_seconds_count {len(self.latencies)}")
+            lines.append("# TYPE maker_steps_total counter")
+            lines.append(f"maker_steps_total {self.steps}")
+            lines.append("# TYPE maker_last_step gauge")
+            lines.append(f"maker_last_step {self.last_step}")
+            lines.append("# TYPE maker_step_rounds_total counter")
+            lines.append(f"maker_step_rounds_total {self.rounds_total}")
+            lines.append("# TYPE maker_step_margin_total counter")
+            lines += [f'maker_step_margin_total{{margin="{m}"}} {n}' for m, n in sorted(self.margins.items())]
+            lines.append("# TYPE maker_section_seconds_total counter")
+            lines += [f'maker_section_seconds_total{{section="{section}"}} {seconds:.6f}'
+                      for section, seconds in sorted(self.timer_seconds.items())]
+            lines.append("# TYPE maker_section_calls_total counter")
+            lines += [f'maker_section_calls_total{{section="{section}"}} {n}'
+                      for section, n in sorted(self.timer_counts.items())]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve render() at GET /metrics from a daemon thread"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode("utf-8")
+                self.send_response(200 if self.path.rstrip("/") in ("", "/metrics") else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def summary(self) -> str:
+        with self._lock:
+            samples = sum(self.outcomes.values())
+            lines = [f"Requests: {self.requests}; samples: {samples} "
+                     f"({', '.join(f'{o} {n}' for o, n in sorted(self.outcomes.items()))}"
+                     f"; {self.cached_samples} from cache)"]
+            if self.red_flags:
+                reasons = sorted(self.red_flags.items(), key=lambda item: -item[1])
+                lines.append("Red flags: " + ", ".join(f"{r} {n}" for r, n in reasons))
+            lines.append(f"Latency: p50 {_percentile(self.latencies, 0.5):.3f}s, "
+                         f"p95 {_percentile(self.latencies, 0.95):.3f}s, "
+                         f"max {max(self.latencies, default=0.0):.3f}s")
+            lines.append(f"Tokens: {self.prompt_tokens} prompt, {self.completion_tokens} completion")
+            if self.steps:
+                margins = ", ".join(f"{m}: {n}" for m, n in sorted(self.margins.items()))
+                lines.append(f"Steps: {self.steps}, {self.rounds_total / self.steps:.2f} rounds on "
+                             f"average (max {self.rounds_max}), "
+                             f"{self.step_seconds / self.steps:.3f}s each; final margins {margins}")
+            for section in sorted(self.timer_counts):
+                lines.append(f"{section}: {self.timer_counts[section]} x "
+                             f"{self.timer_seconds[section] / self.timer_counts[section] * 1e6:.1f}us")
+        return "\n".join(lines)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,53 +1,68 @@
 import re
 import ast
+import json
 from typing import List, Tuple
-
-def parse_move_state_flag(response_text: str, num_disks: int) -> Tuple[List[int], List[List[int]]]:
+from maker.state import HanoiState
+
+# Match square brackets
+MOVE_PATTERN = re.compile(r"(?is)\bmove\b\s*=\s*(\[[^\[\]]*\])")
+MOVE_PREFIX = re.compile(r"(?i)\bmove\b\s*=")
+STATE_PATTERN = re.compile(
+    r"(?is)\bnext_state\b\s*=\s*(\[\s*\[[^\[\]]*\]\s*,\s*\[[^\[\]]*\]\s*,\s*\[[^\[\]]*\]\s*\])"
+)
+
+# response_format for the structured path: exactly {"move": [3 ints], "next_state": [3 int lists]}
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "hanoi_step",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "move": {"type": "array", "items": {"type": "integer"},
+                         "minItems": 3, "maxItems": 3},
+                "next_state": {"type": "array", "minItems": 3, "maxItems": 3,
+                               "items": {"type": "array", "items": {"type": "integer"}}},
+            },
+            "required": ["move", "next_state"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+_decode = json.JSONDecoder().decode
+
+
+def _validate_move(move):
+    if not isinstance(move, list) or len(move) != 3 or not all(isinstance(x, int) for x in move):
+        raise ValueError("'move' must be a list of exactly 3 integers.")
+    if not (0 <= move[1] <= 2 and 0 <= move[2] <= 2):
+        raise ValueError(f"Peg indices must be 0-2, got {move}")
+    if move[1] == move[2]:
+        raise ValueError(f"Cannot move from peg to same peg: {move}")
+    return move
+
+
+def _last_match(pattern: re.Pattern, text: str):
+    match = None
+    for match in pattern.finditer(text):
+        pass
+    return match
+
+
+def parse_move_state_flag(response_text: str, num_disks: int) -> Tuple[List[int], HanoiState]:
     """Red-flagging parser: strict format enforcement"""
-    
-    def _validate_move(move):
-        if not isinstance(move, list) or len(move) != 3 or not all(isinstance(x, int) for x in move):
-            raise ValueError("'move' must be a list of exactly 3 integers.")
-        if not (0 <= move[1] <= 2 and 0 <= move[2] <= 2):
-            raise ValueError(f"Peg indices must be 0-2, got {move}")
-        if move[1] == move[2]:
-            raise ValueError(f"Cannot move from peg to same peg: {move}")
-        return move
-
-    def _validate_state(state, n):
-        if not (isinstance(state, list) and len(state) == 3 and all(isinstance(t, list) for t in state)):
-            raise ValueError("'next_state' must be a list of three lists.")
-        flat = [x for t in state for x in t]
-        if not all(isinstance(x, int) for x in flat):
-            raise ValueError("All entries in 'next_state' must be integers.")
-        if len(flat) != n or set(flat) != set(range(1, n + 1)):
-            missing = sorted(set(range(1, n + 1)) - set(flat))
-            extra = sorted(set(flat) - set(range(1, n + 1)))
-            raise ValueError(f"State must contain 1..{n} exactly once. "
-                           f"Missing: {missing or '[]'}, Extras: {extra or '[]'}")
-        
-        # Validate each peg is sorted (larger disks at bottom)
-        for i, peg in enumerate(state):
-            if peg != sorted(peg, reverse=True):
-                raise ValueError(f"Peg {i} has invalid disk order: {peg}")
-        
-        return state
-
-    # Match square brackets
-    move_pat = re.compile(r"(?is)\bmove\b\s*=\s*(\[[^\[\]]*\])")
-    state_pat = re.compile(
-        r"(?is)\bnext_state\b\s*=\s*(\[\s*\[[^\[\]]*\]\s*,\s*\[[^\[\]]*\]\s*,\s*\[[^\[\]]*\]\s*\])"
-    )
-
-    move_matches = list(move_pat.finditer(response_text))
-    if not move_matches:
+
+    move_match = _last_match(MOVE_PATTERN, response_text)
+    if move_match is None:
         raise ValueError("No 'move = [...]' found.")
-    move_str = move_matches[-1].group(1)
+    move_str = move_match.group(1)
 
-    state_matches = list(state_pat.finditer(response_text))
-    if not state_matches:
+    state_match = _last_match(STATE_PATTERN, response_text)
+    if state_match is None:
         raise ValueError("No 'next_state = [[...],[...],[...]]' found.")
-    state_str = state_matches[-1].group(1)
+    state_str = state_match.group(1)
 
     try:
         move = ast.literal_eval(move_str)
@@ -59,43 +74,38 @@ def parse_move_state_flag(response_text: str, num_disks: int) -> Tuple[List[int]
     except Exception as e:
         raise ValueError("Could not parse 'next_state' as Python lists.") from e
 
-    return _validate_move(move), _validate_state(next_state, num_disks)
+    return _validate_move(move), HanoiState.from_lists(next_state, num_disks)
 
 
-def validate_transition(current_state, move, next_state):
+def parse_structured(response_text: str, num_disks: int) -> Tuple[List[int], HanoiState]:
     """
-    ✅ FIXED: Validates that next_state is EXACTLY the result of applying move to current_state.
-    
-    Key fixes:
-    1. Check legality on CURRENT state (before move)
-    2. Properly simulate the transition
-    3. Compare simulated state with LLM's next_state
+    Red-flagging parser for RESPONSE_FORMAT output.
+
+    One json decode, then the same move and state checks as
+    parse_move_state_flag; anything else in the object is a red flag.
     """
-    disk, from_peg, to_peg = move
+    try:
+        data = _decode(response_text)
+    except ValueError as e:
+        raise ValueError("Could not parse the response as JSON.") from e
+    if not isinstance(data, dict) or data.keys() != {"move", "next_state"}:
+        raise ValueError("Response must be a JSON object with exactly 'move' and 'next_state'.")
+    return _validate_move(data["move"]), HanoiState.from_lists(data["next_state"], num_disks)
 
-    # 1. Validate the move is legal on CURRENT state
-    if not current_state[from_peg]:
-        raise ValueError(f"Invalid move: Peg {from_peg} is empty")
 
-    if current_state[from_peg][-1] != disk:
-        raise ValueError(
-            f"Invalid move: Top disk on peg {from_peg} is "
-            f"{current_state[from_peg][-1]}, not {disk}"
-        )
+def validate_transition(current_state, move, next_state):
+    """
+    Validates that next_state is EXACTLY the result of applying move to current_state.
 
-    # 2. Check destination legality on CURRENT state (before move)
-    if current_state[to_peg] and current_state[to_peg][-1] < disk:
-        raise ValueError(
-            f"Invalid move: Cannot place disk {disk} onto smaller disk "
-            f"{current_state[to_peg][-1]} on peg {to_peg}"
-        )
+    Legality is checked on the CURRENT state (before the move), the move is
+    applied to the bitboards, and the result is compared with the LLM's
+    next_state. Either state may be a HanoiState or nested lists.
+    """
+    if not isinstance(current_state, HanoiState):
+        current_state = HanoiState.from_lists(current_state)
 
-    # 3. Simulate applying the move
-    simulated = [peg[:] for peg in current_state]  # Deep copy
-    simulated[from_peg].pop()
-    simulated[to_peg].append(disk)
+    simulated = current_state.apply(move)
 
-    # 4. Verify LLM's next_state matches simulation
     if simulated != next_state:
         raise ValueError(
             f"Invalid next_state: Does not match applying move {move}.\n"
@@ -103,4 +113,82 @@ def validate_transition(current_state, move, next_state):
             f"Got:      {next_state}"
         )
 
-    return True
\ No newline at end of file
+    return True
+
+
+class StreamScanner:
+    """
+    Incremental check of a streamed response, fed chunk by chunk.
+
+    feed() returns True once the text holds a complete answer (a closed
+    move = [...] and next_state = [[...],[...],[...]] pair, or a closed
+    JSON object in structured mode), so the stream can be closed there and
+    text() handed to the usual parser. It raises ValueError as soon as the
+    text passes max_chars or goes off-format: a run of whitespace longer
+    than max_whitespace, anything before the opening brace in structured
+    mode, or no move = in the first max_preamble characters of free text.
+    """
+
+    def __init__(self, structured: bool = False, max_chars: int = 3000, max_whitespace: int = 64,
+                 max_preamble: int = 1500):
+        self.structured = structured
+        self.max_chars = max_chars
+        self.max_whitespace = max_whitespace
+        self.max_preamble = max_preamble
+        self.parts = []
+        self.chunks = 0
+        self.length = 0
+        self._depth = 0
+        self._started = False
+        self._whitespace = 0
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    def feed(self, chunk: str) -> bool:
+        self.parts.append(chunk)
+        self.chunks += 1
+        self.length += len(chunk)
+        if self.length > self.max_chars:
+            raise ValueError(f"Response passed the {self.max_chars}-character budget.")
+        if self.structured:
+            return self._feed_json(chunk)
+        self._count_whitespace(chunk)
+        if not self._started and self.length > self.max_preamble:
+            # Searched once, when the preamble budget runs out
+            if MOVE_PREFIX.search(self.text()) is None:
+                raise ValueError(f"No 'move =' in the first {self.max_preamble} characters.")
+            self._started = True
+        if "]" not in chunk:
+            return False
+        text = self.text()
+        return STATE_PATTERN.search(text) is not None and MOVE_PATTERN.search(text) is not None
+
+    def _count_whitespace(self, chunk: str):
+        for ch in chunk:
+            if not ch.isspace():
+                self._whitespace = 0
+                continue
+            self._whitespace += 1
+            if self._whitespace > self.max_whitespace:
+                raise ValueError("Runaway whitespace in response.")
+
+    def _feed_json(self, chunk: str) -> bool:
+        for ch in chunk:
+            if ch.isspace():
+                self._whitespace += 1
+                if self._whitespace > self.max_whitespace:
+                    raise ValueError("Runaway whitespace in structured response.")
+                continue
+            self._whitespace = 0
+            if not self._started:
+                if ch != "{":
+                    raise ValueError("Structured response does not start with '{'.")
+                self._started = True
+            if ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    return True
+        return False
@@ -75,9 +75,76 @@ Provide exactly:
 # get_user_template (required by main.py)
 # ======================================================================
 
-def get_user_template(num_disks: int) -> str:
+def get_user_template(num_disks: int, structured: bool = False) -> str:
     """Select correct template based on parity of number of disks."""
     if num_disks % 2 == 1:
-        return ODD_TEMPLATE   # Odd → counter-clockwise
+        template = ODD_TEMPLATE   # Odd → counter-clockwise
     else:
-        return EVEN_TEMPLATE  # Even → clockwise
\ No newline at end of file
+        template = EVEN_TEMPLATE  # Even → clockwise
+    if structured:
+        template = template[:template.index("Provide exactly:")] + STRUCTURED_INSTRUCTIONS
+    return template
+
+
+# ======================================================================
+# Structured output (RunConfig.structured_output, parser.RESPONSE_FORMAT)
+# ======================================================================
+
+STRUCTURED_INSTRUCTIONS = """Respond with only a JSON object:
+{{"move": [disk id, from peg, to peg], "next_state": [[...], [...], [...]]}}
+"""
+
+STRUCTURED_SYSTEM_PROMPT = SYSTEM_PROMPT[:SYSTEM_PROMPT.index("- You MUST output")] + """\
+- You MUST respond with only a JSON object with two keys:
+  "move": [disk id, from peg, to peg]
+  "next_state": [[...], [...], [...]]
+"""
+
+
+def get_system_prompt(structured: bool = False) -> str:
+    return STRUCTURED_SYSTEM_PROMPT if structured else SYSTEM_PROMPT
+
+# ======================================================================
+# Compact profile (RunConfig.prompt_profile = "compact")
+#
+# Everything that is the same for every call of a run (rules, disk 1's
+# direction, answer format) is in the system prompt, so the shared prefix
+# is as long as possible for provider-side prompt caching; the user message
+# is only the previous move and the state, in a terse encoding.
+# ======================================================================
+
+PROMPT_PROFILES = ("full", "compact")
+
+COMPACT_SYSTEM_PROMPT = """Tower of Hanoi: pegs 0,1,2; disks 1 (smallest) to n. Move every disk from peg 0 to peg 2. Move one top disk at a time, never onto a smaller disk.
+Disk 1 moves {direction}: {cycle}.
+Rule: if the previous move was not disk 1, move disk 1. Otherwise move the smallest legal disk other than disk 1.
+Each message gives the previous move [disk,from,to] and each peg's disks, bottom to top.
+"""
+
+COMPACT_ANSWER = """Answer with exactly two lines:
+move = [disk, from, to]
+next_state = [[...], [...], [...]]
+"""
+
+COMPACT_STRUCTURED_ANSWER = """Answer with only a JSON object:
+{"move": [disk, from, to], "next_state": [[...], [...], [...]]}
+"""
+
+COMPACT_USER_TEMPLATE = "Prev: {previous_move}\nState: {current_state}"
+
+
+def get_compact_system_prompt(num_disks: int, structured: bool = False) -> str:
+    if num_disks % 2 == 1:
+        rules = COMPACT_SYSTEM_PROMPT.format(direction="counter-clockwise", cycle="0->2->1->0")
+    else:
+        rules = COMPACT_SYSTEM_PROMPT.format(direction="clockwise", cycle="0->1->2->0")
+    return rules + (COMPACT_STRUCTURED_ANSWER if structured else COMPACT_ANSWER)
+
+
+def get_prompts(num_disks: int, structured: bool = False, profile: str = "full"):
+    """(system_prompt, user_template) for a run; see PROMPT_PROFILES"""
+    if profile == "compact":
+        return get_compact_system_prompt(num_disks, structured), COMPACT_USER_TEMPLATE
+    if profile != "full":
+        raise ValueError(f"Unknown prompt profile {profile!r}; expected one of {PROMPT_PROFILES}")
+    return get_system_prompt(structured), get_user_template(num_disks, structured)
@@ -0,0 +1,70 @@
+from typing import List, Union, Iterable
+from maker.action_log import ActionLog
+from maker.state import HanoiState
+from maker.verify import _as_log, optimal_prefix, optimal_positions
+
+
+class ReplayIndex:
+    """
+    Random access to the state after any step of a move log.
+
+    While the log follows the optimal solution the state comes from the
+    closed form (verify.optimal_positions) in O(num_disks). Past the first
+    deviation, a snapshot of every disk's peg is kept each keyframe_interval
+    moves, so a seek replays at most that many moves whatever the log length.
+    update() indexes moves appended since the last call, e.g. by a solver
+    writing the same file-backed ActionLog.
+    """
+
+    def __init__(self, actions: Union[ActionLog, str, Iterable[List[int]]], num_disks: int,
+                 keyframe_interval: int = 1024):
+        self.log = _as_log(actions)
+        self.num_disks = num_disks
+        self.keyframe_interval = keyframe_interval
+        self.optimal_prefix = 0
+        self.deviated = False
+        self.keyframes = {}   # step -> positions, from optimal_prefix on
+        self._indexed = 0
+        self._positions = None
+        self.update()
+
+    def update(self) -> int:
+        """Index moves appended to the log since the last call; returns the indexed length"""
+        length = len(self.log)
+        if length <= self._indexed:
+            return self._indexed
+        if not self.deviated:
+            prefix = optimal_prefix(self.log, self.num_disks, self._indexed)
+            self.optimal_prefix = self._indexed = min(prefix, length)
+            if prefix < length:
+                self.deviated = True
+                self._positions = bytearray(optimal_positions(self.num_disks, prefix))
+                self.keyframes[prefix] = bytes(self._positions)
+        if self.deviated:
+            positions, step, interval = self._positions, self._indexed, self.keyframe_interval
+            for disk, _, to_peg in self.log[self._indexed:length]:
+                if 1 <= disk <= self.num_disks:
+                    positions[disk - 1] = to_peg
+                step += 1
+                if step % interval == 0:
+                    self.keyframes[step] = bytes(positions)
+            self._indexed = length
+        return self._indexed
+
+    def __len__(self) -> int:
+        return self._indexed
+
+    def positions_at(self, step: int) -> bytes:
+        """Peg of each disk, disk 1 first, after the first step moves (clamped to the log)"""
+        step = min(max(step, 0), self._indexed)
+        if not self.deviated or step <= self.optimal_prefix:
+            return optimal_positions(self.num_disks, step)
+        base = max(self.optimal_prefix, step - step % self.keyframe_interval)
+        positions = bytearray(self.keyframes[base])
+        for disk, _, to_peg in self.log[base:step]:
+            if 1 <= disk <= self.num_disks:
+                positions[disk - 1] = to_peg
+        return bytes(positions)
+
+    def state_at(self, step: int) -> HanoiState:
+        return HanoiState.from_positions(self.positions_at(step))
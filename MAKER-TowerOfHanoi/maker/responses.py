@@ -0,0 +1,80 @@
+"""
+OpenAI-shaped response objects built from plain text, for the backends that
+stand in for the API: the simulator (maker.simulator), cassette replay
+(maker.cassette) and the benchmarks' fake client (maker.bench).
+"""
+import time
+import asyncio
+from types import SimpleNamespace
+from typing import List, Optional
+
+
+def completion_response(model: str, choices: List[tuple], prompt_tokens: int,
+                        completion_tokens: int) -> SimpleNamespace:
+    """A chat.completion object; choices holds one (text, finish_reason) per choice"""
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(index=i, finish_reason=finish_reason,
+                                 message=SimpleNamespace(role="assistant", content=text))
+                 for i, (text, finish_reason) in enumerate(choices)],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                              total_tokens=prompt_tokens + completion_tokens),
+    )
+
+
+def _pieces(text: str, size: int = 4) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _chunk(model: str, content: Optional[str], finish_reason: Optional[str] = None,
+           usage: SimpleNamespace = None) -> SimpleNamespace:
+    choices = [] if usage is not None else [SimpleNamespace(
+        index=0, finish_reason=finish_reason,
+        delta=SimpleNamespace(role="assistant", content=content))]
+    return SimpleNamespace(model=model, object="chat.completion.chunk",
+                           choices=choices, usage=usage)
+
+
+def stream_chunks(response: SimpleNamespace, include_usage: bool):
+    """response as chat.completion.chunk objects, about one token (four characters) each"""
+    choice = response.choices[0]
+    for piece in _pieces(choice.message.content):
+        yield _chunk(response.model, piece)
+    yield _chunk(response.model, None, choice.finish_reason)
+    if include_usage:
+        yield _chunk(response.model, None, usage=response.usage)
+
+
+class CompletionStream:
+    """Stand-in for openai.Stream: the first chunk after first_delay, then one every token_delay"""
+
+    def __init__(self, response, first_delay: float, token_delay: float, include_usage: bool):
+        self._chunks = stream_chunks(response, include_usage)
+        self._first_delay = first_delay
+        self._token_delay = token_delay
+
+    def __iter__(self):
+        if self._first_delay:
+            time.sleep(self._first_delay)
+        for chunk in self._chunks:
+            yield chunk
+            if self._token_delay:
+                time.sleep(self._token_delay)
+
+    def close(self):
+        self._chunks.close()
+
+
+class AsyncCompletionStream(CompletionStream):
+    """Stand-in for openai.AsyncStream"""
+
+    async def __aiter__(self):
+        if self._first_delay:
+            await asyncio.sleep(self._first_delay)
+        for chunk in self._chunks:
+            yield chunk
+            if self._token_delay:
+                await asyncio.sleep(self._token_delay)
+
+    async def close(self):
+        self._chunks.close()
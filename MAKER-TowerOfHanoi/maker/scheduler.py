@@ -0,0 +1,252 @@
+"""
+Rate-limit-aware admission for every completion request.
+
+RequestScheduler keeps two token buckets, requests per minute and tokens per
+minute, and makes each request wait for both. A 429 pauses every caller
+until its Retry-After (or a jittered exponential backoff) has passed and cuts
+the request rate multiplicatively; each success adds back about one request
+per minute per second of traffic (AIMD), so with no configured RPM the
+scheduler settles just under whatever rate the API tolerates. Consecutive
+non-429 failures back off exponentially with full jitter and, past
+failure_threshold, open a circuit breaker: nothing is sent for cooldown
+seconds, then a single probe decides whether to close it again.
+
+The state lives in a flat array of doubles, either process-local or a
+multiprocessing.Array from new_state(shared=True) that worker processes
+(maker.sweep) share, so they back off together.
+"""
+import time
+import random
+import asyncio
+import threading
+import multiprocessing
+from email.utils import parsedate_to_datetime
+from typing import List
+
+# Slots of the state array
+RPM_TOKENS, TPM_TOKENS, UPDATED, PAUSED_UNTIL, RATE, FAILURES, OPEN_UNTIL, PROBING, \
+    WINDOW_START, WINDOW_COUNT, OBSERVED_RPM, THROTTLED, WAITED, BREAKER_OPENS = range(14)
+STATE_SIZE = 14
+
+INF = float("inf")
+EPSILON = 1e-9   # bucket shortfalls below this are rounding left over from the refill
+
+
+class _LocalState:
+    """Process-local stand-in for multiprocessing.Array('d', STATE_SIZE)"""
+
+    def __init__(self):
+        self._values = [0.0] * STATE_SIZE
+        self._lock = threading.Lock()
+
+    def get_lock(self):
+        return self._lock
+
+    def __getitem__(self, i):
+        return self._values[i]
+
+    def __setitem__(self, i, value):
+        self._values[i] = value
+
+
+def new_state(shared: bool = False):
+    """Fresh scheduler state; shared=True gives one that child processes can use"""
+    if shared:
+        return multiprocessing.Array("d", STATE_SIZE)
+    return _LocalState()
+
+
+def retry_after(e: Exception) -> float:
+    """Seconds the server asked us to wait, from Retry-After(-ms) or e.retry_after; 0 if none"""
+    seconds = getattr(e, "retry_after", None)
+    if seconds:
+        return float(seconds)
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return 0.0
+
+
+def is_throttle(e: Exception) -> bool:
+    return getattr(e, "status_code", None) == 429
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Full-jitter exponential backoff for the attempt-th consecutive failure"""
+    return random.uniform(0, min(cap, base * 2 ** max(0, attempt - 1)))
+
+
+def retry_delay(e: Exception, attempt: int) -> float:
+    """How long an unscheduled caller should wait before retrying after e"""
+    return max(retry_after(e), backoff_delay(attempt))
+
+
+def estimate_tokens(messages: List[dict], max_tokens: int, n: int = 1) -> int:
+    """Tokens a request counts against TPM: its prompt (about four characters a token) plus max_tokens per choice"""
+    return sum(len(m["content"]) for m in messages) // 4 + (max_tokens or 0) * n
+
+
+class RequestScheduler:
+    """
+    Admission control shared by every request of a run (or of several
+    processes, given a shared state).
+
+    rpm and tpm are the account's limits, or None if unknown. burst_seconds
+    sizes the buckets: at most that many seconds of quota go out at once.
+    """
+
+    def __init__(self, rpm: float = None, tpm: float = None, state=None,
+                 burst_seconds: float = 1.0, decrease: float = 0.7,
+                 additive_rpm_per_second: float = 1.0, min_rpm: float = 1.0,
+                 backoff_base: float = 0.5, backoff_cap: float = 30.0,
+                 failure_threshold: int = 5, cooldown: float = 30.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.burst_seconds = burst_seconds
+        self.decrease = decrease
+        self.additive = additive_rpm_per_second * 60
+        self.min_rpm = min_rpm
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = state if state is not None else new_state()
+        with self.state.get_lock():
+            if not self.state[UPDATED]:
+                now = time.monotonic()
+                self.state[UPDATED] = now
+                self.state[WINDOW_START] = now
+                self.state[RATE] = rpm or INF
+                self.state[RPM_TOKENS] = self._rpm_capacity(self.state[RATE])
+                self.state[TPM_TOKENS] = self._tpm_capacity()
+
+    def _rpm_capacity(self, rate: float) -> float:
+        return INF if rate == INF else max(1.0, rate / 60 * self.burst_seconds)
+
+    def _tpm_capacity(self) -> float:
+        return INF if not self.tpm else max(1.0, self.tpm / 60 * self.burst_seconds)
+
+    def _reserve(self, tokens: int) -> float:
+        """Admit one request now and return 0, or return how long to wait first"""
+        s = self.state
+        now = time.monotonic()
+        with s.get_lock():
+            if s[PAUSED_UNTIL] > now:
+                return s[PAUSED_UNTIL] - now
+            if s[FAILURES] >= self.failure_threshold:
+                if s[OPEN_UNTIL] > now:
+                    return s[OPEN_UNTIL] - now
+                if s[PROBING] and now - s[PROBING] < self.cooldown:
+                    return min(1.0, self.cooldown)
+
+            rate = s[RATE]
+            elapsed = now - s[UPDATED]
+            s[UPDATED] = now
+            rpm_capacity = self._rpm_capacity(rate)
+            tpm_capacity = self._tpm_capacity()
+            if rate != INF:
+                s[RPM_TOKENS] = min(rpm_capacity, s[RPM_TOKENS] + elapsed * rate / 60)
+            if self.tpm:
+                s[TPM_TOKENS] = min(tpm_capacity, s[TPM_TOKENS] + elapsed * self.tpm / 60)
+
+            wait = 0.0
+            if rate != INF and s[RPM_TOKENS] < 1 - EPSILON:
+                wait = (1 - s[RPM_TOKENS]) * 60 / rate
+            # A request bigger than the bucket goes once the bucket is full
+            needed = min(tokens, tpm_capacity)
+            if self.tpm and s[TPM_TOKENS] < needed - EPSILON:
+                wait = max(wait, (needed - s[TPM_TOKENS]) * 60 / self.tpm)
+            if wait:
+                return wait
+
+            if rate != INF:
+                s[RPM_TOKENS] -= 1
+            if self.tpm:
+                s[TPM_TOKENS] -= tokens
+            if s[FAILURES] >= self.failure_threshold:
+                s[PROBING] = now   # the half-open breaker's single probe
+            if now - s[WINDOW_START] >= 10:
+                s[OBSERVED_RPM] = s[WINDOW_COUNT] * 60 / (now - s[WINDOW_START])
+                s[WINDOW_START], s[WINDOW_COUNT] = now, 0
+            s[WINDOW_COUNT] += 1
+            return 0.0
+
+    def _waited(self, seconds: float):
+        with self.state.get_lock():
+            self.state[WAITED] += seconds
+
+    def acquire(self, tokens: int = 0):
+        """Block until a request of about tokens tokens may be sent"""
+        while True:
+            wait = self._reserve(tokens)
+            if not wait:
+                return
+            self._waited(wait)
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        """acquire() for coroutines"""
+        while True:
+            wait = self._reserve(tokens)
+            if not wait:
+                return
+            self._waited(wait)
+            await asyncio.sleep(wait)
+
+    def success(self):
+        s = self.state
+        with s.get_lock():
+            s[FAILURES] = 0
+            s[PROBING] = 0
+            rate = s[RATE]
+            if rate != INF:
+                s[RATE] = min(self.rpm or INF, rate + self.additive / rate)
+
+    def failure(self, e: Exception) -> float:
+        """
+        Record a failed request. Returns how long the caller itself should
+        wait before retrying; a 429 instead pauses every caller.
+        """
+        s = self.state
+        now = time.monotonic()
+        with s.get_lock():
+            s[PROBING] = 0
+            if is_throttle(e):
+                s[THROTTLED] += 1
+                rate = s[RATE]
+                if rate == INF:
+                    window = now - s[WINDOW_START]
+                    rate = s[OBSERVED_RPM] or (s[WINDOW_COUNT] * 60 / window if window > 0 else 60)
+                s[RATE] = max(self.min_rpm, rate * self.decrease)
+                s[RPM_TOKENS] = min(s[RPM_TOKENS], 0)
+                delay = max(retry_after(e), backoff_delay(1, self.backoff_base, self.backoff_cap))
+                s[PAUSED_UNTIL] = max(s[PAUSED_UNTIL], now + delay)
+                return 0.0
+
+            s[FAILURES] += 1
+            if s[FAILURES] >= self.failure_threshold:
+                if s[OPEN_UNTIL] <= now:
+                    s[BREAKER_OPENS] += 1
+                s[OPEN_UNTIL] = now + self.cooldown
+                return 0.0
+            return backoff_delay(int(s[FAILURES]), self.backoff_base, self.backoff_cap)
+
+    def summary(self) -> str:
+        s = self.state
+        with s.get_lock():
+            rate = "unlimited" if s[RATE] == INF else f"{s[RATE]:.0f}"
+            return (f"Scheduler: {s[THROTTLED]:.0f} throttled, {s[WAITED]:.1f}s waited (summed over callers), "
+                    f"request rate now {rate}/min, circuit breaker opened {s[BREAKER_OPENS]:.0f} times")
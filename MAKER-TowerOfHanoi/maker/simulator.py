@@ -0,0 +1,434 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+SimulatedClient (and AsyncSimulatedClient) expose client.chat.completions.create
+like openai.OpenAI / openai.AsyncOpenAI. Each request is answered by reading
+the previous move and current state out of the rendered user template and
+applying the puzzle's movement rule, then, with configurable probability,
+corrupting the answer the way real models do. Latency and rate limits are
+injected too, so voting, red-flagging and the solver can be load-tested for
+free. stream=True yields chat.completion.chunk objects about one token (four
+characters) at a time. serve() wraps the same logic in a localhost HTTP server
+that openai.OpenAI can talk to via base_url.
+
+    python -m maker.simulator --port 8000
+"""
+import re
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import threading
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from maker.state import HanoiState
+from maker.responses import (completion_response, stream_chunks, CompletionStream,
+                             AsyncCompletionStream)
+
+ERROR_TYPES = ("wrong_move", "malformed", "inconsistent_state", "overlong")
+
+# Both prompt profiles: "Previous move:"/"Current state:" (full) and "Prev:"/"State:" (compact)
+_PREV_MOVE = re.compile(r"(?:Previous move|Prev):\s*(None|\[[^\]]*\])")
+_CURRENT_STATE = re.compile(r"(?:Current state|State):\s*(\[\s*\[.*?\]\s*\])", re.S)
+_CLOCKWISE = re.compile(r"EVEN number of disks|Disk 1 moves clockwise")
+
+_FILLER = ("Let me look at the pegs again and think about which disk should move next. "
+           "The rules say only the top disk can move and it cannot go onto a smaller one. ")
+
+
+class SimulatedRateLimitError(Exception):
+    """Raised (or sent as HTTP 429) when the simulated account is throttled"""
+
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit reached, retry after {retry_after:.2f}s")
+        self.retry_after = retry_after
+        self.response = SimpleNamespace(status_code=429,
+                                        headers={"retry-after": f"{retry_after:.3f}"})
+
+
+def correct_move(state: HanoiState, prev_move: Optional[List[int]], clockwise: bool) -> List[int]:
+    """The move the user templates' movement rule asks for"""
+    if prev_move is None or prev_move[0] != 1:
+        from_peg = state.peg_of(1)
+        to_peg = (from_peg + (1 if clockwise else -1)) % 3
+        return [1, from_peg, to_peg]
+    pegs = [p for p in range(3) if state.pegs[p] and state.top(p) != 1]
+    if not pegs:
+        return correct_move(state, None, clockwise)
+    other = [p for p in range(3) if state.top(p) != 1 and p not in pegs]
+    if len(pegs) == 2:
+        from_peg, to_peg = sorted(pegs, key=state.top)
+    else:
+        from_peg, to_peg = pegs[0], other[0]
+    return [state.top(from_peg), from_peg, to_peg]
+
+
+def parse_prompt(user_prompt: str, system_prompt: str = ""):
+    """
+    Return (state, prev_move, clockwise) from a rendered user template; the
+    compact profile states disk 1's direction in the system prompt instead
+    """
+    prev = _PREV_MOVE.search(user_prompt)
+    current = _CURRENT_STATE.search(user_prompt)
+    if prev is None or current is None:
+        raise ValueError("Prompt does not contain 'Previous move:' and 'Current state:'")
+    prev_move = None if prev.group(1) == "None" else json.loads(prev.group(1))
+    state = HanoiState.from_lists(json.loads(current.group(1)))
+    clockwise = _CLOCKWISE.search(user_prompt) or _CLOCKWISE.search(system_prompt)
+    return state, prev_move, bool(clockwise)
+
+
+def _legal_moves(state: HanoiState) -> List[List[int]]:
+    moves = []
+    for from_peg in range(3):
+        disk = state.top(from_peg)
+        if disk:
+            for to_peg in range(3):
+                if to_peg != from_peg and (not state.pegs[to_peg] or state.top(to_peg) > disk):
+                    moves.append([disk, from_peg, to_peg])
+    return moves
+
+
+class _TokenBucket:
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> float:
+        """Consume one token; return 0, or the seconds to wait if there is none"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class SimulatedModel:
+    """
+    The answering logic shared by the in-process clients and the HTTP server.
+
+    error_rates maps each of ERROR_TYPES to its probability per completion.
+    Latency per call is lognormal with the given median (seconds) and sigma,
+    plus seconds_per_token for every completion token. rpm caps requests per
+    minute; rate_limit_rate additionally throttles that fraction of calls at
+    random. Temperature-0 answers are a deterministic function of the prompt
+    and how many times it has been asked, so a red-flagged greedy answer is
+    not simply repeated on retry, yet reruns see the same sequence.
+
+    complete_n() answers a request for n choices: the prompt is counted
+    once and latency follows the longest choice. With a response_format the
+    answer is a bare JSON object, as under
+    constrained decoding: "malformed" cannot happen and "overlong" becomes
+    runaway whitespace that is cut off mid-object.
+    """
+
+    def __init__(self, error_rates: dict = None, latency_median: float = 0.0,
+                 latency_sigma: float = 0.5, seconds_per_token: float = 0.0,
+                 rpm: float = None, rate_limit_rate: float = 0.0,
+                 reasoning_chars: int = 120, seed: int = None):
+        self.error_rates = {name: 0.0 for name in ERROR_TYPES}
+        self.error_rates.update(error_rates or {})
+        unknown = set(self.error_rates) - set(ERROR_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown error types: {sorted(unknown)}")
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.seconds_per_token = seconds_per_token
+        self.rate_limit_rate = rate_limit_rate
+        self.reasoning_chars = reasoning_chars
+        self.bucket = _TokenBucket(rpm) if rpm else None
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = {name: 0 for name in ERROR_TYPES}
+        self.throttled = 0
+        self._greedy_repeats = {}
+
+    def admit(self):
+        """Raise SimulatedRateLimitError if this request is throttled"""
+        wait = self.bucket.take() if self.bucket else 0.0
+        with self.lock:
+            if not wait and self.rate_limit_rate and self.rng.random() < self.rate_limit_rate:
+                wait = self.rng.uniform(0.05, 0.5)
+            if wait:
+                self.throttled += 1
+                raise SimulatedRateLimitError(wait)
+            self.requests += 1
+
+    def latency(self, completion_tokens: int) -> float:
+        with self.lock:
+            base = self.latency_median * math.exp(self.rng.gauss(0, self.latency_sigma)) \
+                if self.latency_median else 0.0
+        return base + completion_tokens * self.seconds_per_token
+
+    def _choose_error(self, rng: random.Random) -> Optional[str]:
+        roll = rng.random()
+        for name in ERROR_TYPES:
+            roll -= self.error_rates[name]
+            if roll < 0:
+                return name
+        return None
+
+    def complete(self, messages: List[dict], temperature: float, max_tokens: int,
+                 response_format: dict = None):
+        """Return (text, finish_reason, prompt_tokens, completion_tokens)"""
+        user_prompt = messages[-1]["content"]
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        if temperature == 0:
+            with self.lock:
+                if len(self._greedy_repeats) > 100_000:
+                    self._greedy_repeats.clear()
+                repeat = self._greedy_repeats.get(user_prompt, 0)
+                self._greedy_repeats[user_prompt] = repeat + 1
+            rng = random.Random(f"{repeat}:{user_prompt}")
+        else:
+            with self.lock:
+                rng = random.Random(self.rng.getrandbits(64))
+
+        state, prev_move, clockwise = parse_prompt(user_prompt, messages[0]["content"])
+        move = correct_move(state, prev_move, clockwise)
+        next_state = state.apply(move)
+
+        error = self._choose_error(rng)
+        if response_format is not None and error == "malformed":
+            error = None
+        if error is not None:
+            with self.lock:
+                self.errors[error] += 1
+        reasoning = _FILLER * (self.reasoning_chars // len(_FILLER) + 1)
+        reasoning = reasoning[:self.reasoning_chars]
+
+        if error == "wrong_move":
+            alternatives = [m for m in _legal_moves(state) if m != move]
+            if alternatives:
+                move = rng.choice(alternatives)
+                next_state = state.apply(move)
+        elif error == "inconsistent_state":
+            wrong = [m for m in _legal_moves(state) if m[0] == move[0] and m != move]
+            next_state = state.apply(wrong[0]) if wrong else state
+        elif error == "overlong":
+            reasoning = _FILLER * (max_tokens * 4 // len(_FILLER) + 2)
+
+        if response_format is not None:
+            padding = " " * (max_tokens * 4) if error == "overlong" else ""
+            text = json.dumps({"move": move, "next_state": padding}).replace(
+                json.dumps(padding), padding + json.dumps(next_state.to_lists()))
+        elif error == "malformed":
+            text = rng.choice([
+                f"{reasoning}\nmove: {move}\nnext_state: {next_state}",
+                f"{reasoning}\nmove = {move}",
+                f"{reasoning}\nmove = {move[:2]}\nnext_state = {next_state}",
+                f"{reasoning}\nmove = {move}\nnext_state = {next_state.to_lists()[:2]}",
+            ])
+        else:
+            text = f"{reasoning}\nmove = {move}\nnext_state = {next_state}"
+
+        finish_reason = "stop"
+        if len(text) > max_tokens * 4:
+            text, finish_reason = text[:max_tokens * 4], "length"
+        return text, finish_reason, prompt_tokens, max(1, len(text) // 4)
+
+    def complete_n(self, messages: List[dict], temperature: float, max_tokens: int,
+                   response_format: dict = None, n: int = 1):
+        """Return ([(text, finish_reason)] * n, prompt_tokens, completion_tokens, longest choice's tokens)"""
+        choices, completion_tokens, longest = [], 0, 0
+        for _ in range(n):
+            text, finish, prompt_tokens, tokens = self.complete(
+                messages, temperature, max_tokens, response_format)
+            choices.append((text, finish))
+            completion_tokens += tokens
+            longest = max(longest, tokens)
+        return choices, prompt_tokens, completion_tokens, longest
+
+
+class _Completions:
+    stream_class = CompletionStream
+
+    def __init__(self, model: SimulatedModel):
+        self._model = model
+
+    def _answer(self, model, messages, temperature, max_tokens, response_format, n):
+        self._model.admit()
+        choices, prompt_tokens, completion_tokens, longest = self._model.complete_n(
+            messages, temperature, max_tokens, response_format, n)
+        delay = self._model.latency(longest)
+        return completion_response(model, choices, prompt_tokens, completion_tokens), delay
+
+    def _stream(self, response, delay: float, stream_options: dict):
+        token_delay = self._model.seconds_per_token
+        first_delay = max(0.0, delay - response.usage.completion_tokens * token_delay)
+        include_usage = bool((stream_options or {}).get("include_usage"))
+        return self.stream_class(response, first_delay, token_delay, include_usage)
+
+    def create(self, model: str, messages: List[dict], temperature: float = 1.0,
+               max_tokens: int = 750, response_format: dict = None, stream: bool = False,
+               stream_options: dict = None, n: int = 1, **kwargs):
+        response, delay = self._answer(model, messages, temperature, max_tokens,
+                                       response_format, 1 if stream else n)
+        if stream:
+            return self._stream(response, delay, stream_options)
+        if delay:
+            time.sleep(delay)
+        return response
+
+
+class _AsyncCompletions(_Completions):
+    stream_class = AsyncCompletionStream
+
+    async def create(self, model: str, messages: List[dict], temperature: float = 1.0,
+                     max_tokens: int = 750, response_format: dict = None, stream: bool = False,
+                     stream_options: dict = None, n: int = 1, **kwargs):
+        response, delay = self._answer(model, messages, temperature, max_tokens,
+                                       response_format, 1 if stream else n)
+        if stream:
+            return self._stream(response, delay, stream_options)
+        if delay:
+            await asyncio.sleep(delay)
+        return response
+
+
+class SimulatedClient:
+    """Drop-in for openai.OpenAI backed by SimulatedModel"""
+
+    completions_class = _Completions
+
+    def __init__(self, model: SimulatedModel = None, **model_kwargs):
+        self.model = model or SimulatedModel(**model_kwargs)
+        self.chat = SimpleNamespace(completions=self.completions_class(self.model))
+
+
+class AsyncSimulatedClient(SimulatedClient):
+    """Drop-in for openai.AsyncOpenAI backed by SimulatedModel"""
+
+    completions_class = _AsyncCompletions
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000, model: SimulatedModel = None,
+          **model_kwargs) -> ThreadingHTTPServer:
+    """
+    Serve POST /v1/chat/completions; point openai.OpenAI(base_url=
+    f"http://{host}:{port}/v1") at it. Throttled calls get HTTP 429 with a
+    Retry-After header; "stream": true is answered as server-sent events.
+    Call serve_forever() on the result (or run it in a thread) and
+    shutdown() to stop.
+    """
+    model = model or SimulatedModel(**model_kwargs)
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload: dict, headers: dict = None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            try:
+                model.admit()
+                choices, prompt_tokens, completion_tokens, longest = model.complete_n(
+                    request["messages"], request.get("temperature", 1.0),
+                    request.get("max_tokens") or 750, request.get("response_format"),
+                    1 if request.get("stream") else request.get("n") or 1)
+            except SimulatedRateLimitError as e:
+                self._send(429, {"error": {"message": str(e), "type": "rate_limit_exceeded"}},
+                           e.response.headers)
+                return
+            except ValueError as e:
+                self._send(400, {"error": {"message": str(e), "type": "invalid_request_error"}})
+                return
+
+            delay = model.latency(longest)
+            if request.get("stream"):
+                response = completion_response(request.get("model", "simulated"), choices,
+                                               prompt_tokens, completion_tokens)
+                self._send_stream(response, delay, request.get("stream_options"))
+                return
+            if delay:
+                time.sleep(delay)
+            self._send(200, {
+                "id": f"chatcmpl-sim-{model.requests}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "simulated"),
+                "choices": [{"index": i, "finish_reason": finish,
+                             "message": {"role": "assistant", "content": text}}
+                            for i, (text, finish) in enumerate(choices)],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+
+        def _send_stream(self, response, delay: float, stream_options: dict):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            token_delay = model.seconds_per_token
+            include_usage = bool((stream_options or {}).get("include_usage"))
+            chunk_id = f"chatcmpl-sim-{model.requests}"
+            try:
+                time.sleep(max(0.0, delay - response.usage.completion_tokens * token_delay))
+                for chunk in stream_chunks(response, include_usage):
+                    payload = {"id": chunk_id, "object": chunk.object, "created": int(time.time()),
+                               "model": chunk.model,
+                               "choices": [{"index": 0, "finish_reason": c.finish_reason,
+                                            "delta": {"role": "assistant", "content": c.delta.content}}
+                                           for c in chunk.choices],
+                               "usage": vars(chunk.usage) if chunk.usage is not None else None}
+                    self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    if token_delay:
+                        time.sleep(token_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client closed the stream early
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated chat completions server for MAKER")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    for name in ERROR_TYPES:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float, default=0.0,
+                            help=f"probability of a {name} error per completion")
+    parser.add_argument("--latency", type=float, default=0.0, help="median latency in seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--rpm", type=float, default=None, help="requests per minute limit")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port,
+                   error_rates={name: getattr(args, name) for name in ERROR_TYPES},
+                   latency_median=args.latency, latency_sigma=args.latency_sigma,
+                   rpm=args.rpm, rate_limit_rate=args.rate_limit_rate, seed=args.seed)
+    print(f"Simulated API on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
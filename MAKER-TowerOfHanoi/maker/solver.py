@@ -1,63 +1,316 @@
 
+import asyncio
 from tqdm import tqdm
-from typing import List
-from maker.voting import do_voting
+from typing import Iterable, List
+from maker.voting import do_voting, do_voting_async, VoteStats
+from maker.adaptive import AdaptiveMargin
+from maker.metrics import Metrics, clock
+from maker.cache import ResponseCache
+from maker.journal import Journal
+from maker.action_log import ActionLog
+from maker.verify import verify_log
+from maker.state import HanoiState
+from maker.config import RunConfig
+from maker.prompts import get_prompts
+from maker.live import LiveFeed
+
+
+def _open_journal(journal_dir: str, num_disks: int, initial_state: List[List[int]],
+                  resume: bool, num_steps: int = None, resume_completed: bool = False):
+    """
+    Return (journal, start_step, state, prev_move, actions) for a run. A
+    journal that already holds num_steps moves is only resumed with
+    resume_completed, so a rerun does not silently return the old solution.
+    """
+    state = HanoiState.from_lists(initial_state, num_disks)
+    if journal_dir is None:
+        return None, 0, state, None, ActionLog()
+
+    journal = Journal(journal_dir, num_disks)
+    if resume and journal.exists():
+        start_step, state, prev_move, actions = journal.resume()
+        if num_steps is not None and start_step >= num_steps and not resume_completed:
+            journal.close()
+            raise ValueError(f"Journal {journal_dir} already holds all {num_steps} steps; "
+                             f"set resume_completed to reuse it or pick another journal_dir")
+        print(f"Resumed from {journal_dir} at step {start_step}")
+        return journal, start_step, state, prev_move, actions
+
+    journal.start(state)
+    return journal, 0, state, None, journal.actions
+
 
 def generate_solution(client, initial_state: List[List[int]], 
                       num_steps: int, k: int, num_disks: int,
-                      system_prompt: str, user_template: str) -> List[List[int]]:
-    """Algorithm 1: generate_solution"""
+                      system_prompt: str, user_template: str,
+                      cache: ResponseCache = None, journal_dir: str = None,
+                      resume: bool = False, config: RunConfig = None,
+                      stats: VoteStats = None, policy: AdaptiveMargin = None,
+                      metrics: Metrics = None, feed: LiveFeed = None) -> ActionLog:
+    """
+    Algorithm 1: generate_solution
+
+    With journal_dir set, every accepted move and its vote tally is journaled
+    there; resume=True continues from the last committed step of that journal
+    (a journal that is already complete needs config.resume_completed).
+    config carries the sampling settings; stats, if given, accumulates the
+    run's calls, tokens and red flags. With a policy, each step votes with the
+    margin it chooses instead of k. metrics, if given, records every call and
+    every settled step. feed, if given, publishes accepted moves and the
+    current step's tally to a live viewer (maker.live).
+    """
     
-    actions = []
-    state = [peg[:] for peg in initial_state]
-    prev_move = None
+    journal, start_step, state, prev_move, actions = _open_journal(
+        journal_dir, num_disks, initial_state, resume, num_steps,
+        config is not None and config.resume_completed)
+    if feed is not None:
+        feed.start(actions)
     
     print(f"Starting MAKER with k={k}, {num_steps} steps...")
     print(f"Initial state: {state}")
     
-    for step in tqdm(range(num_steps), desc="Solving Tower of Hanoi"):
-        move, state = do_voting(client, state, prev_move, k, num_disks, 
-                               system_prompt, user_template)
-        actions.append(move)
-        prev_move = move
-        
-        if step < 10 or step % 100 == 0:
-            tqdm.write(f"Step {step}: Move {move}, State: {state}")
+    try:
+        for step in tqdm(range(start_step, num_steps), desc="Solving Tower of Hanoi",
+                         initial=start_step, total=num_steps):
+            step_stats = VoteStats()
+            step_k = policy.choose(step) if policy is not None else k
+            started = clock()
+            if feed is not None:
+                feed.begin(step, step_k, step_stats)
+            move, state = do_voting(client, state, prev_move, step_k, num_disks, 
+                                   system_prompt, user_template, stats=step_stats,
+                                   cache=cache, config=config, metrics=metrics, step=step)
+            if metrics is not None:
+                metrics.step(step, step_k, step_stats.votes, step_stats.calls, clock() - started)
+            prev_move = move
+            if stats is not None:
+                stats.merge(step_stats)
+            if policy is not None:
+                policy.observe(step, step_stats)
+            if journal is not None:
+                journal.append(step, move, state, step_stats.votes, step_stats.calls)
+            else:
+                actions.append(move)
+            if feed is not None:
+                feed.accept(move)
+            
+            if step < 10 or step % 100 == 0:
+                tqdm.write(f"Step {step}: Move {move}, State: {state}")
+    finally:
+        if journal is not None:
+            journal.close()
     
     print(f"Final state: {state}")
+    if policy is not None:
+        print(policy.summary())
     return actions
 
 
-def verify_solution(actions: List[List[int]], num_disks: int) -> bool:
-    """Verify solution"""
-    
-    state = [list(range(num_disks, 0, -1)), [], []]
-    print(f"\nVerifying {len(actions)} moves...")
-    
-    for i, (disk, from_peg, to_peg) in enumerate(actions):
-        if not state[from_peg]:
-            print(f"❌ Step {i}: Peg {from_peg} is empty")
-            return False
-        
-        if state[from_peg][-1] != disk:
-            print(f"❌ Step {i}: Top disk is {state[from_peg][-1]}, not {disk}")
-            return False
-        
-        if state[to_peg] and state[to_peg][-1] < disk:
-            print(f"❌ Step {i}: Cannot place {disk} on {state[to_peg][-1]}")
-            return False
-        
-        state[from_peg].pop()
-        state[to_peg].append(disk)
-        
-        if i < 7:
-            print(f"   Move {i}: {[disk, from_peg, to_peg]} → {state}")
-    
-    target_state = [[], [], list(range(num_disks, 0, -1))]
-    
-    if state == target_state:
-        print(" Solution verified!")
-        return True
-    else:
-        print(f" Final: {state} ≠ {target_state}")
-        return False
+class _StepRun:
+    """One do_voting_async task, plus the speculative run of the step after it"""
+
+    def __init__(self, pipeline, step: int, state: HanoiState,
+                 prev_move: List[int], parent: "_StepRun" = None):
+        self.pipeline = pipeline
+        self.step = step
+        self.state = state
+        self.prev_move = prev_move
+        self.parent = parent
+        self.child = None
+        self.leader = None
+        self.k = None
+        self.started = clock()
+        self.stats = VoteStats()
+        self.task = asyncio.ensure_future(pipeline.vote(self))
+
+    def depth(self) -> int:
+        depth, node = 0, self.parent
+        while node is not None:
+            depth, node = depth + 1, node.parent
+        return depth
+
+    def on_leader(self, move: List[int], next_state: HanoiState):
+        self.leader = (move, next_state)
+        if self.child is not None:
+            if self.child.prev_move == move:
+                return
+            self.pipeline.discard(self.child)
+            self.child = None
+        self.speculate()
+
+    def speculate(self):
+        """Start voting on the next step from the current leader, if allowed"""
+        if (self.child is None and self.leader is not None
+                and self.step + 1 < self.pipeline.num_steps
+                and self.depth() < self.pipeline.max_depth):
+            move, next_state = self.leader
+            self.child = _StepRun(self.pipeline, self.step + 1, next_state, move, parent=self)
+
+    def cancel(self) -> int:
+        """Cancel this run and everything speculated from it; return the calls spent"""
+        calls = self.stats.calls
+        if self.child is not None:
+            calls += self.child.cancel()
+        if self.task.done():
+            if not self.task.cancelled():
+                self.task.exception()
+        else:
+            self.task.cancel()
+        return calls
+
+
+class _SpeculativePipeline:
+    """Shared settings and speculation counters for a chain of _StepRun"""
+
+    def __init__(self, client, num_steps: int, k: int, num_disks: int,
+                 system_prompt: str, user_template: str, max_depth: int,
+                 voting_kwargs: dict, policy: AdaptiveMargin = None, metrics: Metrics = None):
+        self.client = client
+        self.num_steps = num_steps
+        self.k = k
+        self.policy = policy
+        self.metrics = metrics
+        self.num_disks = num_disks
+        self.system_prompt = system_prompt
+        self.user_template = user_template
+        self.max_depth = max_depth
+        self.voting_kwargs = voting_kwargs
+        self.hits = 0
+        self.misses = 0
+        self.wasted_calls = 0
+
+    async def vote(self, run: _StepRun):
+        run.k = self.policy.choose(run.step) if self.policy is not None else self.k
+        return await do_voting_async(
+            self.client, run.state, run.prev_move, run.k, self.num_disks,
+            self.system_prompt, self.user_template, stats=run.stats,
+            on_leader=run.on_leader if self.max_depth > 0 else None,
+            metrics=self.metrics, step=run.step, **self.voting_kwargs
+        )
+
+    def discard(self, run: _StepRun):
+        self.misses += 1
+        self.wasted_calls += run.cancel()
+
+
+async def generate_solution_async(client, initial_state: List[List[int]],
+                                  num_steps: int, k: int, num_disks: int,
+                                  system_prompt: str, user_template: str,
+                                  max_in_flight: int = None,
+                                  speculation_depth: int = 0,
+                                  cache: ResponseCache = None, journal_dir: str = None,
+                                  resume: bool = False, config: RunConfig = None,
+                                  stats: VoteStats = None,
+                                  policy: AdaptiveMargin = None,
+                                  metrics: Metrics = None, feed: LiveFeed = None) -> ActionLog:
+    """
+    Algorithm 1 driven by do_voting_async on an AsyncOpenAI client.
+
+    With speculation_depth > 0, step t+1 starts voting from the leading
+    candidate's next_state while step t is still voting (up to that many
+    steps ahead). Speculative work whose starting move loses the vote is
+    cancelled and its API calls are reported as wasted.
+
+    journal_dir, resume, config, stats, policy, metrics and feed behave as in
+    generate_solution; calls spent on discarded speculation are added to
+    stats.wasted_calls. A speculative step takes its margin when it starts.
+    """
+
+    journal, start_step, state, prev_move, actions = _open_journal(
+        journal_dir, num_disks, initial_state, resume, num_steps,
+        config is not None and config.resume_completed)
+    voting_kwargs = {"cache": cache, "config": config}
+    if max_in_flight is not None:
+        voting_kwargs["max_in_flight"] = max_in_flight
+    pipeline = _SpeculativePipeline(client, num_steps, k, num_disks, system_prompt,
+                                    user_template, speculation_depth, voting_kwargs, policy,
+                                    metrics)
+    total = stats if stats is not None else VoteStats()
+    if feed is not None:
+        feed.start(actions)
+
+    print(f"Starting MAKER with k={k}, {num_steps} steps (concurrent voting, "
+          f"speculation depth {speculation_depth})...")
+    print(f"Initial state: {state}")
+
+    current = _StepRun(pipeline, start_step, state, prev_move) if start_step < num_steps else None
+    try:
+        for step in tqdm(range(start_step, num_steps), desc="Solving Tower of Hanoi",
+                         initial=start_step, total=num_steps):
+            if feed is not None:
+                feed.begin(step, current.k if current.k is not None else k, current.stats)
+            move, state = await current.task
+            total.merge(current.stats)
+            if policy is not None:
+                policy.observe(step, current.stats)
+            if metrics is not None:
+                metrics.step(step, current.k, current.stats.votes, current.stats.calls,
+                             clock() - current.started)
+            if journal is not None:
+                journal.append(step, move, state, current.stats.votes, current.stats.calls)
+            else:
+                actions.append(move)
+            if feed is not None:
+                feed.accept(move)
+
+            if step < 10 or step % 100 == 0:
+                tqdm.write(f"Step {step}: Move {move}, State: {state}")
+
+            if step + 1 == num_steps:
+                current = None
+                break
+
+            child = current.child
+            if child is not None and child.prev_move == move:
+                pipeline.hits += 1
+                child.parent = None
+                current = child
+                tail = current
+                while tail.child is not None:
+                    tail = tail.child
+                tail.speculate()
+            else:
+                if child is not None:
+                    pipeline.discard(child)
+                current = _StepRun(pipeline, step + 1, state, move)
+    finally:
+        if current is not None:
+            current.cancel()
+        if journal is not None:
+            journal.close()
+
+    total.wasted_calls += pipeline.wasted_calls
+    print(f"Final state: {state}")
+    print(f"API calls: {total.calls} accepted-path, {pipeline.wasted_calls} wasted on "
+          f"speculation ({pipeline.hits} hits, {pipeline.misses} misses)")
+    if policy is not None:
+        print(policy.summary())
+    return actions
+
+
+def solve(client, config: RunConfig, cache: ResponseCache = None,
+          stats: VoteStats = None, metrics: Metrics = None, feed: LiveFeed = None,
+          policy: AdaptiveMargin = None) -> ActionLog:
+    """
+    Run generate_solution or generate_solution_async as config describes;
+    with config.adaptive_k, policy (default a new AdaptiveMargin) picks k
+    """
+    initial_state = [list(range(config.num_disks, 0, -1)), [], []]
+    args = (client, initial_state, config.num_steps, config.k_threshold, config.num_disks,
+            *get_prompts(config.num_disks, config.structured_output, config.prompt_profile))
+    kwargs = {"cache": cache, "journal_dir": config.journal_path(), "resume": config.resume,
+              "config": config, "stats": stats, "metrics": metrics, "feed": feed}
+    if config.adaptive_k:
+        kwargs["policy"] = policy or AdaptiveMargin.from_config(config)
+    if config.use_async_voting:
+        return asyncio.run(generate_solution_async(
+            *args, max_in_flight=config.max_in_flight,
+            speculation_depth=config.speculation_depth, **kwargs))
+    return generate_solution(*args, **kwargs)
+
+
+def verify_solution(actions: Iterable[List[int]], num_disks: int) -> bool:
+    """Verify solution; a printing wrapper around maker.verify.verify_log"""
+    success, _, message = verify_log(actions, num_disks)
+    print(f"\n{'Solution verified' if success else 'Verification failed'}: {message}")
+    return success
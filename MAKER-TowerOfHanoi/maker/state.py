@@ -0,0 +1,147 @@
+from typing import List, Tuple
+
+
+def _peg_disks(mask: int) -> List[int]:
+    """Disks in a peg bitboard, bottom (largest) first"""
+    disks = []
+    while mask:
+        disk = mask.bit_length()
+        disks.append(disk)
+        mask ^= 1 << (disk - 1)
+    return disks
+
+
+def _top(mask: int) -> int:
+    return (mask & -mask).bit_length()
+
+
+class HanoiState:
+    """
+    Immutable Tower of Hanoi state stored as one bitboard per peg.
+
+    Bit d-1 of pegs[p] is set when disk d is on peg p, so the top disk of a
+    peg is its lowest set bit and checking or applying a move is O(1). States
+    hash and compare by their bitboards, compare equal to the equivalent
+    [[...], [...], [...]] lists, and str() renders exactly like those lists
+    so prompts are unchanged. The rendering is cached on the instance.
+    """
+
+    __slots__ = ("pegs", "num_disks", "_text")
+
+    def __init__(self, pegs: Tuple[int, int, int], num_disks: int):
+        self.pegs = pegs
+        self.num_disks = num_disks
+        self._text = None
+
+    @classmethod
+    def initial(cls, num_disks: int) -> "HanoiState":
+        return cls(((1 << num_disks) - 1, 0, 0), num_disks)
+
+    @classmethod
+    def from_lists(cls, state: List[List[int]], num_disks: int = None) -> "HanoiState":
+        """
+        Build a state from [[...], [...], [...]] in a single pass.
+
+        Raises ValueError with the red-flag parser's messages if the lists are
+        not three pegs holding disks 1..num_disks exactly once, largest at the
+        bottom of each peg.
+        """
+        if not (isinstance(state, list) and len(state) == 3 and all(isinstance(t, list) for t in state)):
+            raise ValueError("'next_state' must be a list of three lists.")
+        if num_disks is None:
+            num_disks = sum(len(peg) for peg in state)
+
+        masks = [0, 0, 0]
+        seen = 0
+        bad_type = bad_members = False
+        bad_order = None
+        for i, peg in enumerate(state):
+            below = num_disks + 1
+            for disk in peg:
+                if not isinstance(disk, int):
+                    bad_type = True
+                    continue
+                if disk < 1 or disk > num_disks or seen >> (disk - 1) & 1:
+                    bad_members = True
+                else:
+                    bit = 1 << (disk - 1)
+                    seen |= bit
+                    masks[i] |= bit
+                if disk >= below and bad_order is None:
+                    bad_order = i
+                below = disk
+
+        if bad_type:
+            raise ValueError("All entries in 'next_state' must be integers.")
+        if bad_members or seen != (1 << num_disks) - 1:
+            flat = [x for t in state for x in t]
+            missing = sorted(set(range(1, num_disks + 1)) - set(flat))
+            extra = sorted(set(flat) - set(range(1, num_disks + 1)))
+            raise ValueError(f"State must contain 1..{num_disks} exactly once. "
+                             f"Missing: {missing or '[]'}, Extras: {extra or '[]'}")
+        if bad_order is not None:
+            raise ValueError(f"Peg {bad_order} has invalid disk order: {state[bad_order]}")
+        return cls(tuple(masks), num_disks)
+
+    @classmethod
+    def from_positions(cls, positions: bytes) -> "HanoiState":
+        """Build a state from the peg of each disk, disk 1 first"""
+        masks = [0, 0, 0]
+        for i, peg in enumerate(positions):
+            masks[peg] |= 1 << i
+        return cls(tuple(masks), len(positions))
+
+    def positions(self) -> bytes:
+        """The peg of each disk, disk 1 first"""
+        return bytes(self.peg_of(disk) for disk in range(1, self.num_disks + 1))
+
+    def peg_of(self, disk: int) -> int:
+        bit = 1 << (disk - 1)
+        return 0 if self.pegs[0] & bit else 1 if self.pegs[1] & bit else 2
+
+    def top(self, peg: int) -> int:
+        """Top disk on peg, or 0 if it is empty"""
+        return _top(self.pegs[peg])
+
+    def apply(self, move: List[int]) -> "HanoiState":
+        """Return the state after move; raises ValueError if it is illegal here"""
+        disk, from_peg, to_peg = move
+        source = self.pegs[from_peg]
+        if not source:
+            raise ValueError(f"Invalid move: Peg {from_peg} is empty")
+        top = _top(source)
+        if top != disk:
+            raise ValueError(f"Invalid move: Top disk on peg {from_peg} is {top}, not {disk}")
+        target = self.pegs[to_peg]
+        if target and _top(target) < disk:
+            raise ValueError(
+                f"Invalid move: Cannot place disk {disk} onto smaller disk "
+                f"{_top(target)} on peg {to_peg}"
+            )
+
+        bit = 1 << (disk - 1)
+        pegs = list(self.pegs)
+        pegs[from_peg] ^= bit
+        pegs[to_peg] |= bit
+        return HanoiState(tuple(pegs), self.num_disks)
+
+    def to_lists(self) -> List[List[int]]:
+        return [_peg_disks(mask) for mask in self.pegs]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, HanoiState):
+            return self.pegs == other.pegs
+        if isinstance(other, list):
+            return self.to_lists() == other
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.pegs)
+
+    def __str__(self) -> str:
+        if self._text is None:
+            self._text = str(self.to_lists())
+        return self._text
+
+    def __repr__(self) -> str:
+        return f"HanoiState({self})"
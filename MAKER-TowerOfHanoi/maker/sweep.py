@@ -0,0 +1,151 @@
+"""
+Run a grid of MAKER configurations concurrently over a process pool.
+
+    python -m maker.sweep --grid grid.json --workers 4 --budget 200000 --out sweep.csv
+
+grid.json maps RunConfig field names to lists of values, e.g.
+{"num_disks": [4, 6, 8], "k_threshold": [1, 2, 3], "backend": ["simulated"]}.
+With adaptive_k true, k_threshold is unused; the margins column records the
+k each run actually voted with, as k:steps pairs.
+Every run draws API calls from one shared budget; runs still going when it
+is used up stop and are reported as unsuccessful. All runs also share one
+request scheduler state, so they respect the account's rate limits together.
+The response cache is off unless the grid sets cache_path: runs sharing a
+cache would re-read each other's samples, so their results would be
+correlated and their call counts would depend on the order they ran in.
+"""
+import os
+import csv
+import json
+import time
+import argparse
+import itertools
+import multiprocessing
+import dataclasses
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+from maker.config import RunConfig
+from maker.adaptive import AdaptiveMargin
+from maker.cache import ResponseCache
+from maker.clients import create_client
+from maker.scheduler import new_state
+from maker.solver import solve
+from maker.verify import verify_log
+from maker.voting import VoteStats, BudgetExhausted
+
+RESULT_FIELDS = ["margins", "steps", "api_calls", "wasted_calls", "prompt_tokens", "completion_tokens",
+                 "red_flags", "api_errors", "wall_time", "success", "error"]
+
+_budget = None
+_scheduler_state = None
+
+
+def expand_grid(grid: Dict[str, list], base: RunConfig = None) -> List[RunConfig]:
+    """One RunConfig per combination of the grid's values"""
+    base = base or RunConfig()
+    unknown = set(grid) - {f.name for f in dataclasses.fields(RunConfig)}
+    if unknown:
+        raise ValueError(f"Unknown RunConfig fields in grid: {sorted(unknown)}")
+    names = list(grid)
+    return [dataclasses.replace(base, **dict(zip(names, values)))
+            for values in itertools.product(*(grid[name] for name in names))]
+
+
+def _init_worker(budget, scheduler_state):
+    global _budget, _scheduler_state
+    _budget = budget
+    _scheduler_state = scheduler_state
+
+
+def run_one(config: RunConfig) -> dict:
+    """Solve one configuration and return its results row"""
+    stats = VoteStats()
+    policy = AdaptiveMargin.from_config(config) if config.adaptive_k else None
+    cache = None
+    if config.cache_path:
+        cache = ResponseCache(config.cache_path, config.cache_max_entries,
+                              config.cache_samples_per_key)
+    start = time.time()
+    actions, success, error = None, False, ""
+    try:
+        actions = solve(create_client(config, _budget, _scheduler_state), config, cache, stats,
+                        policy=policy)
+        success = verify_log(actions, config.num_disks)[0]
+    except BudgetExhausted as e:
+        error = str(e)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        if cache is not None:
+            cache.close()
+
+    row = dataclasses.asdict(config)
+    if policy is not None:
+        margins = " ".join(f"{k}:{n}" for k, n in sorted(policy.margins.items()))
+    else:
+        margins = f"{config.k_threshold}:{len(actions) if actions is not None else 0}"
+    row.update({
+        "margins": margins,
+        "steps": len(actions) if actions is not None else 0,
+        "api_calls": stats.calls + stats.wasted_calls,
+        "wasted_calls": stats.wasted_calls,
+        "prompt_tokens": stats.prompt_tokens,
+        "completion_tokens": stats.completion_tokens,
+        "red_flags": stats.red_flags,
+        "api_errors": stats.api_errors,
+        "wall_time": round(time.time() - start, 3),
+        "success": success,
+        "error": error,
+    })
+    return row
+
+
+def run_sweep(configs: List[RunConfig], out_path: str, workers: int = None,
+              budget: int = None) -> List[dict]:
+    """
+    Run configs across a process pool, appending one CSV row to out_path as
+    each run finishes. budget caps the total API requests of all runs.
+    """
+    shared = multiprocessing.Value("q", budget if budget is not None else 2 ** 62)
+    fields = [f.name for f in dataclasses.fields(RunConfig)] + RESULT_FIELDS
+    rows = []
+    write_header = not os.path.exists(out_path)
+    with open(out_path, "a", newline="") as f, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(shared, new_state(shared=True))) as pool:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        if write_header:
+            writer.writeheader()
+        futures = [pool.submit(run_one, config) for config in configs]
+        for future in as_completed(futures):
+            row = future.result()
+            row["simulator_error_rates"] = json.dumps(row["simulator_error_rates"])
+            writer.writerow(row)
+            f.flush()
+            rows.append(row)
+            print(f"[sweep] disks={row['num_disks']} k={row['margins']} "
+                  f"model={row['model']} success={row['success']} "
+                  f"calls={row['api_calls']} time={row['wall_time']}s")
+    print(f"[sweep] {len(rows)} runs written to {out_path}; "
+          f"{shared.value if budget is not None else 'unlimited'} requests of budget left")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a grid of MAKER configurations in parallel")
+    parser.add_argument("--grid", required=True, help="JSON file mapping RunConfig fields to value lists")
+    parser.add_argument("--out", default="sweep.csv")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--budget", type=int, default=None, help="total API requests across all runs")
+    args = parser.parse_args()
+
+    with open(args.grid) as f:
+        grid = json.load(f)
+    # Parallel runs must not share a journal directory, try to resume each other,
+    # or draw their votes from each other's cached samples
+    base = RunConfig(journal_dir=None, resume=False, cache_path=None)
+    run_sweep(expand_grid(grid, base), args.out, args.workers, args.budget)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import numpy as np
+from typing import Iterable, List, Tuple, Union
+from maker.action_log import ActionLog
+
+CHUNK = 1 << 20
+
+
+def _as_log(actions: Union[ActionLog, str, Iterable[List[int]]]) -> ActionLog:
+    if isinstance(actions, ActionLog):
+        return actions
+    if isinstance(actions, str):
+        return ActionLog.open(actions, readonly=True)
+    return ActionLog.from_moves(actions)
+
+
+def _decode_chunk(log: ActionLog, start: int, stop: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(disk, from_peg, to_peg) arrays for moves [start, stop), read in place"""
+    raw = np.frombuffer(log[start:stop].raw(), dtype=np.uint8).reshape(-1, 2)
+    return raw[:, 0], raw[:, 1] >> 2, raw[:, 1] & 3
+
+
+def optimal_moves(num_disks: int, start: int, stop: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Closed-form optimal moves [start, stop) for num_disks disks.
+
+    Move i moves disk d = (lowest set bit of i+1) + 1, for the m-th time where
+    m = (i+1) >> d. Disk d always cycles in one direction: +1 (0 -> 1 -> 2)
+    when num_disks - d is odd, -1 (0 -> 2 -> 1) when it is even.
+    """
+    x = np.arange(start + 1, stop + 1, dtype=np.int64)
+    disk = np.frexp((x & -x).astype(np.float64))[1].astype(np.int64)
+    step = np.where((num_disks - disk) % 2 == 1, 1, 2)
+    m = x >> disk
+    return disk.astype(np.uint8), ((m * step) % 3).astype(np.uint8), (((m + 1) * step) % 3).astype(np.uint8)
+
+
+def optimal_prefix(actions, num_disks: int, start: int = 0, chunk: int = CHUNK) -> int:
+    """
+    Length of the longest prefix of the log that follows the optimal
+    solution, checking from move start on (earlier moves are taken as
+    matching). A log longer than the solution stops matching at its end.
+    """
+    log = _as_log(actions)
+    stop_at = min(len(log), 2 ** num_disks - 1)
+    for begin in range(start, stop_at, chunk):
+        stop = min(begin + chunk, stop_at)
+        disk, from_peg, to_peg = _decode_chunk(log, begin, stop)
+        opt_disk, opt_from, opt_to = optimal_moves(num_disks, begin, stop)
+        bad = np.flatnonzero((disk != opt_disk) | (from_peg != opt_from) | (to_peg != opt_to))
+        if bad.size:
+            return begin + int(bad[0])
+    return max(start, stop_at)
+
+
+def optimal_positions(num_disks: int, step: int) -> bytes:
+    """
+    Peg of each disk (disk 1 first) after the first step moves of the optimal
+    solution: disk d has then moved (step + 2^(d-1)) >> d times along its cycle.
+    """
+    positions = bytearray(num_disks)
+    for d in range(1, num_disks + 1):
+        moves = (step + (1 << (d - 1))) >> d
+        positions[d - 1] = moves * (1 if (num_disks - d) % 2 == 1 else 2) % 3
+    return bytes(positions)
+
+
+def first_deviation(actions, num_disks: int, chunk: int = CHUNK) -> int:
+    """Index of the first move that differs from the optimal solution, or -1"""
+    log = _as_log(actions)
+    total = 2 ** num_disks - 1
+    prefix = optimal_prefix(log, num_disks, 0, chunk)
+    if prefix < min(len(log), total):
+        return prefix
+    if len(log) != total:
+        return min(len(log), total)
+    return -1
+
+
+def first_illegal(actions, num_disks: int, chunk: int = CHUNK) -> Tuple[int, np.ndarray]:
+    """
+    Vectorized legality check of an arbitrary move log.
+
+    A move of disk d from peg a to peg b is legal exactly when d is on a and
+    every smaller disk sits on the third peg. Per chunk, each disk's peg is
+    forward-filled from its own moves, so memory stays O(chunk) whatever
+    the log length. Returns (index of the first illegal move or -1, peg of
+    each disk after the last legal move checked).
+    """
+    log = _as_log(actions)
+    positions = np.zeros(num_disks + 1, dtype=np.uint8)   # index 0 unused
+    for start in range(0, len(log), chunk):
+        stop = min(start + chunk, len(log))
+        disk, from_peg, to_peg = _decode_chunk(log, start, stop)
+        n = stop - start
+
+        malformed = ((disk < 1) | (disk > num_disks) | (from_peg > 2) | (to_peg > 2)
+                     | (from_peg == to_peg))
+        third = (3 - from_peg.astype(np.int16) - to_peg).astype(np.uint8)
+        illegal = malformed.copy()
+        blocked = np.zeros(n, dtype=bool)
+        arange = np.arange(n)
+        ends = positions.copy()
+
+        for d in range(1, num_disks + 1):
+            moved = np.flatnonzero(disk == d)
+            marks = np.zeros(n, dtype=bool)
+            values = np.zeros(n, dtype=np.uint8)
+            marks[0], values[0] = True, positions[d]
+            after = moved + 1
+            inside = after < n
+            marks[after[inside]] = True
+            values[after[inside]] = to_peg[moved[inside]]
+            before = values[np.maximum.accumulate(np.where(marks, arange, 0))]
+
+            illegal[moved] |= (before[moved] != from_peg[moved]) | blocked[moved]
+            blocked |= before != third
+            if moved.size:
+                ends[d] = to_peg[moved[-1]]
+
+        bad = np.flatnonzero(illegal)
+        if bad.size:
+            first = int(bad[0])
+            if first:
+                positions = _replay_positions(positions, disk[:first], to_peg[:first])
+            return start + first, positions[1:]
+        positions = ends
+    return -1, positions[1:]
+
+
+def _replay_positions(positions: np.ndarray, disk: np.ndarray, to_peg: np.ndarray) -> np.ndarray:
+    positions = positions.copy()
+    # Later moves of the same disk win, as in a sequential replay
+    positions[disk] = to_peg
+    return positions
+
+
+def verify_log(actions, num_disks: int, chunk: int = CHUNK) -> Tuple[bool, int, str]:
+    """
+    Bulk replacement for verify_solution on large logs.
+
+    Returns (success, index, message); index is the first failing move, or
+    -1 on success. Optimal logs are confirmed with the closed form alone; any
+    other log falls back to the vectorized legality check.
+    """
+    log = _as_log(actions)
+    deviation = first_deviation(log, num_disks, chunk)
+    if deviation == -1:
+        return True, -1, f"All {len(log)} moves match the optimal solution"
+
+    bad, positions = first_illegal(log, num_disks, chunk)
+    if bad != -1:
+        return False, bad, f"Move {bad} ({log[bad]}) is illegal; first deviation from optimal at {deviation}"
+    if not np.all(positions == 2):
+        return False, len(log), f"All moves legal but disks end on pegs {positions.tolist()}"
+    return True, -1, f"All {len(log)} moves legal and solved (non-optimal from move {deviation})"
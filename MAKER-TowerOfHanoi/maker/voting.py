@@ -1,108 +1,633 @@
 import time
-import json
+import asyncio
 from collections import defaultdict
-from typing import List, Tuple
-import openai
-from maker.parser import parse_move_state_flag, validate_transition
-from maker.config import TEMPERATURE_FIRST, TEMPERATURE_REST, MAX_TOKENS, USE_RED_FLAGGING, MODEL
-
-def get_vote(client, current_state: List[List[int]], prev_move: List[int],
-             temperature: float, num_disks: int, system_prompt: str, 
-             user_template: str) -> Tuple[List[int], List[List[int]]]:
-    """Algorithm 3: get_vote with proper previous move formatting"""
-    
-    attempt = 0
-    max_attempts = 50
-    
-    while attempt < max_attempts:
-        attempt += 1
+from typing import List, Tuple, TYPE_CHECKING
+from maker.parser import (parse_move_state_flag, parse_structured, validate_transition,
+                          RESPONSE_FORMAT, StreamScanner)
+from maker.state import HanoiState
+from maker.cache import ResponseCache, request_key
+from maker.config import RunConfig
+from maker.metrics import Metrics, clock, red_flag_reason
+from maker.scheduler import retry_delay
+
+if TYPE_CHECKING:
+    import openai
+
+MAX_VOTING_ROUNDS = 100
+
+
+class NonRetryableError(RuntimeError):
+    """Raised by a client for a request that retrying cannot answer; get_votes lets it through"""
+
+
+class BudgetExhausted(NonRetryableError):
+    """Raised by a client when a shared request budget is used up"""
+
+
+_PREV_MOVE_PHRASES = {}
+
+
+def format_prev_move(prev_move: List[int], profile: str = "full") -> str:
+    """Render the previous move the way the profile's user template expects it (memoized)"""
+    move = None if prev_move is None or prev_move == [0, 0, 0] else tuple(prev_move)
+    phrase = _PREV_MOVE_PHRASES.get((move, profile))
+    if phrase is not None:
+        return phrase
+    if profile == "compact":
+        phrase = "None" if move is None else "[{},{},{}]".format(*move)
+    elif move is None:
+        phrase = "None (this is the first move)"
+    elif move[0] == 1:
+        phrase = f"{list(move)} (disk 1 was moved)"
+    else:
+        phrase = f"{list(move)} (disk {move[0]} was moved, NOT disk 1)"
+    _PREV_MOVE_PHRASES[(move, profile)] = phrase
+    return phrase
+
+
+def format_state(state: HanoiState, profile: str = "full") -> str:
+    """The state as the profile encodes it; compact drops the spaces"""
+    if profile == "compact":
+        return str(state).replace(" ", "")
+    return str(state)
+
+
+def build_messages(current_state: HanoiState, prev_move: List[int],
+                   system_prompt: str, user_template: str,
+                   profile: str = "full") -> List[dict]:
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_template.format(
+            previous_move=format_prev_move(prev_move, profile),
+            current_state=format_state(current_state, profile)
+        )}
+    ]
+
+
+def usage_tokens(response) -> Tuple[int, int]:
+    """(prompt, completion) tokens a response reports, (0, 0) if it has no usage"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return 0, 0
+    return usage.prompt_tokens or 0, usage.completion_tokens or 0
+
+
+class VoteStats:
+    """Running counters for the API calls made while voting"""
+
+    def __init__(self):
+        self.calls = 0
+        self.samples = 0
+        self.red_flags = 0
+        self.api_errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.wasted_calls = 0
+        self.streamed = 0
+        self.stream_aborts = 0
+        self.tokens_saved = 0
+        self.decision_seconds = 0.0
+        self.votes = {}
+
+    def merge(self, other: "VoteStats"):
+        self.calls += other.calls
+        self.samples += other.samples
+        self.red_flags += other.red_flags
+        self.api_errors += other.api_errors
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.wasted_calls += other.wasted_calls
+        self.streamed += other.streamed
+        self.stream_aborts += other.stream_aborts
+        self.tokens_saved += other.tokens_saved
+        self.decision_seconds += other.decision_seconds
+
+    def record_usage(self, response) -> Tuple[int, int]:
+        """Add a response's token usage; returns (prompt_tokens, completion_tokens)"""
+        return self.add_tokens(*usage_tokens(response))
+
+    def add_tokens(self, prompt_tokens: int, completion_tokens: int) -> Tuple[int, int]:
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        return prompt_tokens, completion_tokens
+
+    def stream_summary(self) -> str:
+        if not self.streamed:
+            return "Streaming: no streamed calls"
+        return (f"Streaming: {self.streamed} calls, {self.decision_seconds / self.streamed:.2f}s "
+                f"mean time-to-decision, {self.stream_aborts} cut off early "
+                f"(at most ~{self.tokens_saved} completion tokens saved)")
+
+
+class VoteTally:
+    """First-to-ahead-by-k bookkeeping shared by the sync and async engines"""
+
+    def __init__(self, k: int, stats: VoteStats = None, metrics: Metrics = None):
+        self.k = k
+        self.metrics = metrics
+        self.votes = defaultdict(int)
+        if stats is not None:
+            stats.votes = self.votes
+        self.vote_mapping = {}
+        self.rounds = 0
+        self.last_key = None
+
+    def add(self, move: List[int], next_state: HanoiState) -> bool:
+        """Record one vote; return True once that vote's key is ahead by k"""
+        if self.metrics is not None:
+            started = clock()
+            decided = self._add(move, next_state)
+            self.metrics.time("tally", clock() - started)
+            return decided
+        return self._add(move, next_state)
+
+    def _add(self, move: List[int], next_state: HanoiState) -> bool:
+        self.rounds += 1
+        vote_key = tuple(move)
+        self.votes[vote_key] += 1
+        self.vote_mapping[vote_key] = (move, next_state)
+        self.last_key = vote_key
+
+        max_other = max([v for vk, v in self.votes.items() if vk != vote_key], default=0)
+        return self.votes[vote_key] >= self.k + max_other
+
+    def leader(self):
+        if not self.votes:
+            return None
+        return max(self.votes, key=self.votes.get)
+
+    def votes_needed(self) -> int:
+        """Fewest further votes that could settle the step"""
+        ranked = sorted(self.votes.values(), reverse=True) + [0, 0]
+        return max(1, self.k + ranked[1] - ranked[0])
+
+    def decided(self) -> Tuple[List[int], HanoiState]:
+        return self.vote_mapping[self.last_key]
+
+    def fallback(self) -> Tuple[List[int], HanoiState]:
+        winner_key = self.leader()
+        print(f"  Warning: Voting timeout. Votes: {dict(self.votes)}")
+        return self.vote_mapping[winner_key]
+
+
+class _Call:
+    """One get_vote attempt as Metrics sees it: timing, tokens and outcome"""
+
+    __slots__ = ("metrics", "step", "temperature", "start", "tokens", "cached", "booked")
+
+    def __init__(self, metrics: Metrics, step: int, temperature: float):
+        self.metrics = metrics
+        self.step = step
+        self.temperature = temperature
+        self.start = clock()
+        self.tokens = (0, 0)
+        self.cached = False
+        self.booked = False
+
+    def check(self, parse, response_text: str, num_disks: int,
+              current_state: HanoiState) -> Tuple[List[int], HanoiState]:
+        """Parse and validate response_text, timing each when metrics are on"""
+        if self.metrics is None:
+            move, next_state = parse(response_text, num_disks)
+            validate_transition(current_state, move, next_state)
+            return move, next_state
+        started = clock()
         try:
+            move, next_state = parse(response_text, num_disks)
+        finally:
+            parsed = clock()
+            self.metrics.time("parse", parsed - started)
+        try:
+            validate_transition(current_state, move, next_state)
+        finally:
+            self.metrics.time("validate", clock() - parsed)
+        return move, next_state
+
+    def done(self, outcome: str, error: Exception = None):
+        # With n choices the request itself (latency, tokens) is booked once, on its first choice
+        request = not self.cached and not self.booked
+        if self.metrics is not None:
+            self.metrics.call(self.step, self.temperature, clock() - self.start,
+                              self.tokens if request else (0, 0), outcome,
+                              red_flag_reason(error) if error is not None else "",
+                              self.cached, request)
+        if request:
+            self.booked = True
+
+
+def completion_kwargs(config: RunConfig, messages: List[dict], temperature: float,
+                      n: int = 1) -> dict:
+    """Arguments for chat.completions.create as the voting code sends them"""
+    kwargs = {
+        "model": config.model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": config.max_tokens,
+    }
+    if n > 1:
+        kwargs["n"] = n
+    if config.structured_output:
+        kwargs["response_format"] = RESPONSE_FORMAT
+    return kwargs
+
+
+def _stream_chunk(chunk, scanner: StreamScanner) -> bool:
+    """Feed one stream chunk to scanner; True once the answer is complete"""
+    if not chunk.choices:
+        return False
+    content = chunk.choices[0].delta.content
+    return bool(content) and scanner.feed(content)
+
 
-            if prev_move is None or prev_move == [0, 0, 0]:
-                prev_move_str = "None (this is the first move)"
-            else:
-                disk = prev_move[0]
-                if disk == 1:
-                    prev_move_str = f"{prev_move} (disk 1 was moved)"
+def _stream_done(scanner: StreamScanner, start: float, stats: VoteStats, config: RunConfig,
+                 messages: List[dict], usage, aborted: bool, closed: bool, call: _Call):
+    if usage is not None:
+        call.tokens = (usage.prompt_tokens or 0, usage.completion_tokens or 0)
+    else:
+        # Closed before the usage chunk: estimate, about four characters a token
+        call.tokens = (sum(len(m["content"]) for m in messages) // 4, scanner.chunks)
+    if stats is None:
+        return
+    stats.add_tokens(*call.tokens)
+    stats.streamed += 1
+    stats.decision_seconds += time.perf_counter() - start
+    if aborted:
+        stats.stream_aborts += 1
+    if aborted or closed:
+        # Closed before the model finished: an upper bound, at most max_tokens would have come
+        stats.tokens_saved += max(0, config.max_tokens - scanner.chunks)
+
+
+def _stream_text(client, config: RunConfig, messages: List[dict], temperature: float,
+                 stats: VoteStats, call: _Call) -> str:
+    """
+    Stream one completion, closing it as soon as StreamScanner sees a complete
+    answer; raises ValueError (a red flag) when it runs over budget or off-format.
+    """
+    start = time.perf_counter()
+    scanner = StreamScanner(config.structured_output, config.stream_max_chars,
+                            max_preamble=config.stream_max_preamble)
+    stream = client.chat.completions.create(
+        **completion_kwargs(config, messages, temperature),
+        stream=True, stream_options={"include_usage": True})
+    usage, aborted, closed = None, False, False
+    try:
+        for chunk in stream:
+            usage = chunk.usage or usage
+            if _stream_chunk(chunk, scanner):
+                closed = True
+                break
+    except ValueError:
+        aborted = True
+        raise
+    finally:
+        stream.close()
+        _stream_done(scanner, start, stats, config, messages, usage, aborted, closed, call)
+    return scanner.text()
+
+
+async def _stream_text_async(client, config: RunConfig, messages: List[dict],
+                             temperature: float, stats: VoteStats, call: _Call) -> str:
+    """_stream_text on an async client"""
+    start = time.perf_counter()
+    scanner = StreamScanner(config.structured_output, config.stream_max_chars,
+                            max_preamble=config.stream_max_preamble)
+    stream = await client.chat.completions.create(
+        **completion_kwargs(config, messages, temperature),
+        stream=True, stream_options={"include_usage": True})
+    usage, aborted, closed = None, False, False
+    try:
+        async for chunk in stream:
+            usage = chunk.usage or usage
+            if _stream_chunk(chunk, scanner):
+                closed = True
+                break
+    except ValueError:
+        aborted = True
+        raise
+    finally:
+        await stream.close()
+        _stream_done(scanner, start, stats, config, messages, usage, aborted, closed, call)
+    return scanner.text()
+
+
+def _request_key(config: RunConfig, messages: List[dict], temperature: float) -> str:
+    if config.structured_output:
+        return request_key(config.model, temperature, messages, response_format=RESPONSE_FORMAT)
+    return request_key(config.model, temperature, messages)
+
+
+def _red_flag(e: ValueError, attempt: int, stats: VoteStats, config: RunConfig):
+    if stats is not None:
+        stats.red_flags += 1
+    if not config.use_red_flagging:
+        raise e
+    if attempt % 10 == 0:
+        print(f"  Resampling (attempt {attempt}): {str(e)[:80]}")
+
+
+class _Sampler:
+    """
+    One get_votes call, minus the I/O: cache lookups, red flags, API-error
+    retries and the attempt budget shared by get_votes and get_votes_async.
+    """
+
+    max_attempts = 50
+
+    def __init__(self, client, current_state: HanoiState, prev_move: List[int],
+                 temperature: float, n: int, num_disks: int, system_prompt: str,
+                 user_template: str, stats: VoteStats, cache: ResponseCache,
+                 config: RunConfig, metrics: Metrics, step: int, messages: List[dict]):
+        self.config = config or RunConfig()
+        self.current_state = current_state
+        self.temperature = temperature
+        self.n = 1 if self.config.streaming else n
+        self.num_disks = num_disks
+        self.stats = stats
+        self.cache = cache
+        self.metrics = metrics
+        self.step = step
+        if messages is None:
+            messages = build_messages(current_state, prev_move, system_prompt, user_template,
+                                      self.config.prompt_profile)
+        self.messages = messages
+        self.key = _request_key(self.config, messages, temperature) if cache is not None else None
+        self.parse = parse_structured if self.config.structured_output else parse_move_state_flag
+        # Sleeping between retries is left to a client that schedules its own
+        self.sleeps = not getattr(client, "schedules_retries", False)
+        self.attempt = 0
+        self.texts, self.slots = [], []
+
+    def calls(self):
+        """A _Call per attempt, until max_attempts is spent"""
+        while self.attempt < self.max_attempts:
+            self.attempt += 1
+            yield _Call(self.metrics, self.step, self.temperature)
+        raise RuntimeError(f"Failed after {self.max_attempts} attempts")
+
+    def from_cache(self) -> int:
+        """Take what the cache holds; returns how many samples must go live"""
+        self.texts, self.slots = [], [None] * self.n
+        # A greedy response is only reused for the first attempt; retries go live
+        if self.cache is not None and not (self.temperature == 0 and self.attempt > 1):
+            self.slots = []
+            for _ in range(self.n):
+                text, slot = self.cache.lookup(self.key, self.temperature)
+                if text is None:
+                    self.slots.append(slot)
                 else:
-                    prev_move_str = f"{prev_move} (disk {disk} was moved, NOT disk 1)"
-            
-
-            response = client.chat.completions.create(
-                model=MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_template.format(
-                        previous_move=prev_move_str,
-                        current_state=current_state
-                    )}
-                ],
-                temperature=temperature,
-                max_tokens=MAX_TOKENS
-            )
-
-            response_text = response.choices[0].message.content
-
-            # Parse and validate
-            move, next_state = parse_move_state_flag(response_text, num_disks)
-            validate_transition(current_state, move, next_state)
+                    self.texts.append(text)
+        if self.slots and self.stats is not None:
+            self.stats.calls += 1
+            self.stats.samples += len(self.slots)
+        return len(self.slots)
 
-            return move, next_state
+    def request(self, n: int) -> dict:
+        return completion_kwargs(self.config, self.messages, self.temperature, n)
+
+    def response_texts(self, response, call: _Call) -> List[str]:
+        call.tokens = usage_tokens(response)
+        if self.stats is not None:
+            self.stats.add_tokens(*call.tokens)
+        return [choice.message.content for choice in response.choices]
+
+    def received(self, fresh: List[str]):
+        if self.cache is not None:
+            for slot, text in zip(self.slots, fresh):
+                self.cache.store(self.key, slot, text)
+        self.texts += fresh
+
+    def failed(self, call: _Call, e: Exception) -> float:
+        """Book a failed attempt; returns the seconds to wait before the next one"""
+        if isinstance(e, ValueError):
+            call.done("red_flag", e)
+            _red_flag(e, self.attempt, self.stats, self.config)
+            return 0.0
+        if isinstance(e, NonRetryableError):
+            raise e
+        call.done("api_error")
+        if self.stats is not None:
+            self.stats.api_errors += 1
+        print(f"API Error: {e}, retrying...")
+        return retry_delay(e, self.attempt) if self.sleeps else 0.0
 
-        except ValueError as e:
-            if USE_RED_FLAGGING:
-                if attempt % 10 == 0:
-                    print(f"  Resampling (attempt {attempt}): {str(e)[:80]}")
-                continue
-            else:
-                raise
+    def votes(self, call: _Call) -> List[Tuple[List[int], HanoiState]]:
+        """Parse and red-flag each choice on its own; the first cached of them came from the cache"""
+        cached = self.n - len(self.slots)
+        votes = []
+        for i, text in enumerate(self.texts):
+            call.cached = i < cached
+            try:
+                votes.append(call.check(self.parse, text, self.num_disks, self.current_state))
+                call.done("accepted")
+            except ValueError as e:
+                call.done("red_flag", e)
+                _red_flag(e, self.attempt, self.stats, self.config)
+        return votes
+
+
+def get_votes(client, current_state: HanoiState, prev_move: List[int],
+              temperature: float, n: int, num_disks: int, system_prompt: str,
+              user_template: str, stats: VoteStats = None,
+              cache: ResponseCache = None, config: RunConfig = None,
+              metrics: Metrics = None, step: int = None,
+              messages: List[dict] = None) -> List[Tuple[List[int], HanoiState]]:
+    """
+    Algorithm 3 for up to n samples at once.
+
+    Cached samples are used first; the rest are requested in a single call
+    with n choices, so the prompt is sent and billed once. Each choice is
+    parsed and red-flagged on its own. Returns the valid votes, retrying
+    until there is at least one. Streaming requests one choice at a time.
+    messages, if given, are the step's prebuilt build_messages().
+    """
+
+    sampler = _Sampler(client, current_state, prev_move, temperature, n, num_disks,
+                       system_prompt, user_template, stats, cache, config, metrics, step,
+                       messages)
+    for call in sampler.calls():
+        try:
+            live = sampler.from_cache()
+            if live and sampler.config.streaming:
+                sampler.received([_stream_text(client, sampler.config, sampler.messages,
+                                               temperature, stats, call)])
+            elif live:
+                response = client.chat.completions.create(**sampler.request(live))
+                sampler.received(sampler.response_texts(response, call))
         except Exception as e:
-            print(f"API Error: {e}, retrying...")
-            time.sleep(1)
+            delay = sampler.failed(call, e)
+            if delay:
+                time.sleep(delay)
             continue
-    
-    raise RuntimeError(f"Failed after {max_attempts} attempts")
+
+        # Parse and validate
+        votes = sampler.votes(call)
+        if votes:
+            return votes
 
 
-def do_voting(client, state: List[List[int]], prev_move: List[int],
-              k: int, num_disks: int, system_prompt: str, user_template: str) -> Tuple[List[int], List[List[int]]]:
+def get_vote(client, current_state: HanoiState, prev_move: List[int],
+             temperature: float, num_disks: int, system_prompt: str,
+             user_template: str, stats: VoteStats = None,
+             cache: ResponseCache = None, config: RunConfig = None,
+             metrics: Metrics = None, step: int = None) -> Tuple[List[int], HanoiState]:
+    """Algorithm 3: get_vote with proper previous move formatting"""
+    return get_votes(client, current_state, prev_move, temperature, 1, num_disks,
+                     system_prompt, user_template, stats, cache, config, metrics, step)[0]
+
+
+def do_voting(client, state: HanoiState, prev_move: List[int],
+              k: int, num_disks: int, system_prompt: str, user_template: str,
+              stats: VoteStats = None, cache: ResponseCache = None,
+              config: RunConfig = None, metrics: Metrics = None,
+              step: int = None) -> Tuple[List[int], HanoiState]:
     """Algorithm 2: do_voting"""
-    
-    votes = defaultdict(int)
-    vote_mapping = {}
+
+    config = config or RunConfig()
+    tally = VoteTally(k, stats, metrics)
+    # Every sample of the step sends the same messages
+    messages = build_messages(state, prev_move, system_prompt, user_template,
+                              config.prompt_profile)
 
     # First vote (greedy)
-    move, next_state = get_vote(
-        client, state, prev_move, TEMPERATURE_FIRST, num_disks, 
-        system_prompt, user_template
-    )
-    vote_key = json.dumps(move)
-    votes[vote_key] = 1
-    vote_mapping[vote_key] = (move, next_state)
-
-    max_other = max([v for vk, v in votes.items() if vk != vote_key], default=0)
-    if votes[vote_key] >= k + max_other:
+    move, next_state = get_votes(
+        client, state, prev_move, config.temperature_first, 1, num_disks,
+        system_prompt, user_template, stats, cache, config, metrics, step, messages
+    )[0]
+    if tally.add(move, next_state):
         return move, next_state
 
-    # Continue voting
-    round_num = 1
-    while round_num < 100:
-        round_num += 1
-        move, next_state = get_vote(
-            client, state, prev_move, TEMPERATURE_REST, num_disks,
-            system_prompt, user_template
-        )
-        vote_key = json.dumps(move)
-        votes[vote_key] += 1
-        vote_mapping[vote_key] = (move, next_state)
-
-        max_other = max([v for vk, v in votes.items() if vk != vote_key], default=0)
-        if votes[vote_key] >= k + max_other:
-            if round_num > 10:
-                print(f"  Note: {round_num} voting rounds needed")
-            return vote_mapping[vote_key]
-    
+    # Continue voting, asking for as many samples per call as could settle the step
+    while tally.rounds < MAX_VOTING_ROUNDS:
+        n = min(config.max_samples_per_call, tally.votes_needed(),
+                MAX_VOTING_ROUNDS - tally.rounds)
+        for move, next_state in get_votes(
+            client, state, prev_move, config.temperature_rest, n, num_disks,
+            system_prompt, user_template, stats, cache, config, metrics, step, messages
+        ):
+            if tally.add(move, next_state):
+                if tally.rounds > 10:
+                    print(f"  Note: {tally.rounds} voting rounds needed")
+                return tally.decided()
+
     # Fallback
-    winner_key = max(votes, key=votes.get)
-    print(f"  Warning: Voting timeout. Votes: {dict(votes)}")
-    return vote_mapping[winner_key]
+    return tally.fallback()
+
+
+async def get_votes_async(client: "openai.AsyncOpenAI", current_state: HanoiState,
+                          prev_move: List[int], temperature: float, n: int, num_disks: int,
+                          system_prompt: str, user_template: str,
+                          stats: VoteStats = None, cache: ResponseCache = None,
+                          config: RunConfig = None, metrics: Metrics = None,
+                          step: int = None,
+                          messages: List[dict] = None) -> List[Tuple[List[int], HanoiState]]:
+    """get_votes on an AsyncOpenAI client"""
+
+    sampler = _Sampler(client, current_state, prev_move, temperature, n, num_disks,
+                       system_prompt, user_template, stats, cache, config, metrics, step,
+                       messages)
+    for call in sampler.calls():
+        try:
+            live = sampler.from_cache()
+            if live and sampler.config.streaming:
+                sampler.received([await _stream_text_async(
+                    client, sampler.config, sampler.messages, temperature, stats, call)])
+            elif live:
+                response = await client.chat.completions.create(**sampler.request(live))
+                sampler.received(sampler.response_texts(response, call))
+        except Exception as e:
+            delay = sampler.failed(call, e)
+            if delay:
+                await asyncio.sleep(delay)
+            continue
+
+        votes = sampler.votes(call)
+        if votes:
+            return votes
+
+
+async def get_vote_async(client: "openai.AsyncOpenAI", current_state: HanoiState,
+                         prev_move: List[int], temperature: float, num_disks: int,
+                         system_prompt: str, user_template: str,
+                         stats: VoteStats = None, cache: ResponseCache = None,
+                         config: RunConfig = None, metrics: Metrics = None,
+                         step: int = None) -> Tuple[List[int], HanoiState]:
+    """Algorithm 3 on an AsyncOpenAI client; same red-flag and retry rules as get_vote"""
+    return (await get_votes_async(client, current_state, prev_move, temperature, 1, num_disks,
+                                  system_prompt, user_template, stats, cache, config,
+                                  metrics, step))[0]
+
+
+async def do_voting_async(client: "openai.AsyncOpenAI", state: HanoiState, prev_move: List[int],
+                          k: int, num_disks: int, system_prompt: str, user_template: str,
+                          max_in_flight: int = None, stats: VoteStats = None,
+                          on_leader=None, cache: ResponseCache = None,
+                          config: RunConfig = None, metrics: Metrics = None,
+                          step: int = None) -> Tuple[List[int], HanoiState]:
+    """
+    Algorithm 2 with concurrent sampling.
+
+    The greedy vote and k-1 temperature_rest votes are sent together. At most
+    max_in_flight (default: the config's) samples are ever outstanding, and
+    never more than could still be needed to settle the step. temperature_rest samples are requested up to
+    config.max_samples_per_call at a time. Everything still in flight is
+    cancelled as soon as a winner is found.
+
+    on_leader, if given, is called with (move, next_state) whenever the
+    leading candidate changes before the step is settled. metrics, if
+    given, records every call labelled with step.
+    """
+
+    config = config or RunConfig()
+    if max_in_flight is None:
+        max_in_flight = config.max_in_flight
+    tally = VoteTally(k, stats, metrics)
+    messages = build_messages(state, prev_move, system_prompt, user_template,
+                              config.prompt_profile)
+    pending = {}   # task -> samples it asked for
+    launched = 0
+    leader = None
+
+    def launch(temperature, n, limit):
+        """Request up to limit samples, n per call; returns how many were asked for"""
+        nonlocal launched
+        asked = 0
+        while asked < limit and launched < MAX_VOTING_ROUNDS:
+            size = min(n, limit - asked, MAX_VOTING_ROUNDS - launched)
+            launched += size
+            asked += size
+            pending[asyncio.ensure_future(get_votes_async(
+                client, state, prev_move, temperature, size, num_disks,
+                system_prompt, user_template, stats, cache, config, metrics, step, messages
+            ))] = size
+        return asked
+
+    max_in_flight = max(1, max_in_flight)
+    launch(config.temperature_first, 1, 1)
+    launch(config.temperature_rest, config.max_samples_per_call, min(k, max_in_flight) - 1)
+
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                del pending[task]
+                for move, next_state in task.result():
+                    if tally.add(move, next_state):
+                        if tally.rounds > 10:
+                            print(f"  Note: {tally.rounds} voting rounds needed")
+                        return tally.decided()
+
+            if on_leader is not None and tally.leader() != leader:
+                leader = tally.leader()
+                on_leader(*tally.vote_mapping[leader])
+
+            wanted = min(max_in_flight, tally.votes_needed())
+            launch(config.temperature_rest, config.max_samples_per_call,
+                   wanted - sum(pending.values()))
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    return tally.fallback()
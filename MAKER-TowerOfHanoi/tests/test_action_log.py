@@ -0,0 +1,92 @@
+import pytest
+from maker.action_log import ActionLog
+from maker.verify import optimal_moves
+
+
+def optimal(num_disks):
+    disk, from_peg, to_peg = optimal_moves(num_disks, 0, 2 ** num_disks - 1)
+    return [[int(d), int(a), int(b)] for d, a, b in zip(disk, from_peg, to_peg)]
+
+
+def test_append_and_index():
+    moves = optimal(5)
+    log = ActionLog(capacity=2)
+    log.extend(moves)
+    assert len(log) == len(moves)
+    assert list(log) == moves
+    assert log[0] == moves[0]
+    assert log[-1] == moves[-1]
+    with pytest.raises(IndexError):
+        log[len(moves)]
+
+
+def test_rejects_moves_that_do_not_fit_a_record():
+    log = ActionLog()
+    for move in ([0, 0, 1], [256, 0, 1], [1, 3, 0], [1, 0, 3]):
+        with pytest.raises(ValueError):
+            log.append(move)
+    assert len(log) == 0
+
+
+def test_slices_are_read_only_views():
+    moves = optimal(6)
+    log = ActionLog.from_moves(moves)
+    view = log[10:40]
+    assert list(view) == moves[10:40]
+    assert list(view[5:10]) == moves[15:20]
+    assert list(log[1:30:3]) == moves[1:30:3]
+    assert bytes(log[1:30:3].raw()) == bytes(ActionLog.from_moves(moves[1:30:3]).raw())
+    with pytest.raises(ValueError):
+        view.append([1, 0, 1])
+
+
+def test_from_bytes_round_trip():
+    moves = optimal(7)
+    log = ActionLog.from_bytes(ActionLog.from_moves(moves).raw().tobytes())
+    assert list(log) == moves
+
+
+def test_reopen_keeps_committed_count(tmp_path):
+    path = str(tmp_path / "moves.bin")
+    moves = optimal(8)
+    log = ActionLog.open(path, capacity=4)   # grows, and remaps, several times
+    log.extend(moves)
+    log.close()
+
+    log = ActionLog.open(path, readonly=True)
+    assert len(log) == len(moves)
+    assert list(log) == moves
+    log.close()
+
+    log = ActionLog.open(path)
+    log.truncate(40)
+    log.close()
+    log = ActionLog.open(path, readonly=True)
+    assert list(log) == moves[:40]
+    log.close()
+
+
+def test_reader_refresh_sees_appends(tmp_path):
+    path = str(tmp_path / "moves.bin")
+    moves = optimal(9)
+    writer = ActionLog.open(path, capacity=16)
+    writer.extend(moves[:10])
+    reader = ActionLog.open(path, readonly=True)
+    assert len(reader) == 10
+    writer.extend(moves[10:])
+    assert reader.refresh() == len(moves)
+    assert list(reader) == moves
+    reader.close()
+    writer.close()
+
+
+def test_close_keeps_moves_readable(tmp_path):
+    moves = optimal(5)
+    log = ActionLog.open(str(tmp_path / "moves.bin"))
+    log.extend(moves)
+    view = log[3:8]
+    log.close()
+    assert list(log) == moves
+    assert list(view) == moves[3:8]
+    with pytest.raises(ValueError):
+        log.append([1, 0, 1])
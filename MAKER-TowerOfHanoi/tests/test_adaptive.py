@@ -0,0 +1,62 @@
+import pytest
+from maker.adaptive import AdaptiveMargin, expected_votes, margin_for, step_success
+from maker.voting import VoteStats
+
+
+def settled(votes: dict, red_flags: int = 0) -> VoteStats:
+    stats = VoteStats()
+    stats.votes = votes
+    stats.samples = sum(votes.values()) + red_flags
+    stats.red_flags = red_flags
+    return stats
+
+
+def run(policy, steps, votes):
+    margins = {}
+    for step in steps:
+        margins[step] = policy.choose(step)
+        policy.observe(step, settled(votes))
+    return margins
+
+
+def test_margin_formulas():
+    assert step_success(0.9, 1) == pytest.approx(0.9)
+    assert step_success(0.9, 3) > step_success(0.9, 2) > 0.9
+    assert expected_votes(0.5, 3) == 9
+    assert expected_votes(0.99, 2) == pytest.approx(2, rel=0.05)
+    assert margin_for(0.5, 0.99) == 8
+    k = margin_for(0.9, 0.999)
+    assert step_success(0.9, k) >= 0.999 > step_success(0.9, k - 1)
+
+
+def test_unanimous_run_settles_on_k1_and_probes_both_step_classes():
+    policy = AdaptiveMargin(num_steps=4000, target_success=1e-6, probe_every=10)
+    margins = run(policy, range(600), {(1, 0, 2): 3})
+    late = {step: k for step, k in margins.items() if step >= 400}
+    assert set(late.values()) == {1, 2}
+    probed = [step for step, k in late.items() if k == 2]
+    assert {step % 2 for step in probed} == {0, 1}
+    assert all((step // 2) % 10 == 0 for step in probed)
+
+
+def test_margin_rises_when_one_class_starts_disagreeing():
+    policy = AdaptiveMargin(num_steps=4000, target_success=1e-6, probe_every=10)
+    run(policy, range(600), {(1, 0, 2): 3})
+    assert policy.choose(603) == 1
+    # Odd steps start disagreeing; at k=1 only their probes can see it
+    for step in range(601, 1000, 2):
+        k = policy.choose(step)
+        policy.observe(step, settled({(2, 0, 1): k + 1, (2, 0, 2): 1}))
+    assert policy.choose(1003) > 2
+    assert policy.choose(1002) == 1
+    assert policy.accuracy(1) < policy.accuracy(0)
+
+
+def test_observe_tracks_red_flags_and_expected_samples():
+    policy = AdaptiveMargin(num_steps=100, decay=0.5)
+    k = policy.choose(0)
+    policy.observe(0, settled({(1, 0, 2): k}, red_flags=k))
+    assert policy.red_flag_rate == pytest.approx(0.25)
+    assert policy.actual_samples == 2 * k
+    assert policy.margins == {k: 1}
+    assert "Adaptive margin" in policy.summary()
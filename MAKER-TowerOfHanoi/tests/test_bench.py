@@ -0,0 +1,90 @@
+import json
+import pytest
+from maker import bench
+from maker.action_log import ActionLog
+from maker.verify import optimal_moves
+
+
+def optimal(num_disks):
+    disk, from_peg, to_peg = optimal_moves(num_disks, 0, 2 ** num_disks - 1)
+    return [[int(d), int(a), int(b)] for d, a, b in zip(disk, from_peg, to_peg)]
+
+
+def test_optimal_helpers_agree_with_the_closed_form():
+    moves = optimal(7)
+    assert list(bench._optimal_log(7)) == moves
+    state, prev_move, move = bench._optimal_step(7, 40)
+    assert (prev_move, move) == (moves[39], moves[40])
+    assert bench._optimal_step(7, 0)[1:] == (None, moves[0])
+    assert len(bench._spread(7, 10)) == 10
+
+
+def test_parse_outputs_rejects_each_corruption_it_should(capsys):
+    results = bench.bench_parse_outputs(num_responses=50, num_disks=6, repeats=1)
+    assert "malformed" not in results["structured"]
+    for path, kinds in results.items():
+        assert kinds["well_formed"]["rejected"] == 0
+        assert kinds["wrong_move"]["rejected"] == 0
+        assert kinds["inconsistent_state"]["rejected"] == 0
+        assert all(row["us_per_response"] > 0 for row in kinds.values())
+    assert results["free_text"]["malformed"]["rejected"] == 1
+
+
+def test_validation_covers_each_disk_count(capsys):
+    results = bench.bench_validation(disks=(3, 12), samples=20, repeats=1)
+    assert set(results) == {"3", "12"}
+    assert all(row["accept_us"] > 0 and row["reject_us"] > 0 for row in results.values())
+
+
+def test_voting_overhead_excludes_the_fake_client(capsys):
+    results = bench.bench_voting(num_disks=6, num_steps=20, k=2)
+    for row in results.values():
+        assert row["calls_per_step"] >= 1
+        assert row["samples_per_step"] >= 2
+        assert row["client_us_per_step"] > 0
+
+
+def test_end_to_end_runs_in_its_own_process(capsys):
+    results = bench.bench_end_to_end(disks=(6,), max_steps=None)
+    row = results["6"]
+    assert (row["steps"], row["solved"]) == (63, True)
+    assert row["peak_rss_mb"] >= row["baseline_rss_mb"] > 0
+
+
+def test_verify_times_a_saved_log(tmp_path, capsys):
+    path = str(tmp_path / "moves.bin")
+    log = ActionLog.open(path)
+    log.extend(optimal(9)[:-1])
+    log.close()
+    results = bench.bench_verify(path, num_disks=9, repeats=1, reference=True)
+    assert (results["moves"], results["success"]) == (510, False)
+    assert results["reference_seconds"] > 0
+    assert bench.bench_verify(num_disks=12, repeats=1)["success"]
+
+
+def test_compare_flags_regressions_in_each_direction(capsys):
+    baseline = {"meta": {"quick": True},
+                "voting": {"sync": {"overhead_us_per_step": 100.0, "calls_per_step": 1.0}},
+                "end_to_end": {"10": {"steps_per_second": 1000.0, "peak_rss_mb": 50.0,
+                                      "baseline_rss_mb": 40.0, "solved": True}}}
+    current = json.loads(json.dumps(baseline))
+    current["voting"]["sync"]["overhead_us_per_step"] = 105.0
+    current["end_to_end"]["10"]["steps_per_second"] = 800.0
+    current["end_to_end"]["10"]["baseline_rss_mb"] = 80.0
+    assert set(bench._timings(current)) == {"voting/sync/overhead_us_per_step",
+                                            "end_to_end/10/steps_per_second", "end_to_end/10/peak_rss_mb"}
+    regressions = bench.compare(current, baseline)
+    assert [r["metric"] for r in regressions] == ["end_to_end/10/steps_per_second"]
+    assert regressions[0]["change"] == pytest.approx(-0.2)
+    current["end_to_end"]["10"]["peak_rss_mb"] = 60.0
+    assert len(bench.compare(current, baseline, threshold=0.25)) == 0
+
+
+def test_main_compare_exit_status(tmp_path, capsys):
+    fast, slow = str(tmp_path / "fast.json"), str(tmp_path / "slow.json")
+    for path, us in ((fast, 10.0), (slow, 20.0)):
+        with open(path, "w") as f:
+            json.dump({"voting": {"sync": {"overhead_us_per_step": us}}}, f)
+    assert bench.main(["compare", fast, slow]) == 0
+    assert bench.main(["compare", slow, fast]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
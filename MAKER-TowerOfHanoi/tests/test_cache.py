@@ -0,0 +1,85 @@
+import sqlite3
+from maker.cache import ResponseCache, request_key
+from maker.config import RunConfig
+from maker.prompts import get_prompts
+from maker.simulator import SimulatedClient, SimulatedModel
+from maker.state import HanoiState
+from maker.voting import VoteStats, get_votes
+
+NUM_DISKS = 4
+MESSAGES = [{"role": "user", "content": "state"}]
+
+
+def test_request_key_covers_every_setting():
+    key = request_key("m", 0.1, MESSAGES)
+    assert key == request_key("m", 0.1, [dict(MESSAGES[0])])
+    assert key != request_key("m", 0.0, MESSAGES)
+    assert key != request_key("other", 0.1, MESSAGES)
+    assert key != request_key("m", 0.1, MESSAGES, response_format={"type": "json_object"})
+
+
+def test_greedy_keeps_one_response(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    assert cache.lookup("k", 0) == (None, 0)
+    cache.store("k", 0, "first")
+    cache.store("k", 0, "second")
+    assert cache.lookup("k", 0) == ("first", None)
+    assert cache.lookup("k", 0) == ("first", None)
+    assert cache.stats() == {"hits": 2, "misses": 1, "hit_rate": 2 / 3}
+    cache.close()
+
+
+def test_sampled_pool_is_replayed_in_order_by_a_rerun(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path, samples_per_key=3)
+    for i in range(3):
+        text, slot = cache.lookup("k", 0.5)
+        assert (text, slot) == (None, i)
+        cache.store("k", slot, f"sample {i}")
+    # The pool is full: further samples go live and are not kept
+    assert cache.lookup("k", 0.5) == (None, None)
+    cache.close()
+
+    rerun = ResponseCache(path, samples_per_key=3)
+    assert [rerun.lookup("k", 0.5)[0] for _ in range(4)] == ["sample 0", "sample 1", "sample 2", None]
+    rerun.close()
+
+
+def test_close_trims_to_max_entries_by_least_recent_use(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path, max_entries=20)
+    for i in range(30):
+        cache.store(f"k{i}", 0, str(i))
+    assert cache.lookup("k0", 0)[0] == "0"   # touched, so kept
+    cache.close()
+    with sqlite3.connect(path) as db:
+        keys = {key for (key,) in db.execute("SELECT key FROM responses")}
+    assert len(keys) <= 20
+    assert "k0" in keys and "k29" in keys and "k1" not in keys
+
+
+def test_get_votes_reuses_cached_samples(tmp_path):
+    config = RunConfig(num_disks=NUM_DISKS, cache_path=str(tmp_path / "cache.sqlite"))
+    state = HanoiState.initial(NUM_DISKS)
+    prompts = get_prompts(NUM_DISKS)
+
+    def votes(temperature, n):
+        model = SimulatedModel(seed=0)
+        cache = ResponseCache(config.cache_path)
+        stats = VoteStats()
+        result = get_votes(SimulatedClient(model), state, None, temperature, n, NUM_DISKS,
+                           *prompts, stats=stats, cache=cache, config=config)
+        cache.close()
+        return result, model.requests, stats.samples
+
+    assert votes(0.1, 3) == ([([1, 0, 1], state.apply([1, 0, 1]))] * 3, 1, 3)
+    # A rerun reads the pooled samples first and only draws the rest live
+    assert votes(0.1, 2)[1:] == (0, 0)
+    assert votes(0.1, 4)[1:] == (1, 1)
+    assert votes(0.1, 4)[1:] == (0, 0)
+    assert votes(0, 1)[1:] == (1, 1)
+    assert votes(0, 1)[1:] == (0, 0)
+
+
+def test_cache_is_opt_in():
+    assert RunConfig().cache_path is None
@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+from maker.cassette import CassetteExhausted, RecordedError, RecordingClient, ReplayClient, read_records
+from maker.simulator import SimulatedClient, SimulatedModel
+from maker.voting import NonRetryableError, BudgetExhausted
+from tests.test_simulator import request_body
+
+
+def record(path, requests, **model_kwargs):
+    client = RecordingClient(SimulatedClient(SimulatedModel(seed=0, **model_kwargs)), path, is_async=False)
+    texts = []
+    for kwargs in requests:
+        try:
+            response = client.chat.completions.create(**kwargs)
+            texts.append([choice.message.content for choice in response.choices])
+        except Exception as e:
+            texts.append(e)
+    client.cassette.close()
+    return texts
+
+
+def test_keyed_replay_serves_recorded_choices_in_any_batching(tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    recorded = record(path, [request_body(temperature=0.1, n=4)])
+    replay = ReplayClient(path, is_async=False)
+    texts = []
+    for n in (1, 2, 1):
+        response = replay.chat.completions.create(**request_body(temperature=0.1, n=n))
+        texts += [choice.message.content for choice in response.choices]
+    assert texts == recorded[0]
+    with pytest.raises(CassetteExhausted):
+        replay.chat.completions.create(**request_body(temperature=0.1))
+    assert replay.cassette.served == 3 and replay.cassette.missed == 1
+
+
+def test_ordered_replay_ignores_the_request(tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    recorded = record(path, [request_body(temperature=0), request_body(temperature=0.1, n=2)])
+    replay = ReplayClient(path, is_async=True, match="ordered")
+
+    async def run():
+        first = await replay.chat.completions.create(**request_body(temperature=0.5))
+        second = await replay.chat.completions.create(**request_body(temperature=0.5))
+        return [[c.message.content for c in r.choices] for r in (first, second)]
+    assert asyncio.run(run()) == recorded
+
+
+def test_recorded_errors_are_raised_again(tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    recorded = record(path, [request_body()], rate_limit_rate=1.0)
+    assert isinstance(recorded[0], Exception)
+    assert [r["error"]["status_code"] for r in read_records(path)] == [429]
+    replay = ReplayClient(path, is_async=False)
+    with pytest.raises(RecordedError) as info:
+        replay.chat.completions.create(**request_body())
+    assert info.value.status_code == 429
+
+
+def test_exhausted_cassette_is_not_a_spent_budget():
+    assert issubclass(CassetteExhausted, NonRetryableError)
+    assert not issubclass(CassetteExhausted, BudgetExhausted)
+
+
+def test_recording_again_replaces_the_cassette(tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    record(path, [request_body(temperature=0), request_body(temperature=0.1)])
+    second = record(path, [request_body(temperature=0.1, n=2)])
+    records = list(read_records(path))
+    assert [(r["seq"], r["n"]) for r in records] == [(1, 2)]
+    replay = ReplayClient(path, is_async=False, match="ordered")
+    response = replay.chat.completions.create(**request_body(temperature=0))
+    assert [choice.message.content for choice in response.choices] == second[0]
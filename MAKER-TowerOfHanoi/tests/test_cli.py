@@ -0,0 +1,70 @@
+import os
+import pytest
+from maker.action_log import ActionLog
+from maker.cli import _config, build_parser, main
+
+SIMULATED = ["--backend", "simulated", "--simulator-latency", "0", "--simulator-error-rates", "{}",
+             "--num-disks", "4"]
+
+
+def solve(*argv):
+    return main(["solve", *SIMULATED, *argv])
+
+
+def test_flags_win_over_the_environment_which_wins_over_config(monkeypatch):
+    monkeypatch.setenv("MAKER_K_THRESHOLD", "3")
+    monkeypatch.setenv("MAKER_NUM_DISKS", "7")
+    config = _config(build_parser().parse_args(["solve", "--k-threshold", "4", "--adaptive-k"]))
+    assert (config.k_threshold, config.num_disks, config.adaptive_k) == (4, 7, True)
+    assert config.cache_path is None
+
+
+def test_solve_verify_and_resume_a_journal(tmp_path, capsys):
+    journal = str(tmp_path / "hanoi-{num_disks}")
+    assert solve("--journal-dir", journal) == 0
+    path = str(tmp_path / "hanoi-4")
+    assert main(["verify", path]) == 0
+    assert "All 15 moves match the optimal solution" in capsys.readouterr().out
+    # A finished journal is only handed back when asked for
+    assert main(["resume", *SIMULATED, "--journal-dir", path]) == 2
+    assert main(["resume", *SIMULATED, "--journal-dir", path, "--resume-completed"]) == 0
+
+
+def test_resume_and_verify_refuse_what_is_not_there(tmp_path, capsys):
+    assert main(["resume", *SIMULATED]) == 2
+    assert main(["resume", *SIMULATED, "--journal-dir", str(tmp_path)]) == 2
+    assert main(["verify", str(tmp_path)]) == 2
+    log = ActionLog.open(str(tmp_path / "moves.bin"))
+    log.extend([[1, 0, 2], [2, 0, 1]])
+    log.close()
+    assert main(["verify", str(tmp_path)]) == 2   # two moves: no disk count to infer
+    assert main(["verify", str(tmp_path), "--num-disks", "3"]) == 1
+    assert "ERROR: cannot tell how many disks" in capsys.readouterr().err
+
+
+def test_record_then_replay_a_cassette(tmp_path, capsys):
+    cassette = str(tmp_path / "run.jsonl.gz")
+    for _ in range(2):   # recording again starts the cassette afresh
+        assert solve("--cassette-path", cassette) == 0
+    size = os.path.getsize(cassette)
+    assert solve("--cassette-path", cassette, "--cassette-mode", "replay", "--backend", "openai") == 0
+    assert os.path.getsize(cassette) == size
+    # A cassette without the requests a run needs fails the run cleanly
+    assert solve("--cassette-path", cassette, "--cassette-mode", "replay", "--num-disks", "5") == 2
+    assert "ERROR:" in capsys.readouterr().err
+
+
+def test_coordinate_solves_with_local_workers_and_fails_cleanly(tmp_path, capsys):
+    address = str(tmp_path / "coordinator.sock")
+    assert main(["coordinate", *SIMULATED, "--address", address, "--workers", "2"]) == 0
+    assert "All 15 moves match the optimal solution" in capsys.readouterr().out
+    assert main(["coordinate", *SIMULATED, "--address", address, "--workers", "1",
+                 "--simulator-error-rates", '{"malformed": 1.0}',
+                 "--max-samples-per-call", "50"]) == 2
+    assert "no valid votes" in capsys.readouterr().err
+
+
+def test_unknown_setting_values_are_rejected(capsys):
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(["solve", "--k-threshold", "two"])
+    assert "invalid int value" in capsys.readouterr().err
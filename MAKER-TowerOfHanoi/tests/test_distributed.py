@@ -0,0 +1,56 @@
+import threading
+import pytest
+from maker.config import RunConfig
+from maker.distributed import Coordinator, parse_address, run_worker
+from maker.verify import verify_log
+
+NUM_DISKS = 4
+
+
+def coordinate(tmp_path, workers=2, **settings):
+    """Run a Coordinator on a Unix socket with worker threads; returns (coordinator, run())"""
+    settings = {"num_disks": NUM_DISKS, "backend": "simulated", "simulator_latency": 0.0,
+                "simulator_error_rates": {}, "cache_path": None, **settings}
+    config = RunConfig(**settings)
+    coordinator = Coordinator(config, str(tmp_path / "coordinator.sock"), "test")
+    address = coordinator.start()
+    threads = [threading.Thread(target=run_worker, args=(address, "test", f"w{i}"),
+                                kwargs={"poll": 0.05}, daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    def run():
+        try:
+            return coordinator.run()
+        finally:
+            coordinator.close()
+            for thread in threads:
+                thread.join(timeout=10)
+    return coordinator, run
+
+
+def test_parse_address():
+    assert parse_address("example.org:50000") == ("example.org", 50000)
+    assert parse_address(":50000") == ("127.0.0.1", 50000)
+    assert parse_address("/tmp/maker.sock") == "/tmp/maker.sock"
+
+
+def test_workers_solve_with_speculation(tmp_path):
+    # A wrong greedy first vote is repeatable per prompt, so k=2 would fail now and then
+    coordinator, run = coordinate(tmp_path, speculation_depth=2, k_threshold=3,
+                                  simulator_error_rates={"wrong_move": 0.05})
+    actions = run()
+    assert verify_log(actions, NUM_DISKS)[0]
+    assert coordinator.stats.calls > 0
+    assert coordinator.hits > 0
+    assert len(coordinator.workers) >= 1
+
+
+def test_a_step_with_no_valid_votes_fails_instead_of_hanging(tmp_path):
+    # Every answer is red-flagged, so every job comes back without votes
+    coordinator, run = coordinate(tmp_path, simulator_error_rates={"malformed": 1.0},
+                                  max_samples_per_call=50)
+    with pytest.raises(RuntimeError, match="Step 0: no valid votes"):
+        run()
+    assert coordinator.frames[0].launched == 100
+
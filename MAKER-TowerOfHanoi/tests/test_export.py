@@ -0,0 +1,71 @@
+import os
+import shutil
+import pytest
+from maker import export
+from maker.action_log import ActionLog
+from maker.verify import optimal_moves
+
+pygame = pytest.importorskip("pygame")
+
+NUM_DISKS = 5
+
+
+def optimal(num_disks):
+    disk, from_peg, to_peg = optimal_moves(num_disks, 0, 2 ** num_disks - 1)
+    return [[int(d), int(a), int(b)] for d, a, b in zip(disk, from_peg, to_peg)]
+
+
+def pixels(directory, frame):
+    return pygame.image.tobytes(pygame.image.load(os.path.join(directory, f"frame_{frame:06d}.png")), "RGB")
+
+
+@pytest.mark.parametrize("total, args, steps", [
+    (10, (), list(range(11))),
+    (10, (4,), [0, 4, 8, 10]),
+    (10, (3, 2, 7), [2, 5, 7]),
+    (10, (5, 0, 50), [0, 5, 10]),
+    (10, (5, 12), [10]),
+])
+def test_frame_steps_always_end_on_the_last_state(total, args, steps):
+    assert export.frame_steps(total, *args) == steps
+
+
+def test_chunks_seek_to_the_same_frames_as_stepping(tmp_path):
+    moves = optimal(NUM_DISKS)
+    stepped, strided = str(tmp_path / "stepped"), str(tmp_path / "strided")
+    os.makedirs(stepped)
+    os.makedirs(strided)
+    export._init_worker(None, ActionLog.from_moves(moves).raw().tobytes(), NUM_DISKS, 8)
+    assert export._render_chunk(0, list(range(len(moves) + 1)), (200, 150), stepped) == len(moves) + 1
+    # Chunks start mid-log, and a large MAX_STEPPED_MOVES gap is seeked across
+    steps = [0, 7, 14, 21, 28, 31]
+    export._render_chunk(0, steps[:3], (200, 150), strided)
+    export._render_chunk(3, steps[3:], (200, 150), strided)
+    for frame, step in enumerate(steps):
+        assert pixels(strided, frame) == pixels(stepped, step)
+    assert pixels(stepped, 0) != pixels(stepped, len(moves))
+
+
+def test_export_png_frames_across_processes(tmp_path):
+    path = str(tmp_path / "moves.bin")
+    log = ActionLog.open(path)
+    log.extend(optimal(NUM_DISKS))
+    log.close()
+    out = str(tmp_path / "frames")
+    assert export.export(path, NUM_DISKS, out, stride=4, size=(160, 120), workers=2) == 9
+    assert sorted(os.listdir(out)) == [f"frame_{i:06d}.png" for i in range(9)]
+    assert pygame.image.load(os.path.join(out, "frame_000008.png")).get_size() == (160, 120)
+
+
+def test_video_export_needs_ffmpeg(tmp_path, monkeypatch):
+    monkeypatch.setattr(export.shutil, "which", lambda name: None)
+    with pytest.raises(RuntimeError, match="ffmpeg"):
+        export.export(optimal(3), 3, str(tmp_path / "hanoi.mp4"), workers=1)
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+def test_export_video_joins_segments(tmp_path):
+    out = str(tmp_path / "hanoi.mp4")
+    assert export.export(optimal(NUM_DISKS), NUM_DISKS, out, size=(160, 120), workers=2) == 32
+    assert os.path.getsize(out) > 0
+    assert os.listdir(tmp_path) == ["hanoi.mp4"]
@@ -0,0 +1,103 @@
+import os
+import json
+import pytest
+from maker.action_log import ActionLog
+from maker.journal import Journal
+from maker.state import HanoiState
+from maker.verify import optimal_moves
+
+NUM_DISKS = 6
+
+
+def optimal(num_disks):
+    disk, from_peg, to_peg = optimal_moves(num_disks, 0, 2 ** num_disks - 1)
+    return [[int(d), int(a), int(b)] for d, a, b in zip(disk, from_peg, to_peg)]
+
+
+def write_steps(journal, moves, start=0):
+    state = HanoiState.initial(NUM_DISKS)
+    for move in moves[:start]:
+        state = state.apply(move)
+    for step, move in enumerate(moves[start:], start):
+        state = state.apply(move)
+        journal.append(step, move, state, {tuple(move): 2}, 2)
+    return state
+
+
+def test_resume_after_torn_final_line(tmp_path):
+    path = str(tmp_path / "run")
+    moves = optimal(NUM_DISKS)
+    journal = Journal(path, NUM_DISKS)
+    journal.start(HanoiState.initial(NUM_DISKS))
+    state = write_steps(journal, moves[:20])
+    journal.close()
+
+    # A crash mid-write: half a journal line, and a move that reached moves.bin without it
+    with open(journal.journal_path, "ab") as f:
+        f.write(b'{"step":20,"move":[1,')
+    log = ActionLog.open(journal.moves_path)
+    log.append(moves[20])
+    log.close()
+    size = os.path.getsize(journal.journal_path)
+
+    journal = Journal(path, NUM_DISKS)
+    step, resumed, prev_move, actions = journal.resume()
+    assert step == 20
+    assert resumed == state
+    assert prev_move == moves[19]
+    assert list(actions) == moves[:20]
+    assert os.path.getsize(journal.journal_path) < size
+
+    write_steps(journal, moves[:30], start=20)
+    journal.close()
+    assert [record["move"] for record in journal.read_records()] == moves[:30]
+
+
+def test_resume_from_snapshot_replays_only_later_lines(tmp_path):
+    path = str(tmp_path / "run")
+    moves = optimal(NUM_DISKS)
+    journal = Journal(path, NUM_DISKS, snapshot_every=16)
+    journal.start(HanoiState.initial(NUM_DISKS))
+    state = write_steps(journal, moves[:40])
+    journal.close()
+    with open(journal.snapshot_path) as f:
+        assert json.load(f)["step"] == 32
+
+    # Lines before the snapshot are never read again
+    with open(journal.journal_path, "r+b") as f:
+        f.write(b"garbage")
+
+    journal = Journal(path, NUM_DISKS, snapshot_every=16)
+    step, resumed, prev_move, actions = journal.resume()
+    assert (step, resumed, prev_move) == (40, state, moves[39])
+    assert list(actions) == moves[:40]
+    journal.close()
+
+
+def test_resume_rebuilds_moves_lost_from_the_log(tmp_path):
+    path = str(tmp_path / "run")
+    moves = optimal(NUM_DISKS)
+    journal = Journal(path, NUM_DISKS)
+    journal.start(HanoiState.initial(NUM_DISKS))
+    write_steps(journal, moves[:25])
+    journal.close()
+    log = ActionLog.open(journal.moves_path)
+    log.truncate(10)
+    log.close()
+
+    journal = Journal(path, NUM_DISKS)
+    step, _, _, actions = journal.resume()
+    assert step == 25
+    assert list(actions) == moves[:25]
+    journal.close()
+
+
+def test_refuses_other_disk_count_and_overwrite(tmp_path):
+    path = str(tmp_path / "run")
+    journal = Journal(path, NUM_DISKS)
+    journal.start(HanoiState.initial(NUM_DISKS))
+    journal.close()
+    with pytest.raises(ValueError):
+        Journal(path, NUM_DISKS + 1).resume()
+    with pytest.raises(ValueError):
+        Journal(path, NUM_DISKS).start(HanoiState.initial(NUM_DISKS))
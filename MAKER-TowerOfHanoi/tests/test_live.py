@@ -0,0 +1,118 @@
+import os
+import pytest
+from maker.config import RunConfig
+from maker.live import LiveFeed, LiveReader, SEQUENCE
+from maker.simulator import AsyncSimulatedClient, SimulatedClient
+from maker.solver import solve
+from maker.verify import optimal_moves
+from maker.voting import VoteStats
+
+NUM_DISKS = 5
+
+
+def optimal(num_disks):
+    disk, from_peg, to_peg = optimal_moves(num_disks, 0, 2 ** num_disks - 1)
+    return [[int(d), int(a), int(b)] for d, a, b in zip(disk, from_peg, to_peg)]
+
+
+def test_reader_sees_moves_and_the_current_step(tmp_path):
+    path = str(tmp_path / "live")
+    moves = optimal(NUM_DISKS)
+    feed = LiveFeed(path, interval=60)
+    feed.start(moves[:3])
+    reader = LiveReader(path)
+    assert reader.refresh() == 3
+    assert reader.status()["step"] == -1
+
+    stats = VoteStats()
+    stats.calls, stats.samples, stats.red_flags = 4, 7, 2
+    stats.votes = {(4, 0, 2): 3, (1, 1, 0): 1}
+    feed.begin(3, 3, stats)
+    feed.accept(moves[3])
+    feed.publish()
+    assert reader.refresh() == 4
+    status = reader.status()
+    assert {key: status[key] for key in ("step", "k", "calls", "samples", "red_flags",
+                                         "leader", "leader_votes", "runner_up", "accepted", "done")} == {
+        "step": 3, "k": 3, "calls": 4, "samples": 7, "red_flags": 2,
+        "leader": [4, 0, 2], "leader_votes": 3, "runner_up": 1, "accepted": 4, "done": False}
+
+    feed.close()
+    status = reader.status()
+    assert (status["done"], status["leader"]) == (True, None)
+    assert list(reader.moves) == moves[:4]
+    reader.close()
+
+
+def test_status_is_not_read_while_being_written(tmp_path):
+    path = str(tmp_path / "live")
+    feed = LiveFeed(path, interval=60)
+    feed.start()
+    reader = LiveReader(path)
+    SEQUENCE.pack_into(feed._status, 8, 7)
+    assert reader.status(attempts=3) is None
+    SEQUENCE.pack_into(feed._status, 8, 8)
+    assert reader.status()["step"] == -1
+    reader.close()
+    feed.close()
+
+
+def test_new_feed_starts_an_empty_log(tmp_path):
+    path = str(tmp_path / "live")
+    feed = LiveFeed(path)
+    feed.start(optimal(3))
+    feed.close()
+    feed = LiveFeed(path)
+    feed.start()
+    reader = LiveReader(path)
+    assert reader.refresh() == 0
+    reader.close()
+    feed.close()
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_solver_publishes_every_accepted_move(tmp_path, use_async):
+    path = str(tmp_path / "live")
+    config = RunConfig(num_disks=NUM_DISKS, k_threshold=2, use_async_voting=use_async, cache_path=None)
+    client = (AsyncSimulatedClient if use_async else SimulatedClient)(seed=0, error_rates={"wrong_move": 0.1})
+    feed = LiveFeed(path, interval=0.001)
+    actions = solve(client, config, feed=feed)
+    feed.close()
+    reader = LiveReader(path)
+    assert reader.refresh() == len(actions) == 2 ** NUM_DISKS - 1
+    assert list(reader.moves) == list(actions)
+    status = reader.status()
+    assert (status["done"], status["accepted"], status["step"]) == (True, len(actions), len(actions) - 1)
+    reader.close()
+
+
+def test_viewer_follows_the_newest_move(tmp_path):
+    pytest.importorskip("pygame")
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from maker.gui_pygame import TowerOfHanoiPygame
+    from maker.verify import optimal_positions
+    path = str(tmp_path / "live")
+    moves = optimal(NUM_DISKS)
+    feed = LiveFeed(path, interval=60)
+    feed.start(moves[:2])
+    gui = TowerOfHanoiPygame(None, NUM_DISKS, live=LiveReader(path), run=False)
+    try:
+        gui.poll_live()
+        assert gui.move_index == 2
+        for move in moves[2:20]:
+            feed.accept(move)
+        feed.publish()
+        gui.poll_live()
+        assert (gui.move_index, bytes(gui.positions)) == (20, optimal_positions(NUM_DISKS, 20))
+        assert gui.live_status["accepted"] == 20
+
+        # Stepping back stops following; new moves no longer move the view
+        gui.handle_key(pygame.K_LEFT)
+        feed.accept(moves[20])
+        gui.poll_live()
+        assert (gui.move_index, len(gui.replay)) == (19, 21)
+    finally:
+        pygame.quit()
+        gui.live.close()
+        feed.close()
@@ -0,0 +1,88 @@
+import json
+import threading
+import http.client
+import pytest
+from maker.config import RunConfig
+from maker.metrics import Metrics, red_flag_reason
+from maker.parser import parse_move_state_flag
+from maker.prompts import get_prompts
+from maker.simulator import SimulatedClient, SimulatedModel
+from maker.state import HanoiState
+from maker.voting import do_voting
+
+NUM_DISKS = 4
+
+
+@pytest.mark.parametrize("text, reason", [
+    ("move = [1, 0, 2]", "no_state"),
+    ("nothing", "no_move"),
+    ("move = [1, 0]\nnext_state = [[4, 3, 2], [], [1]]", "bad_move"),
+    ("move = [1, 0, 2]\nnext_state = [[4, 3, 2], [1], [1]]", "bad_state"),
+])
+def test_red_flag_reason_labels_parser_errors(text, reason):
+    with pytest.raises(ValueError) as error:
+        parse_move_state_flag(text, NUM_DISKS)
+    assert red_flag_reason(error.value) == reason
+
+
+def test_voting_records_calls_and_steps(tmp_path):
+    path = str(tmp_path / "metrics.jsonl")
+    metrics = Metrics(path)
+    model = SimulatedModel(error_rates={"malformed": 0.5}, seed=1)
+    config = RunConfig(num_disks=NUM_DISKS, max_samples_per_call=4)
+    do_voting(SimulatedClient(model), HanoiState.initial(NUM_DISKS), None, 3, NUM_DISKS,
+              *get_prompts(NUM_DISKS), config=config, metrics=metrics, step=0)
+    metrics.step(0, 3, {(1, 0, 1): 3}, model.requests, 0.5)
+    metrics.close()
+
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    calls = [r for r in records if r["type"] == "call"]
+    assert sum(r["request"] for r in calls) == metrics.requests == model.requests
+    assert sum(r["outcome"] == "red_flag" for r in calls) == model.errors["malformed"] > 0
+    # Only a request's first choice carries its tokens
+    assert all(r["prompt_tokens"] == 0 for r in calls if not r["request"])
+    assert metrics.prompt_tokens == sum(r["prompt_tokens"] for r in calls)
+    assert records[-1] == {"type": "step", "step": 0, "k": 3, "rounds": 3, "margin": 3,
+                           "calls": model.requests, "seconds": 0.5}
+    assert set(metrics.timer_counts) == {"parse", "validate", "tally"}
+
+    text = metrics.render()
+    assert f'maker_request_latency_seconds_bucket{{le="+Inf"}} {metrics.requests}' in text
+    assert 'maker_step_margin_total{margin="3"} 1' in text
+    assert "Red flags:" in metrics.summary()
+
+
+def test_serve_exposes_the_text_format():
+    metrics = Metrics()
+    metrics.call(0, 0.0, 0.2, (10, 5), "accepted")
+    server = metrics.serve(0)
+    try:
+        connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+        connection.request("GET", "/metrics")
+        response = connection.getresponse()
+        assert response.status == 200
+        assert 'maker_request_latency_seconds_bucket{le="0.25"} 1' in response.read().decode()
+        connection.request("GET", "/other")
+        assert connection.getresponse().status == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_timers_from_many_threads_add_up():
+    metrics = Metrics()
+
+    def work():
+        for _ in range(5000):
+            metrics.time("parse", 0.001)
+            metrics.time("validate", 0.002)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert dict(metrics.timer_counts) == {"parse": 20000, "validate": 20000}
+    assert abs(metrics.timer_seconds["validate"] - 40.0) < 1e-6
+    assert 'maker_section_seconds_total{section="parse"}' in metrics.render()
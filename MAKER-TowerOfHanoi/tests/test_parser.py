@@ -0,0 +1,93 @@
+import json
+import pytest
+from maker.parser import (RESPONSE_FORMAT, StreamScanner, parse_move_state_flag, parse_structured,
+                          validate_transition)
+from maker.prompts import get_prompts
+from maker.simulator import SimulatedClient
+from maker.state import HanoiState
+from maker.voting import build_messages
+
+ANSWER = "move = [1, 0, 2]\nnext_state = [[3, 2], [], [1]]"
+
+
+def feed(scanner, text, size=4):
+    """Feed text about a token at a time; the chunk count at completion, or None"""
+    for i in range(0, len(text), size):
+        if scanner.feed(text[i:i + size]):
+            return scanner.chunks
+    return None
+
+
+def test_free_text_completes_at_the_closing_bracket():
+    scanner = StreamScanner()
+    text = "Disk 1 goes clockwise.\n" + ANSWER
+    assert feed(scanner, text + "\nanything after", size=1) == len(text)
+    assert scanner.text() == text
+
+
+def test_structured_completes_at_the_closing_brace():
+    scanner = StreamScanner(structured=True)
+    text = json.dumps({"move": [1, 0, 2], "next_state": [[3, 2], [], [1]]})
+    assert feed(scanner, text + " trailing", size=1) == len(text)
+
+
+@pytest.mark.parametrize("structured, text, message", [
+    (False, "move = " + "x" * 200, "character budget"),
+    (False, "thinking" + " " * 65 + ANSWER, "Runaway whitespace"),
+    (False, "Let me think. " * 20 + ANSWER, "No 'move ='"),
+    (True, 'Sure: {"move": [1, 0, 2]}', "does not start with"),
+    (True, '{"move": [1, 0, 2],' + "\n" * 65 + '"next_state": []}', "Runaway whitespace"),
+])
+def test_off_format_stream_is_cut_off(structured, text, message):
+    scanner = StreamScanner(structured, max_chars=150, max_preamble=100)
+    with pytest.raises(ValueError, match=message):
+        feed(scanner, text)
+    assert scanner.length < len(text)
+
+
+def test_free_text_preamble_only_needs_the_move_prefix():
+    scanner = StreamScanner(max_chars=400, max_preamble=100)
+    text = "Let me think. " * 5 + "move = [1, 0, 2] since " + "disk 1 cycles. " * 5
+    assert feed(scanner, text + "\nnext_state = [[3, 2], [], [1]]") is not None
+
+
+def test_parse_structured_accepts_exactly_the_schema():
+    move, state = parse_structured('{"move": [1, 0, 2], "next_state": [[3, 2], [], [1]]}', 3)
+    assert move == [1, 0, 2]
+    assert state == HanoiState.initial(3).apply([1, 0, 2])
+
+
+@pytest.mark.parametrize("text, message", [
+    ("move = [1, 0, 2]", "Could not parse the response as JSON"),
+    ('{"move": [1, 0, 2], "next_state": [[3, 2], [], [1]]} extra', "Could not parse"),
+    ('[[1, 0, 2]]', "exactly 'move' and 'next_state'"),
+    ('{"move": [1, 0, 2]}', "exactly 'move' and 'next_state'"),
+    ('{"move": [1, 0, 2], "next_state": [[3, 2], [], [1]], "why": ""}', "exactly"),
+    ('{"move": [1, 0], "next_state": [[3, 2], [], [1]]}', "exactly 3 integers"),
+    ('{"move": [1, 0, 3], "next_state": [[3, 2], [], [1]]}', "Peg indices"),
+    ('{"move": [1, 2, 2], "next_state": [[3, 2], [], [1]]}', "same peg"),
+    ('{"move": [1, 0, 2], "next_state": [[3, 2], [1]]}', "three lists"),
+])
+def test_parse_structured_red_flags(text, message):
+    with pytest.raises(ValueError, match=message):
+        parse_structured(text, 3)
+
+
+def test_free_text_parser_takes_the_last_answer():
+    text = ("First I thought move = [1, 0, 1] and next_state = [[3, 2], [1], []].\n"
+            "MOVE = [1, 0, 2]\nnext_state = [[3, 2], [], [1]]")
+    assert parse_move_state_flag(text, 3) == ([1, 0, 2], HanoiState.initial(3).apply([1, 0, 2]))
+    with pytest.raises(ValueError, match="No 'next_state"):
+        parse_move_state_flag("move = [1, 0, 2]", 3)
+
+
+def test_structured_round_trip_through_the_simulator():
+    system_prompt, user_template = get_prompts(4, structured=True)
+    state = HanoiState.initial(4)
+    response = SimulatedClient(seed=0).chat.completions.create(
+        model="simulated", temperature=0, response_format=RESPONSE_FORMAT,
+        messages=build_messages(state, None, system_prompt, user_template))
+    move, next_state = parse_structured(response.choices[0].message.content, 4)
+    assert validate_transition(state, move, next_state)
+    with pytest.raises(ValueError, match="Invalid next_state"):
+        validate_transition(state, move, state)
@@ -0,0 +1,72 @@
+import pytest
+from maker.bench import bench_prompts
+from maker.config import RunConfig
+from maker.parser import parse_move_state_flag, parse_structured, RESPONSE_FORMAT
+from maker.prompts import get_prompts, PROMPT_PROFILES
+from maker.simulator import SimulatedModel, correct_move
+from maker.state import HanoiState
+from maker.voting import build_messages, format_prev_move, format_state
+
+
+@pytest.mark.parametrize("prev_move, profile, phrase", [
+    (None, "full", "None (this is the first move)"),
+    ([0, 0, 0], "full", "None (this is the first move)"),
+    ([1, 0, 2], "full", "[1, 0, 2] (disk 1 was moved)"),
+    ([3, 1, 2], "full", "[3, 1, 2] (disk 3 was moved, NOT disk 1)"),
+    (None, "compact", "None"),
+    ([3, 1, 2], "compact", "[3,1,2]"),
+])
+def test_format_prev_move(prev_move, profile, phrase):
+    assert format_prev_move(prev_move, profile) == phrase
+    assert format_prev_move(prev_move, profile) is format_prev_move(prev_move, profile)
+
+
+def test_compact_state_has_no_spaces():
+    state = HanoiState.from_lists([[4, 3], [2], [1]])
+    assert format_state(state) == "[[4, 3], [2], [1]]"
+    assert format_state(state, "compact") == "[[4,3],[2],[1]]"
+
+
+@pytest.mark.parametrize("structured", [False, True])
+def test_compact_profile_keeps_everything_static_in_the_system_prompt(structured):
+    system_prompt, user_template = get_prompts(6, structured, "compact")
+    steps = [(HanoiState.initial(6), None),
+             (HanoiState.from_lists([[6, 5, 4], [3, 2], [1]]), [2, 0, 1])]
+    systems, users = set(), []
+    for state, prev_move in steps:
+        messages = build_messages(state, prev_move, system_prompt, user_template, "compact")
+        systems.add(messages[0]["content"])
+        users.append(messages[1]["content"])
+    assert systems == {system_prompt}
+    assert users[1] == "Prev: [2,0,1]\nState: [[6,5,4],[3,2],[1]]"
+    assert ("JSON object" in system_prompt) == structured
+
+
+@pytest.mark.parametrize("num_disks", [5, 6])
+@pytest.mark.parametrize("profile", PROMPT_PROFILES)
+@pytest.mark.parametrize("structured", [False, True])
+def test_simulator_answers_every_profile(num_disks, profile, structured):
+    system_prompt, user_template = get_prompts(num_disks, structured, profile)
+    parse = parse_structured if structured else parse_move_state_flag
+    model = SimulatedModel(seed=0)
+    state = HanoiState.from_lists([[num_disks, 3, 2], list(range(num_disks - 1, 3, -1)), [1]])
+    prev_move = [2, 2, 0]
+    messages = build_messages(state, prev_move, system_prompt, user_template, profile)
+    text = model.complete(messages, 0.0, 750, RESPONSE_FORMAT if structured else None)[0]
+    move, _ = parse(text, num_disks)
+    assert move == correct_move(state, prev_move, num_disks % 2 == 0)
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError, match="Unknown prompt profile"):
+        get_prompts(5, profile="terse")
+
+
+def test_bench_prompts_compares_profiles_on_the_simulator(capsys):
+    config = RunConfig(backend="simulated", num_disks=5, simulator_error_rates={}, simulator_latency=0.0)
+    results = bench_prompts(config, num_calls=20)
+    assert set(results) == set(PROMPT_PROFILES)
+    for row in results.values():
+        assert (row["calls"], row["accuracy"], row["red_flags"]) == (20, 1.0, 0)
+    assert results["compact"]["prompt_tokens_per_call"] < results["full"]["prompt_tokens_per_call"]
+    assert "fewer prompt tokens per call" in capsys.readouterr().out
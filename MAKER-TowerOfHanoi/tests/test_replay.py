@@ -0,0 +1,110 @@
+import os
+import pytest
+from maker.action_log import ActionLog
+from maker.replay import ReplayIndex
+from maker.state import HanoiState
+from maker.verify import optimal_moves, optimal_positions
+
+
+def optimal(num_disks):
+    disk, from_peg, to_peg = optimal_moves(num_disks, 0, 2 ** num_disks - 1)
+    return [[int(d), int(a), int(b)] for d, a, b in zip(disk, from_peg, to_peg)]
+
+
+def detour(num_disks, step):
+    """Disk 1 steps back and forth against its direction after step moves: legal, but not optimal"""
+    peg = optimal_positions(num_disks, step)[0]
+    other = (peg + (2 if num_disks % 2 == 0 else 1)) % 3
+    return [[1, peg, other], [1, other, peg]]
+
+
+def test_optimal_log_needs_no_keyframes():
+    moves = optimal(12)
+    replay = ReplayIndex(moves, 12, keyframe_interval=64)
+    assert (replay.optimal_prefix, replay.deviated, replay.keyframes) == (len(moves), False, {})
+    assert replay.state_at(len(moves)) == [[], [], list(range(12, 0, -1))]
+    # Seeks are clamped to the log
+    assert replay.positions_at(-5) == bytes(12)
+    assert replay.positions_at(len(moves) + 10) == optimal_positions(12, len(moves))
+
+
+def test_keyframes_start_at_the_first_deviation():
+    moves = optimal(9)
+    log = moves[:100] + detour(9, 100) + moves[100:]
+    replay = ReplayIndex(log, 9, keyframe_interval=50)
+    assert replay.optimal_prefix == 100
+    assert sorted(replay.keyframes) == [100] + list(range(150, len(log) + 1, 50))
+    state = HanoiState.from_positions(optimal_positions(9, 100))
+    assert replay.state_at(101) == state.apply(log[100])
+    assert replay.positions_at(len(log)) == optimal_positions(9, len(moves))
+
+
+def test_update_indexes_moves_appended_to_a_shared_log(tmp_path):
+    path = str(tmp_path / "moves.bin")
+    moves = optimal(8)
+    writer = ActionLog.open(path)
+    writer.extend(moves[:30])
+    replay = ReplayIndex(ActionLog.open(path, readonly=True), 8, keyframe_interval=16)
+    assert len(replay) == 30
+
+    writer.extend(moves[30:40] + detour(8, 40) + moves[40:60])
+    assert replay.update() == 30            # nothing new until the reader refreshes
+    replay.log.refresh()
+    assert replay.update() == 62
+    assert replay.optimal_prefix == 40
+    assert replay.positions_at(42) == optimal_positions(8, 40)
+    assert replay.positions_at(62) == optimal_positions(8, 60)
+    replay.log.close()
+    writer.close()
+
+
+@pytest.fixture
+def viewer():
+    pytest.importorskip("pygame")
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    from maker.gui_pygame import TowerOfHanoiPygame
+
+    def open_viewer(actions, num_disks, **kwargs):
+        return TowerOfHanoiPygame(actions, num_disks, run=False, **kwargs)
+    yield open_viewer
+    import pygame
+    pygame.quit()
+
+
+def test_viewer_seeks_and_steps(viewer):
+    import pygame
+    from maker.gui_pygame import MAX_STEPPED_MOVES, SPEEDS
+    moves = optimal(10)
+    gui = viewer(moves, 10, keyframe_interval=64)
+    gui.seek(500)
+    assert (gui.move_index, bytes(gui.positions)) == (500, optimal_positions(10, 500))
+    gui.advance(3)
+    assert bytes(gui.positions) == optimal_positions(10, 503)
+    gui.advance(MAX_STEPPED_MOVES * 4)      # too many to step through; seeks
+    assert bytes(gui.positions) == optimal_positions(10, 503 + MAX_STEPPED_MOVES * 4)
+
+    gui.handle_key(pygame.K_END)
+    assert gui.move_index == len(moves)
+    gui.handle_key(pygame.K_LEFT)
+    assert (gui.move_index, gui.playing) == (len(moves) - 1, False)
+    gui.handle_key(pygame.K_HOME)
+    assert bytes(gui.positions) == bytes(10)
+    gui.handle_key(pygame.K_5)
+    assert gui.speed == SPEEDS[4]
+    gui.handle_key(pygame.K_DOWN)
+    assert gui.speed == SPEEDS[3]
+
+    gui.seek_to_mouse(gui.slider.right)
+    assert gui.move_index == len(moves)
+    assert not gui.handle_key(pygame.K_q)
+
+
+def test_viewer_redraws_only_dirty_regions(viewer):
+    gui = viewer(optimal(4), 4)
+    gui.redraw()
+    assert gui.dirty == []
+    gui.animate_move()                      # disk 1 from peg 0 to peg 1
+    assert gui.column(2) not in gui.dirty
+    assert all(rect in gui.dirty for rect in (gui.column(0), gui.column(1), gui.hud_rect, gui.slider_rect))
+    gui.redraw()
+    assert gui.dirty == []
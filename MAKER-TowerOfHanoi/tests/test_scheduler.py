@@ -0,0 +1,134 @@
+import random
+from types import SimpleNamespace
+from email.utils import format_datetime
+from datetime import datetime, timezone
+import pytest
+from maker import scheduler
+from maker.scheduler import (BREAKER_OPENS, FAILURES, INF, PAUSED_UNTIL, RATE, THROTTLED, WAITED,
+                             RequestScheduler, retry_after)
+
+
+class FakeTime:
+    """Stands in for the time module inside maker.scheduler"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(scheduler, "time", fake)
+    # Backoff jitter always draws its upper bound
+    monkeypatch.setattr(scheduler.random, "uniform", lambda low, high: high)
+    return fake
+
+
+class ApiError(Exception):
+    def __init__(self, status_code: int, headers: dict = None, retry_after: float = None):
+        super().__init__(status_code)
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+        if retry_after is not None:
+            self.retry_after = retry_after
+
+
+def test_rpm_bucket_admits_a_burst_then_paces(clock):
+    s = RequestScheduler(rpm=600, burst_seconds=1.0)
+    assert [s._reserve(0) for _ in range(10)] == [0.0] * 10
+    assert s._reserve(0) == pytest.approx(0.1)
+    start = clock.now
+    s.acquire()
+    assert clock.now - start == pytest.approx(0.1)
+    assert s.state[WAITED] == pytest.approx(0.1)
+
+
+def test_tpm_bucket_waits_for_tokens_and_lets_big_requests_through_when_full(clock):
+    s = RequestScheduler(tpm=6000, burst_seconds=1.0)   # 100-token bucket
+    assert s._reserve(80) == 0.0
+    assert s._reserve(80) == pytest.approx((80 - 20) * 60 / 6000)
+    s.acquire(500)   # bigger than the bucket: goes once the bucket is full
+    assert clock.now == pytest.approx(1000 + 0.8)
+    assert s._reserve(1) > 0
+
+
+def test_throttle_pauses_everyone_and_cuts_the_rate_then_success_adds_back(clock):
+    s = RequestScheduler(rpm=120, decrease=0.5, additive_rpm_per_second=1.0)
+    s.acquire()
+    assert s.failure(ApiError(429, {"retry-after": "7"})) == 0.0
+    assert s.state[THROTTLED] == 1
+    assert s.state[RATE] == 60
+    assert s.state[PAUSED_UNTIL] == clock.now + 7
+    assert s._reserve(0) == pytest.approx(7)
+    # Additive increase: 60 rpm per second of traffic, spread over the current rate
+    s.success()
+    assert s.state[RATE] == pytest.approx(61)
+    for _ in range(200):
+        s.success()
+    assert s.state[RATE] == 120   # never above the configured rpm
+
+
+def test_unknown_rpm_starts_unlimited_and_learns_from_the_first_throttle(clock):
+    s = RequestScheduler(decrease=0.5)
+    assert s.state[RATE] == INF
+    for _ in range(30):
+        s.acquire()
+        clock.sleep(0.5)
+    # 20 requests in the first 10s window, then 10 more in a new one
+    s.failure(ApiError(429))
+    assert s.state[RATE] == pytest.approx(120 * 0.5)
+    assert s.state[PAUSED_UNTIL] == pytest.approx(clock.now + 0.5)   # backoff_base, no Retry-After
+
+
+def test_circuit_breaker_opens_probes_and_closes(clock):
+    s = RequestScheduler(failure_threshold=3, cooldown=30, backoff_base=0.5)
+    error = ApiError(500)
+    assert [s.failure(error) for _ in range(2)] == [0.5, 1.0]
+    assert s.failure(error) == 0.0
+    assert s.state[BREAKER_OPENS] == 1
+    assert s._reserve(0) == pytest.approx(30)
+
+    clock.sleep(30)
+    assert s._reserve(0) == 0.0   # the half-open probe
+    assert s._reserve(0) == 1.0   # everyone else waits for it
+    s.failure(error)
+    assert s.state[BREAKER_OPENS] == 2
+    assert s._reserve(0) == pytest.approx(30)
+
+    clock.sleep(30)
+    assert s._reserve(0) == 0.0
+    s.success()
+    assert s.state[FAILURES] == 0
+    assert [s._reserve(0) for _ in range(5)] == [0.0] * 5
+
+
+def test_retry_after_sources(clock):
+    assert retry_after(ApiError(429, retry_after=2.5)) == 2.5
+    assert retry_after(ApiError(429, {"retry-after-ms": "1500", "retry-after": "9"})) == 1.5
+    assert retry_after(ApiError(429, {"retry-after": "4"})) == 4.0
+    assert retry_after(ApiError(429, {"Retry-After": "3"})) == 3.0
+    date = format_datetime(datetime.fromtimestamp(clock.now + 20, timezone.utc), usegmt=True)
+    assert retry_after(ApiError(429, {"retry-after": date})) == pytest.approx(20, abs=1)
+    assert retry_after(ApiError(429, {"retry-after": "soon"})) == 0.0
+    assert retry_after(ApiError(429, {"retry-after-ms": "x", "retry-after": "2"})) == 2.0
+    assert retry_after(RuntimeError()) == 0.0
+
+
+def test_backoff_is_full_jitter_and_capped():
+    random.seed(0)
+    for attempt in range(1, 12):
+        bound = min(4.0, 0.5 * 2 ** (attempt - 1))
+        delays = [scheduler.backoff_delay(attempt, base=0.5, cap=4.0) for _ in range(50)]
+        assert all(0 <= d <= bound for d in delays)
+        assert max(delays) > bound / 2
+    # A server's Retry-After wins over a shorter backoff
+    assert scheduler.retry_delay(ApiError(429, retry_after=60), 1) == 60
@@ -0,0 +1,71 @@
+import json
+import threading
+import http.client
+import pytest
+from maker.parser import parse_move_state_flag
+from maker.prompts import get_prompts
+from maker.simulator import SimulatedClient, SimulatedModel, correct_move, serve
+from maker.state import HanoiState
+from maker.voting import build_messages
+
+NUM_DISKS = 4
+
+
+def request_body(**extra):
+    system_prompt, user_template = get_prompts(NUM_DISKS)
+    messages = build_messages(HanoiState.initial(NUM_DISKS), None, system_prompt, user_template)
+    return {"model": "simulated", "messages": messages, "temperature": 0, **extra}
+
+
+@pytest.fixture
+def server():
+    server = serve(port=0, model=SimulatedModel(seed=0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, body: dict):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=10)
+    connection.request("POST", "/v1/chat/completions", json.dumps(body),
+                       {"Content-Type": "application/json"})
+    response = connection.getresponse()
+    return response.status, response.read().decode("utf-8")
+
+
+def test_in_process_client_answers_correctly():
+    client = SimulatedClient(seed=0)
+    response = client.chat.completions.create(**request_body(n=3))
+    assert len(response.choices) == 3
+    expected = correct_move(HanoiState.initial(NUM_DISKS), None, NUM_DISKS % 2 == 0)
+    for choice in response.choices:
+        move, _ = parse_move_state_flag(choice.message.content, NUM_DISKS)
+        assert move == expected
+
+
+def test_server_answers_a_completion(server):
+    status, text = post(server, request_body())
+    assert status == 200
+    payload = json.loads(text)
+    move, next_state = parse_move_state_flag(payload["choices"][0]["message"]["content"], NUM_DISKS)
+    assert move == correct_move(HanoiState.initial(NUM_DISKS), None, NUM_DISKS % 2 == 0)
+    assert payload["usage"]["prompt_tokens"] > 0
+
+
+def test_server_streams_server_sent_events(server):
+    status, text = post(server, request_body(stream=True, stream_options={"include_usage": True}))
+    assert status == 200
+    events = [line[len("data: "):] for line in text.splitlines() if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event) for event in events[:-1]]
+    content = "".join(c["choices"][0]["delta"]["content"] or "" for c in chunks if c["choices"])
+    assert parse_move_state_flag(content, NUM_DISKS)
+    assert chunks[-1]["usage"]["completion_tokens"] > 0
+
+
+def test_server_rejects_unknown_path(server):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=10)
+    connection.request("POST", "/v1/embeddings", "{}")
+    assert connection.getresponse().status == 404
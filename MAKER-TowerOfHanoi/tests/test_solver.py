@@ -0,0 +1,88 @@
+import re
+import dataclasses
+import pytest
+from maker.config import RunConfig
+from maker.journal import Journal
+from maker.simulator import AsyncSimulatedClient, SimulatedClient, SimulatedModel
+from maker.solver import solve
+from maker.verify import verify_log
+from maker.voting import BudgetExhausted, VoteStats
+
+NUM_DISKS = 5
+
+
+def solve_async(capsys, speculation_depth, seed=0, **model):
+    # One vote per request, so votes arrive one at a time and a leader shows early
+    config = RunConfig(num_disks=NUM_DISKS, k_threshold=3, use_async_voting=True,
+                       speculation_depth=speculation_depth, max_samples_per_call=1,
+                       cache_path=None)
+    stats = VoteStats()
+    actions = solve(AsyncSimulatedClient(seed=seed, **model), config, stats=stats)
+    hits, misses = re.search(r"\((\d+) hits, (\d+) misses\)", capsys.readouterr().out).groups()
+    assert verify_log(actions, NUM_DISKS)[0]
+    return stats, int(hits), int(misses)
+
+
+def test_concurrency_and_speculation_are_opt_in():
+    config = RunConfig()
+    assert not config.use_async_voting
+    assert config.speculation_depth == 0
+
+
+def test_without_speculation_nothing_is_wasted(capsys):
+    stats, hits, misses = solve_async(capsys, 0, error_rates={"wrong_move": 0.15})
+    assert (hits, misses, stats.wasted_calls) == (0, 0, 0)
+
+
+def test_speculation_discards_steps_started_from_a_losing_leader(capsys):
+    stats, hits, misses = solve_async(capsys, 2, error_rates={"wrong_move": 0.15})
+    assert hits > 0 and misses > 0
+    assert stats.wasted_calls > 0
+
+
+def test_speculation_never_misses_with_a_perfect_model(capsys):
+    stats, hits, misses = solve_async(capsys, 3, latency_median=0.002)
+    # A step whose votes all land together settles before it has a leader to speculate from
+    assert hits > 0
+    assert (misses, stats.wasted_calls) == (0, 0)
+
+
+class CrashingClient:
+    """Passes requests to client until it has sent limit of them, then fails for good"""
+
+    def __init__(self, client, limit):
+        self.chat = self.completions = self
+        self.client = client
+        self.limit = limit
+
+    def create(self, **kwargs):
+        if self.limit == 0:
+            raise BudgetExhausted("crashed")
+        self.limit -= 1
+        return self.client.chat.completions.create(**kwargs)
+
+
+@pytest.mark.parametrize("use_async_voting", [False, True])
+def test_resume_continues_a_crashed_journal(tmp_path, capsys, use_async_voting):
+    config = RunConfig(num_disks=NUM_DISKS, k_threshold=2, journal_dir=str(tmp_path / "run"),
+                       cache_path=None)
+    model = SimulatedModel(seed=0)
+    with pytest.raises(BudgetExhausted):
+        solve(CrashingClient(SimulatedClient(model), 25), config)
+    crashed_at = len(Journal(config.journal_dir, NUM_DISKS).resume()[3])
+    assert 0 < crashed_at < 2 ** NUM_DISKS - 1
+
+    config = dataclasses.replace(config, resume=True, use_async_voting=use_async_voting)
+    client = AsyncSimulatedClient(seed=1) if use_async_voting else SimulatedClient(seed=1)
+    actions = solve(client, config)
+    assert verify_log(actions, NUM_DISKS)[0]
+    assert f"Resumed from {config.journal_dir} at step {crashed_at}" in capsys.readouterr().out
+    # Only the steps after the crash were voted on again
+    assert client.model.requests < 2 * (2 ** NUM_DISKS - 1 - crashed_at) + 5
+
+    with pytest.raises(ValueError, match="already holds all 31 steps"):
+        solve(SimulatedClient(seed=2), config)
+    config = dataclasses.replace(config, resume_completed=True)
+    client = SimulatedClient(seed=2)
+    assert list(solve(client, config)) == list(actions)
+    assert client.model.requests == 0
@@ -0,0 +1,63 @@
+import pytest
+from maker.state import HanoiState
+
+
+def test_initial_state_renders_like_lists():
+    state = HanoiState.initial(4)
+    assert state == [[4, 3, 2, 1], [], []]
+    assert str(state) == str([[4, 3, 2, 1], [], []])
+    assert state.to_lists() == [[4, 3, 2, 1], [], []]
+    assert (state.top(0), state.top(1)) == (1, 0)
+    assert state.positions() == bytes(4)
+
+
+def test_apply_returns_new_state():
+    state = HanoiState.initial(3)
+    moved = state.apply([1, 0, 2])
+    assert moved == [[3, 2], [], [1]]
+    assert state == [[3, 2, 1], [], []]
+    assert moved.apply([2, 0, 1]).apply([1, 2, 1]) == [[3], [2, 1], []]
+    assert hash(moved) == hash(HanoiState.from_lists([[3, 2], [], [1]]))
+
+
+@pytest.mark.parametrize("move, message", [
+    ([1, 1, 0], "Peg 1 is empty"),
+    ([2, 0, 1], "Top disk on peg 0 is 1, not 2"),
+    ([3, 0, 1], "Top disk on peg 0 is 1, not 3"),
+])
+def test_apply_rejects_illegal_moves(move, message):
+    with pytest.raises(ValueError, match=message):
+        HanoiState.initial(3).apply(move)
+
+
+def test_apply_rejects_larger_onto_smaller():
+    state = HanoiState.initial(3).apply([1, 0, 2])
+    with pytest.raises(ValueError, match="onto smaller disk 1"):
+        state.apply([2, 0, 2])
+
+
+@pytest.mark.parametrize("lists, message", [
+    ([[3, 2, 1], []], "list of three lists"),
+    ("[[3, 2, 1], [], []]", "list of three lists"),
+    ([[3, 2, "1"], [], []], "must be integers"),
+    ([[3, 2], [], []], "Missing: \\[1\\]"),
+    ([[3, 2, 1], [1], []], "exactly once"),
+    ([[4, 2, 1], [], []], "Extras: \\[4\\]"),
+    ([[3, 0, 2, 1], [], []], "exactly once"),
+    ([[3, 1], [2], []], None),
+    ([[1, 3], [2], []], "Peg 0 has invalid disk order"),
+    ([[3], [1, 2], []], "Peg 1 has invalid disk order"),
+])
+def test_from_lists_validation(lists, message):
+    if message is None:
+        assert HanoiState.from_lists(lists, 3).to_lists() == lists
+    else:
+        with pytest.raises(ValueError, match=message):
+            HanoiState.from_lists(lists, 3)
+
+
+def test_positions_round_trip():
+    state = HanoiState.from_lists([[5, 2], [4, 1], [3]])
+    assert state.num_disks == 5
+    assert [state.peg_of(disk) for disk in range(1, 6)] == [1, 0, 2, 1, 0]
+    assert HanoiState.from_positions(state.positions()) == state
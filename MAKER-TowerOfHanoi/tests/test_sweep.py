@@ -0,0 +1,44 @@
+import csv
+import pytest
+from maker.config import RunConfig
+from maker.sweep import RESULT_FIELDS, expand_grid, run_one, run_sweep
+
+BASE = RunConfig(backend="simulated", simulator_latency=0.0, simulator_error_rates={},
+                 journal_dir=None, resume=False, cache_path=None)
+
+
+def test_expand_grid_takes_every_combination():
+    configs = expand_grid({"num_disks": [3, 4], "k_threshold": [1, 2, 3]}, BASE)
+    assert [(c.num_disks, c.k_threshold) for c in configs] == [
+        (3, 1), (3, 2), (3, 3), (4, 1), (4, 2), (4, 3)]
+    assert all(c.backend == "simulated" for c in configs)
+    assert expand_grid({}, BASE) == [BASE]
+
+
+def test_expand_grid_rejects_unknown_fields():
+    with pytest.raises(ValueError, match="k_treshold"):
+        expand_grid({"k_treshold": [1]}, BASE)
+
+
+def test_run_one_reports_a_verified_run():
+    row = run_one(expand_grid({"num_disks": [3]}, BASE)[0])
+    assert row["success"] and not row["error"]
+    assert row["steps"] == 7
+    assert row["margins"] == f"{BASE.k_threshold}:7"
+    assert row["api_calls"] >= 7 * BASE.k_threshold
+
+
+def test_run_sweep_writes_rows_and_stops_runs_at_the_budget(tmp_path):
+    out = str(tmp_path / "sweep.csv")
+    configs = expand_grid({"num_disks": [3, 6]}, BASE)
+    # One worker takes the runs in order, so the 3-disk run goes first
+    rows = run_sweep(configs, out, workers=1, budget=40)
+    by_disks = {row["num_disks"]: row for row in rows}
+    assert by_disks[3]["success"]
+    # 63 steps at k=2 cannot fit in what is left of 40 requests
+    assert not by_disks[6]["success"]
+    assert "budget" in by_disks[6]["error"].lower()
+    with open(out, newline="") as f:
+        written = list(csv.DictReader(f))
+    assert len(written) == 2
+    assert set(RESULT_FIELDS) <= set(written[0])
@@ -0,0 +1,112 @@
+import random
+import pytest
+from maker.replay import ReplayIndex
+from maker.solver import verify_solution
+from maker.state import HanoiState
+from maker.verify import first_illegal, optimal_moves, optimal_positions, verify_log
+
+
+def optimal(num_disks):
+    disk, from_peg, to_peg = optimal_moves(num_disks, 0, 2 ** num_disks - 1)
+    return [[int(d), int(a), int(b)] for d, a, b in zip(disk, from_peg, to_peg)]
+
+
+def sequential_replay(moves, num_disks):
+    """(first illegal index or -1, solved) by applying one move at a time"""
+    state = HanoiState.initial(num_disks)
+    for i, move in enumerate(moves):
+        if not 1 <= move[0] <= num_disks:
+            return i, False
+        try:
+            state = state.apply(move)
+        except ValueError:
+            return i, False
+    return -1, state == [[], [], list(range(num_disks, 0, -1))]
+
+
+def corrupt(moves, rng):
+    moves = [list(move) for move in moves]
+    i = rng.randrange(len(moves))
+    kind = rng.choice(("peg", "disk", "swap", "drop", "repeat", "truncate", "detour"))
+    if kind == "peg":
+        disk, from_peg, to_peg = moves[i]
+        moves[i] = [disk, from_peg, 3 - from_peg - to_peg]
+    elif kind == "disk":
+        moves[i][0] = rng.randint(1, 12)
+    elif kind == "swap":
+        j = rng.randrange(len(moves))
+        moves[i], moves[j] = moves[j], moves[i]
+    elif kind == "drop":
+        del moves[i]
+    elif kind == "repeat":
+        moves.insert(i, list(moves[i]))
+    elif kind == "truncate":
+        del moves[i:]
+    else:
+        # Disk 1 steps away and back: legal, solved, but not optimal
+        disk, from_peg, to_peg = moves[i]
+        if disk == 1:
+            moves[i:i] = [[1, from_peg, to_peg], [1, to_peg, from_peg]]
+    return [move for move in moves if move[1] != move[2]]
+
+
+@pytest.mark.parametrize("num_disks", [3, 6, 9])
+def test_verify_log_matches_sequential_replay(num_disks):
+    rng = random.Random(num_disks)
+    moves = optimal(num_disks)
+    outcomes = set()
+    for _ in range(150):
+        log = corrupt(moves, rng)
+        expected_bad, solved = sequential_replay(log, num_disks)
+        outcomes.add(solved)
+        # A small chunk makes corruptions land on chunk boundaries too
+        success, index, message = verify_log(log, num_disks, chunk=17)
+        assert success == solved, message
+        bad, _ = first_illegal(log, num_disks, chunk=17)
+        assert bad == expected_bad
+        if expected_bad != -1:
+            assert index == expected_bad
+        elif not solved:
+            assert index == len(log)
+    assert outcomes == {True, False}
+
+
+def test_first_illegal_positions_after_legal_prefix():
+    moves = optimal(7)
+    log = moves[:50] + [[7, 0, 0]]
+    bad, positions = first_illegal(log, 7, chunk=16)
+    assert bad == 50
+    assert bytes(positions.tolist()) == optimal_positions(7, 50)
+
+
+def test_verify_solution_delegates_to_verify_log(capsys):
+    moves = optimal(4)
+    assert verify_solution(moves, 4)
+    assert not verify_solution(moves[:-1], 4)
+    assert "disks end on pegs" in capsys.readouterr().out
+
+
+def test_verify_log_rejects_unsolved_and_same_peg_moves():
+    moves = optimal(5)
+    assert verify_log(moves, 5)[0]
+    assert verify_log(moves[:-1], 5)[:2] == (False, len(moves) - 1)
+    assert not verify_log(moves[:3] + [[1, 0, 0]] + moves[3:], 5)[0]
+
+
+def test_replay_index_matches_sequential_replay():
+    moves = optimal(8)
+    rng = random.Random(0)
+    detoured = list(moves)
+    for i in sorted(rng.sample(range(len(moves)), 20), reverse=True):
+        disk, from_peg, to_peg = moves[i]
+        if disk == 1:
+            detoured[i:i] = [[1, from_peg, to_peg], [1, to_peg, from_peg]]
+    for log in (moves, detoured):
+        replay = ReplayIndex(log, 8, keyframe_interval=32)
+        state = HanoiState.initial(8)
+        expected = [state.positions()]
+        for move in log:
+            state = state.apply(move)
+            expected.append(state.positions())
+        for step in rng.sample(range(len(log) + 1), 60) + [0, len(log)]:
+            assert replay.positions_at(step) == expected[step]
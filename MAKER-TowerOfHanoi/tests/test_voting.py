@@ -0,0 +1,200 @@
+import asyncio
+import pytest
+from maker.config import RunConfig
+from maker.prompts import get_prompts
+from maker.responses import completion_response
+from maker.simulator import SimulatedClient, SimulatedModel
+from maker.state import HanoiState
+from maker.voting import (BudgetExhausted, VoteStats, _Call, _stream_text, build_messages,
+                          do_voting, do_voting_async, get_votes, get_votes_async)
+
+NUM_DISKS = 4
+RIGHT, WRONG = [1, 0, 1], [1, 0, 2]
+HANG = "hang"
+
+
+class ScriptedClient:
+    """
+    Async client answering each request with the next entry of script: a
+    move (answered correctly formatted), raw response text, an exception to
+    raise, or HANG to wait until cancelled. Tracks how many requests are in
+    flight.
+    """
+
+    def __init__(self, script, delay=0.0):
+        self.chat = self.completions = self
+        self.script = list(script)
+        self.delay = delay
+        self.requests = 0
+        self.in_flight = 0
+        self.peak = 0
+        self.cancelled = 0
+
+    async def create(self, messages, n=1, **kwargs):
+        self.requests += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            entry = self.script.pop(0)
+            if entry == HANG:
+                await asyncio.Event().wait()
+            await asyncio.sleep(self.delay)
+            if isinstance(entry, Exception):
+                raise entry
+            text = entry
+            if isinstance(entry, list):
+                state = HanoiState.initial(NUM_DISKS)
+                text = f"move = {entry}\nnext_state = {state.apply(entry)}"
+            return completion_response("scripted", [(text, "stop")] * n, 100, 20 * n)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+
+def vote_async(client, k, max_in_flight=8, stats=None, **config):
+    config = RunConfig(num_disks=NUM_DISKS, **config)
+    return do_voting_async(client, HanoiState.initial(NUM_DISKS), None, k, NUM_DISKS,
+                           *get_prompts(NUM_DISKS), max_in_flight=max_in_flight,
+                           stats=stats, config=config)
+
+
+def messages():
+    system_prompt, user_template = get_prompts(NUM_DISKS)
+    return build_messages(HanoiState.initial(NUM_DISKS), None, system_prompt, user_template)
+
+
+def test_stream_counts_saved_tokens_for_both_kinds_of_stop():
+    config = RunConfig(num_disks=NUM_DISKS, streaming=True, max_tokens=200,
+                       stream_max_chars=400, stream_max_preamble=300)
+    stats = VoteStats()
+    # Complete answer: closed before the usage chunk, nothing aborted
+    text = _stream_text(SimulatedClient(seed=0), config, messages(), 0, stats, _Call(None, 0, 0))
+    assert text.endswith("next_state = [[4, 3, 2], [1], []]")
+    assert (stats.streamed, stats.stream_aborts) == (1, 0)
+    assert stats.tokens_saved == 200 - len(text) // 4 - (len(text) % 4 > 0)
+
+    saved = stats.tokens_saved
+    overlong = SimulatedClient(error_rates={"overlong": 1.0}, seed=0)
+    with pytest.raises(ValueError, match="No 'move ='"):
+        _stream_text(overlong, config, messages(), 0, stats, _Call(None, 0, 0))
+    assert (stats.streamed, stats.stream_aborts) == (2, 1)
+    # Cut off on the chunk that crossed the 300-character preamble
+    assert stats.tokens_saved - saved == 200 - (300 // 4 + 1)
+    assert "at most" in stats.stream_summary()
+
+
+def test_get_votes_asks_for_n_choices_in_one_request():
+    model = SimulatedModel(error_rates={"malformed": 0.5}, seed=1)
+    stats = VoteStats()
+    state = HanoiState.initial(NUM_DISKS)
+    votes = get_votes(SimulatedClient(model), state, None, 0.1, 8, NUM_DISKS,
+                      *get_prompts(NUM_DISKS), stats=stats, config=RunConfig(num_disks=NUM_DISKS))
+    assert (model.requests, stats.calls, stats.samples) == (1, 1, 8)
+    # Each choice is red-flagged on its own; the rest still count
+    assert stats.red_flags == model.errors["malformed"] > 0
+    assert votes == [([1, 0, 1], state.apply([1, 0, 1]))] * (8 - stats.red_flags)
+
+
+def test_streaming_asks_for_one_choice_at_a_time():
+    model = SimulatedModel(seed=0)
+    config = RunConfig(num_disks=NUM_DISKS, streaming=True)
+    assert len(get_votes(SimulatedClient(model), HanoiState.initial(NUM_DISKS), None, 0.1, 4,
+                         NUM_DISKS, *get_prompts(NUM_DISKS), config=config)) == 1
+    assert model.requests == 1
+
+
+def test_do_voting_batches_temperature_rest_samples():
+    requests = {}
+    for n in (1, 4):
+        model = SimulatedModel(error_rates={"wrong_move": 0.2}, seed=0)
+        config = RunConfig(num_disks=NUM_DISKS, max_samples_per_call=n)
+        stats = VoteStats()
+        move, _ = do_voting(SimulatedClient(model), HanoiState.initial(NUM_DISKS), None, 4,
+                            NUM_DISKS, *get_prompts(NUM_DISKS), stats=stats, config=config)
+        assert move == [1, 0, 1]
+        assert stats.calls == model.requests
+        requests[n] = (model.requests, stats.samples)
+    # A batch never asks for more votes than could still settle the step, so
+    # the same samples arrive in fewer requests
+    assert requests == {1: (6, 6), 4: (3, 6)}
+
+
+def test_do_voting_async_is_first_to_ahead_by_k():
+    client = ScriptedClient([RIGHT, WRONG, WRONG, RIGHT, RIGHT, RIGHT, WRONG])
+    stats = VoteStats()
+    move, _ = asyncio.run(vote_async(client, 2, max_in_flight=1, stats=stats))
+    # 1-0, 1-1, 1-2, 2-2, 3-2, 4-2
+    assert move == RIGHT
+    assert client.requests == 6
+    assert stats.votes == {tuple(RIGHT): 4, tuple(WRONG): 2}
+
+
+def test_do_voting_async_keeps_at_most_max_in_flight():
+    client = ScriptedClient([RIGHT, WRONG] * 5 + [RIGHT] * 10, delay=0.001)
+    move, _ = asyncio.run(vote_async(client, 6, max_in_flight=3))
+    assert move == RIGHT
+    assert client.peak == 3
+    # Never more in flight than could still settle the step: k=2 starts with two
+    client = ScriptedClient([RIGHT] * 4, delay=0.001)
+    asyncio.run(vote_async(client, 2, max_in_flight=8))
+    assert (client.requests, client.peak) == (2, 2)
+
+
+def test_do_voting_async_cancels_pending_calls_when_cancelled():
+    client = ScriptedClient([HANG] * 3)
+
+    async def run():
+        task = asyncio.ensure_future(vote_async(client, 3))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert (client.requests, client.cancelled, client.in_flight) == (3, 3, 0)
+
+
+def test_do_voting_async_cancels_pending_calls_on_a_non_retryable_error():
+    client = ScriptedClient([HANG, BudgetExhausted("spent"), HANG], delay=0.001)
+    with pytest.raises(BudgetExhausted):
+        asyncio.run(vote_async(client, 3))
+    assert (client.cancelled, client.in_flight) == (2, 0)
+
+
+def test_get_votes_async_retries_api_errors_and_red_flags():
+    client = ScriptedClient([RuntimeError("502"), "move = [1, 0]", WRONG, RIGHT])
+    client.schedules_retries = True   # no retry_delay sleep
+    stats = VoteStats()
+    config = RunConfig(num_disks=NUM_DISKS)
+    votes = asyncio.run(get_votes_async(client, HanoiState.initial(NUM_DISKS), None, 0.1, 1,
+                                        NUM_DISKS, *get_prompts(NUM_DISKS), stats=stats,
+                                        config=config))
+    # WRONG is a legal move, so it is a vote, not a red flag
+    assert votes == [(WRONG, HanoiState.initial(NUM_DISKS).apply(WRONG))]
+    assert (stats.api_errors, stats.red_flags, stats.calls, client.requests) == (1, 1, 3, 3)
+
+
+def test_get_votes_lets_non_retryable_errors_through_and_gives_up_after_max_attempts():
+    class Failing:
+        schedules_retries = True
+
+        def __init__(self, error):
+            self.chat = self.completions = self
+            self.error = error
+            self.requests = 0
+
+        def create(self, **kwargs):
+            self.requests += 1
+            raise self.error
+
+    args = (HanoiState.initial(NUM_DISKS), None, 0.1, 1, NUM_DISKS, *get_prompts(NUM_DISKS))
+    client = Failing(BudgetExhausted("spent"))
+    with pytest.raises(BudgetExhausted):
+        get_votes(client, *args, config=RunConfig(num_disks=NUM_DISKS))
+    assert client.requests == 1
+    client = Failing(RuntimeError("502"))
+    with pytest.raises(RuntimeError, match="Failed after 50 attempts"):
+        get_votes(client, *args, config=RunConfig(num_disks=NUM_DISKS))
+    assert client.requests == 50